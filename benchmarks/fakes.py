@@ -0,0 +1,658 @@
+"""
+Deterministic local stand-ins for Gemini and Postgres/pgvector.
+
+The fakes are patched in at the SDK / connection boundary so that the code
+under benchmark (indexer, extractor, workflows, API) runs unmodified.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+EMBED_DIM = 768
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class FakeConfig:
+    """Latency and error injection for a fake backend."""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_code: int = 429
+    seed: int = 0
+    calls: int = field(default=0, init=False)
+    errors: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def simulate(self):
+        """Sleep for the configured latency and maybe raise an injected error."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay / 1000)
+        if fail:
+            raise FakeAPIError(self.error_code, "Injected error from fake backend")
+
+
+class FakeAPIError(Exception):
+    """Mimics the SDK errors, which expose the HTTP status as `code`."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+# ---------------------------------------------------------------------------
+# Gemini
+# ---------------------------------------------------------------------------
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list[float]:
+    """Feature-hashed bag of words, so lexically similar texts are close."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for token in TOKEN_RE.findall(text.lower()):
+        h = zlib.crc32(token.encode())
+        vec[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vec)
+    if norm:
+        vec /= norm
+    return vec.tolist()
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _best_sentence(policy_text: str, requirement: str) -> tuple[float, str]:
+    """Pick the policy sentence with the largest word overlap with the requirement."""
+    wanted = set(TOKEN_RE.findall(requirement.lower()))
+    best = (0.0, "")
+    for sentence in re.split(r"(?<=\.)\s+", policy_text):
+        words = set(TOKEN_RE.findall(sentence.lower()))
+        if not words:
+            continue
+        score = len(wanted & words) / max(1, len(wanted))
+        if score > best[0]:
+            best = (score, sentence.strip())
+    return best
+
+
+def fake_generate(prompt: str) -> str:
+    """Answer the two prompt shapes used in the repo with plausible JSON."""
+    if "Text to analyze:" in prompt:
+        text = prompt.split("Text to analyze:", 1)[1]
+        questions = re.findall(r"\d+\.\s*(.+?\?)", text, flags=re.S)
+        return json.dumps(
+            [
+                {"id": i, "requirement": " ".join(q.split())}
+                for i, q in enumerate(questions, 1)
+            ]
+        )
+
+    requirement = ""
+    match = re.search(r"\*\*Requirement:\*\*\s*(.*?)\n\s*\n", prompt, flags=re.S)
+    if match:
+        requirement = match.group(1).strip()
+    match = re.search(r'"""(.*)"""', prompt, flags=re.S)
+    policy_text = match.group(1) if match else prompt
+
+    score, sentence = _best_sentence(policy_text, requirement)
+    if score >= 0.5:
+        result = {
+            "is_met": True,
+            "citation": sentence,
+            "explanation": None,
+            "confidence": round(min(1.0, 0.5 + score / 2), 2),
+        }
+    else:
+        result = {
+            "is_met": False,
+            "citation": None,
+            "explanation": "The policy does not address the requirement.",
+            "confidence": round(1.0 - score / 2, 2),
+        }
+    return "```json\n" + json.dumps(result) + "\n```"
+
+
+class FakeGemini:
+    """Replaces `google.generativeai` and `google.genai` entry points."""
+
+    def __init__(self, embed: FakeConfig, generate: FakeConfig):
+        self.embed = embed
+        self.generate = generate
+
+    # google.generativeai.embed_content
+    def embed_content(self, model=None, content=None, output_dimensionality=None, **_):
+        self.embed.simulate()
+        dim = output_dimensionality or EMBED_DIM
+        if isinstance(content, list):
+            return {"embedding": [fake_embedding(c, dim) for c in content]}
+        return {"embedding": fake_embedding(content, dim)}
+
+    # google.generativeai.GenerativeModel
+    def generative_model(self, model_name, *args, **kwargs):
+        fake = self
+
+        class _Model:
+            def generate_content(self, prompt, **_):
+                fake.generate.simulate()
+                return FakeResponse(fake_generate(prompt))
+
+        return _Model()
+
+    # google.genai.Client
+    def client(self, *args, **kwargs):
+        fake = self
+
+        class _Models:
+            def generate_content(self, model=None, contents=None, config=None, **_):
+                fake.generate.simulate()
+                text = fake_generate(contents)
+                if getattr(config, "response_mime_type", None) == "application/json":
+                    # Schema-constrained output comes back as bare JSON.
+                    text = text.removeprefix("```json\n").removesuffix("\n```")
+                return FakeResponse(text)
+
+        class _Client:
+            models = _Models()
+
+        return _Client()
+
+
+# ---------------------------------------------------------------------------
+# Postgres / pgvector
+# ---------------------------------------------------------------------------
+
+SELECT_RE = re.compile(
+    r"SELECT\s+(?P<cols>.*?)\s+FROM\s+(?P<table>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.*?))?"
+    r"(?:\s+ORDER BY\s+(?P<order>.*?))?"
+    r"(?:\s+LIMIT\s+%s)?\s*;?\s*$",
+    flags=re.S | re.I,
+)
+INSERT_RE = re.compile(
+    r"INSERT INTO\s+(?P<table>\w+)\s*\((?P<cols>[^)]*)\)\s*VALUES", flags=re.I
+)
+
+
+def _compose_to_str(query) -> str:
+    """Render a psycopg2.sql.Composable without a live connection."""
+    if isinstance(query, str):
+        return query
+    parts = getattr(query, "seq", None)
+    if parts is not None:
+        return "".join(_compose_to_str(p) for p in parts)
+    if hasattr(query, "strings"):  # sql.Identifier
+        return ".".join(query.strings)
+    if hasattr(query, "string"):  # sql.SQL
+        return query.string
+    return str(getattr(query, "wrapped", query))
+
+
+def _where(where, params: list, row: dict) -> bool:
+    """Evaluate an AND of the repo's simple conditions; no clause matches everything."""
+    if not where:
+        return True
+    params = list(params)
+    for cond in re.split(r"\s+AND\s+", where.strip().rstrip(";"), flags=re.I):
+        if match := re.match(r"UPPER\((\w+)\) LIKE '%+(\w+)%+'", cond, re.I):
+            ok = match.group(2).upper() in (row.get(match.group(1)) or "").upper()
+        elif match := re.match(r"(\w+) IS (NOT )?NULL", cond, re.I):
+            ok = (row.get(match.group(1)) is None) != bool(match.group(2))
+        elif match := re.match(r"(\w+) = ANY\(%s\)", cond, re.I):
+            ok = row.get(match.group(1)) in params.pop(0)
+        elif match := re.match(r"(\w+) && %s", cond):
+            ok = bool(set(row.get(match.group(1)) or ()) & set(params.pop(0)))
+        elif match := re.match(r"(\w+)\s*=\s*%s", cond):
+            ok = row.get(match.group(1)) == params.pop(0)
+        else:
+            raise NotImplementedError(f"FakeCursor cannot evaluate: {cond}")
+        if not ok:
+            return False
+    return True
+
+
+class FakeProgrammingError(Exception):
+    """Mimics psycopg2.ProgrammingError for unknown relations and columns."""
+
+
+_CONSTRAINTS = ("PRIMARY", "UNIQUE", "CONSTRAINT", "FOREIGN", "CHECK")
+
+
+def _table_columns(create: str) -> list[str]:
+    """Column names declared in a CREATE TABLE statement."""
+    body = create[create.index("(") + 1 : create.rindex(")")]
+    items, depth, current = [], 0, ""
+    for char in body:
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            items.append(current)
+            current = ""
+        else:
+            current += char
+    items.append(current)
+    names = [item.split()[0] for item in items if item.strip()]
+    return [n for n in names if n.upper() not in _CONSTRAINTS]
+
+
+def _discard(rows: list, row: dict):
+    for i, r in enumerate(rows):
+        if r is row:
+            del rows[i]
+            return
+
+
+class FakeDatabase:
+    """
+    A tiny in-memory table store that understands the repo's SQL statements.
+
+    Like Postgres, unknown tables and columns are errors and a connection's
+    uncommitted changes, DDL included, are undone on rollback or close.
+    There is no isolation: other connections see uncommitted rows.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tables: dict[str, list[dict]] = {}
+        self.columns: dict[str, list[str]] = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def connect(self, *args, **kwargs):
+        with self._lock:
+            self.connections += 1
+        return FakeConnection(self)
+
+    def rows(self, table: str) -> list[dict]:
+        """A table's rows, creating it (without a schema) if needed."""
+        return self.tables.setdefault(table, [])
+
+    def table(self, name: str) -> list[dict]:
+        if name not in self.tables:
+            raise FakeProgrammingError(f'relation "{name}" does not exist')
+        return self.tables[name]
+
+    def check_columns(self, table: str, names):
+        known = self.columns.get(table)
+        if known is None:
+            return
+        for name in names:
+            if name not in known:
+                raise FakeProgrammingError(f'column "{name}" does not exist')
+
+
+class FakeConnection:
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.undo: list = []
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.db, self)
+
+    def commit(self):
+        self.undo.clear()
+
+    def rollback(self):
+        with self.db._lock:
+            while self.undo:
+                self.undo.pop()()
+
+    def close(self):
+        self.rollback()
+
+
+class FakeCursor:
+    def __init__(self, db: FakeDatabase, connection=None):
+        self.db = db
+        self.connection = connection
+        self.rowcount = -1
+        self._results: list[tuple] = []
+
+    def _log(self, undo):
+        if self.connection is not None:
+            self.connection.undo.append(undo)
+
+    def execute(self, query, params=()):
+        if self.db.latency_ms:
+            time.sleep(self.db.latency_ms / 1000)
+        text = " ".join(_compose_to_str(query).split())
+        params = list(params or ())
+        head = text.split(" ", 1)[0].upper()
+
+        with self.db._lock:
+            self._results = []
+            if head == "CREATE":
+                self._create(text)
+            elif head == "INSERT":
+                self._insert(text, params)
+            elif head == "DELETE":
+                self._delete(text, params)
+            elif head == "SELECT":
+                self._select(text, params)
+            elif head == "UPDATE":
+                if re.search(r"SET (\w+) = \1 \+ 1", text, re.I):
+                    self._increment(text, params)
+                else:
+                    self._update(text, params)
+            elif head == "ALTER":
+                self._alter(text)
+            elif head == "DROP":
+                self._drop(re.search(r"(\w+)\s*;?$", text).group(1))
+            elif head in ("LOCK", "SET", "ANALYZE"):
+                pass
+            else:
+                raise NotImplementedError(f"FakeCursor cannot execute: {text}")
+
+    def _create(self, text: str):
+        match = re.search(r"CREATE TABLE IF NOT EXISTS \"?(\w+)", text, re.I)
+        if not match or match.group(1) in self.db.tables:
+            return  # indexes and extensions are not modelled
+        name = match.group(1)
+        self.db.tables[name] = []
+        self.db.columns[name] = _table_columns(text)
+
+        def undo():
+            self.db.tables.pop(name, None)
+            self.db.columns.pop(name, None)
+
+        self._log(undo)
+
+    def _insert(self, text: str, params: list):
+        match = INSERT_RE.search(text)
+        name = match.group("table")
+        cols = [c.strip() for c in match.group("cols").split(",")]
+        table = self.db.table(name)
+        self.db.check_columns(name, cols)
+        row = dict(zip(cols, params))
+        if row.get("embedding") is not None:
+            row["embedding"] = np.asarray(row["embedding"], dtype=np.float32)
+        if "ON CONFLICT" in text.upper() and any(
+            r.get(cols[0]) == row[cols[0]] for r in table
+        ):
+            self.rowcount = 0
+            return
+        row.setdefault("id", len(table) + 1)
+        table.append(row)
+        self.rowcount = 1
+        self._log(lambda: _discard(self.db.tables.get(name, []), row))
+
+    def _delete(self, text: str, params: list):
+        match = re.search(r"FROM\s+(\w+)(?:\s+WHERE\s+(.*?))?\s*;?\s*$", text, re.I)
+        name = match.group(1)
+        rows = self.db.table(name)
+        keep, removed = [], []
+        for r in rows:
+            (removed if _where(match.group(2), params, r) else keep).append(r)
+        self.rowcount = len(removed)
+        self.db.tables[name] = keep
+        self._log(lambda: self.db.tables.get(name, []).extend(removed))
+
+    def _set(self, row: dict, values: dict):
+        old = {c: row.get(c) for c in values}
+        row.update(values)
+        self._log(lambda: row.update(old))
+
+    def _increment(self, text: str, params: list):
+        """UPDATE t SET c = c + 1 WHERE ... [RETURNING c]"""
+        match = re.match(
+            r"UPDATE (\w+) SET (\w+) = \2 \+ 1(?: WHERE (.*?))?(?: RETURNING \w+)?\s*;?$",
+            text,
+            re.I,
+        )
+        if not match:
+            raise NotImplementedError(f"FakeCursor cannot execute: {text}")
+        table, column, where = match.groups()
+        self.db.check_columns(table, [column])
+        for row in self.db.table(table):
+            if _where(where, params, row):
+                self._set(row, {column: row[column] + 1})
+                self._results.append((row[column],))
+        self.rowcount = len(self._results)
+
+    def _update(self, text: str, params: list):
+        """UPDATE t SET a = %s, b = NULL, ... WHERE ..."""
+        match = re.match(r"UPDATE (\w+) SET (.*?) WHERE (.*?)\s*;?$", text, re.I)
+        if not match:
+            raise NotImplementedError(f"FakeCursor cannot execute: {text}")
+        table, assignments, where = match.groups()
+        values = {}
+        for assignment in assignments.split(","):
+            column, value = (p.strip() for p in assignment.split("="))
+            values[column] = params.pop(0) if value == "%s" else None
+        self.db.check_columns(table, values)
+        self.rowcount = 0
+        for row in self.db.table(table):
+            if _where(where, params, row):
+                self._set(row, values)
+                self.rowcount += 1
+
+    def _alter(self, text: str):
+        match = re.match(r"ALTER TABLE (\w+) RENAME TO (\w+)", text, re.I)
+        if match:
+            old, new = match.groups()
+            self.db.table(old)
+            self._rename(old, new)
+            self._log(lambda: self._rename(new, old))
+            return
+        match = re.match(r"ALTER TABLE (\w+)", text, re.I)
+        name = match.group(1)
+        self.db.table(name)
+        known = self.db.columns.get(name)
+        if known is None:
+            return
+        added = [
+            c
+            for c in re.findall(r"ADD COLUMN (?:IF NOT EXISTS )?(\w+)", text, re.I)
+            if c not in known
+        ]
+        known.extend(added)
+        self._log(lambda: [known.remove(c) for c in added if c in known])
+
+    def _rename(self, old: str, new: str):
+        self.db.tables[new] = self.db.tables.pop(old)
+        if old in self.db.columns:
+            self.db.columns[new] = self.db.columns.pop(old)
+
+    def _drop(self, name: str):
+        if name not in self.db.tables:
+            return
+        rows = self.db.tables.pop(name)
+        columns = self.db.columns.pop(name, None)
+
+        def undo():
+            self.db.tables[name] = rows
+            if columns is not None:
+                self.db.columns[name] = columns
+
+        self._log(undo)
+
+    def _select(self, text: str, params: list):
+        if "information_schema.tables" in text:
+            self._results = [(params[0] in self.db.tables,)]
+            return
+        if "information_schema.columns" in text:
+            table, column = params[:2]
+            if column in self.db.columns.get(table, ()):
+                self._results = [(column,)]
+            return
+        if "FROM pg_class" in text:
+            self._results = [
+                (name, len(self.db.tables[name]))
+                for name in params[0]
+                if name in self.db.tables
+            ]
+            return
+
+        match = SELECT_RE.match(text)
+        if not match:
+            raise NotImplementedError(f"FakeCursor cannot execute: {text}")
+        cols = [c.strip() for c in match.group("cols").split(",")]
+        name = match.group("table")
+        rows = self.db.table(name)
+        where = match.group("where") or ""
+        self.db.check_columns(
+            name,
+            [c for c in cols if re.fullmatch(r"\w+", c)]
+            + re.findall(r"\b(\w+)\s*(?:=|&&|IS\b)", where),
+        )
+
+        if cols == ["COUNT(*)"]:
+            self._results = [(len(rows),)]
+            return
+
+        query_vec = None
+        if cols and "embedding" in cols[-1] and "%s" in cols[-1]:
+            query_vec = np.asarray(params.pop(0), dtype=np.float32)
+
+        n = where.count("%s")
+        conditions, params[:n] = params[:n], []
+        rows = [r for r in rows if _where(where, conditions, r)]
+
+        if match.group("order") and "<->" in match.group("order"):
+            order_vec = np.asarray(params.pop(0), dtype=np.float32)
+            limit = params.pop(0) if params else len(rows)
+            rows = [r for r in rows if r.get("embedding") is not None]
+            if rows:
+                matrix = np.stack([r["embedding"] for r in rows])
+                distances = np.linalg.norm(matrix - order_vec, axis=1)
+                order = np.argsort(distances, kind="stable")[:limit]
+                rows = [rows[i] for i in order]
+
+        out = []
+        for r in rows:
+            values = []
+            for col in cols:
+                if "embedding" in col and "%s" in col:
+                    values.append(1 + float(np.dot(r["embedding"], query_vec)))
+                else:
+                    values.append(r.get(col))
+            out.append(tuple(values))
+        self._results = out
+
+    def fetchall(self):
+        results, self._results = self._results, []
+        return results
+
+    def fetchone(self):
+        return self._results.pop(0) if self._results else None
+
+    def copy_expert(self, query, file):
+        """COPY t (cols) FROM STDIN in text format."""
+        match = re.search(r"COPY (\w+) \(([^)]*)\) FROM STDIN", query, re.I)
+        name = match.group(1)
+        cols = [c.strip() for c in match.group(2).split(",")]
+        unescape = {"\\t": "\t", "\\n": "\n", "\\r": "\r", "\\\\": "\\"}
+        with self.db._lock:
+            table = self.db.table(name)
+            self.db.check_columns(name, cols)
+            added = []
+            for line in file.read().splitlines():
+                values = [
+                    (
+                        None
+                        if v == "\\N"
+                        else re.sub(r"\\[tnr\\]", lambda m: unescape[m.group(0)], v)
+                    )
+                    for v in line.split("\t")
+                ]
+                row = dict(zip(cols, values))
+                if row.get("paragraph_id") is not None:
+                    row["paragraph_id"] = int(row["paragraph_id"])
+                if row.get("embedding") is not None:
+                    row["embedding"] = np.array(
+                        row["embedding"][1:-1].split(","), dtype=np.float32
+                    )
+                row["id"] = len(table) + 1
+                table.append(row)
+                added.append(row)
+        self._log(lambda: [_discard(self.db.tables.get(name, []), r) for r in added])
+
+    def fetchmany(self, size: int = 1):
+        results, self._results = self._results[:size], self._results[size:]
+        return results
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Installation
+# ---------------------------------------------------------------------------
+
+
+class OfflineBackends:
+    """
+    Patch Gemini and Postgres with the fakes for the lifetime of the context.
+
+    Must be entered before the repo modules are imported so that module-level
+    clients (e.g. `extractor.extract.client`) are built from the fakes; any
+    already-imported references are rebound as well.
+    """
+
+    def __init__(
+        self,
+        embed: FakeConfig = None,
+        generate: FakeConfig = None,
+        db_latency_ms: float = 0.0,
+    ):
+        self.gemini = FakeGemini(embed or FakeConfig(), generate or FakeConfig())
+        self.db = FakeDatabase(latency_ms=db_latency_ms)
+        self._patches = []
+
+    def _patch(self, obj, name, value):
+        self._patches.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def __enter__(self):
+        import google.generativeai as old_genai
+        from google import genai
+
+        self._patch(old_genai, "embed_content", self.gemini.embed_content)
+        self._patch(old_genai, "GenerativeModel", self.gemini.generative_model)
+        self._patch(genai, "Client", self.gemini.client)
+        self.rebind()
+        return self
+
+    def rebind(self):
+        """
+        Rebind names imported with `from indexer.db import get_connection` and
+        module-level Gemini clients. Call again after importing more modules.
+        """
+        import indexer.db
+
+        for module in list(sys.modules.values()):
+            connect = getattr(module, "get_connection", None)
+            if (
+                getattr(connect, "__module__", None) == "indexer.db"
+                and connect is not self.db.connect
+            ):
+                self._patch(module, "get_connection", self.db.connect)
+            client = getattr(module, "client", None)
+            if type(client).__module__.startswith("google.genai"):
+                self._patch(module, "client", self.gemini.client())
+        if indexer.db.get_connection is not self.db.connect:
+            self._patch(indexer.db, "get_connection", self.db.connect)
+
+    def __exit__(self, *exc):
+        for obj, name, value in reversed(self._patches):
+            setattr(obj, name, value)
+        self._patches.clear()
+        return False
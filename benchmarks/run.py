@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite.
+
+Runs the indexer, search and API paths against the fakes in
+`benchmarks/fakes.py` and writes a JSON result file that can be compared
+between commits:
+
+    python -m benchmarks.run run --docs=20 --questions=20
+    python -m benchmarks.run compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import fire
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The Gemini clients refuse to build without a key; the fakes never use it.
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+# Each run starts from a fresh fake index; keep the caches in-process.
+os.environ.setdefault("SEARCH_CACHE_PATH", "")
+os.environ.setdefault("SINGLEFLIGHT_PATH", "")
+# The document store stays on, as deployed, but in a scratch directory.
+os.environ.setdefault("DOCSTORE_DIR", tempfile.mkdtemp(prefix="readily-docstore-"))
+# The fake Gemini client has no cached-content API.
+os.environ.setdefault("CONTEXT_CACHE", "local")
+
+from benchmarks.fakes import FakeConfig, OfflineBackends
+from benchmarks.synth import generate_policy_pdfs, generate_questionnaire
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _percentiles(samples_ms: list[float], prefix: str) -> dict:
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        f"{prefix}.p50_ms": pct(50),
+        f"{prefix}.p90_ms": pct(90),
+        f"{prefix}.p99_ms": pct(99),
+        f"{prefix}.mean_ms": sum(ordered) / len(ordered),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return "unknown"
+
+
+def bench_parse(pdf_paths: list[Path]) -> dict:
+    """Parse throughput of every parser entry point."""
+    import fitz
+    from indexer.chunker import estimate_tokens
+    from indexer.parse import (
+        extract_points,
+        extract_purpose,
+        extract_policy_and_procedure,
+    )
+
+    pages = 0
+    for path in pdf_paths:
+        with fitz.open(path) as doc:
+            pages += len(doc)
+    size_mb = sum(p.stat().st_size for p in pdf_paths) / 1e6
+
+    results = {"parse.pages": pages}
+    for parser in (extract_points, extract_purpose, extract_policy_and_procedure):
+        start = time.perf_counter()
+        for path in pdf_paths:
+            parser(str(path))
+        elapsed = time.perf_counter() - start
+        name = parser.__name__
+        results[f"parse.{name}.docs_per_sec"] = len(pdf_paths) / elapsed
+        results[f"parse.{name}.pages_per_sec"] = pages / elapsed
+        results[f"parse.{name}.mb_per_sec"] = size_mb / elapsed
+
+    # Chunk sizes of the rows the points table would hold
+    tokens = [
+        estimate_tokens(row["content"])
+        for path in pdf_paths
+        for row in extract_points(str(path))
+    ]
+    results["parse.chunks_per_doc"] = len(tokens) / len(pdf_paths)
+    results["parse.chunk_tokens_mean"] = sum(tokens) / max(len(tokens), 1)
+    results["parse.chunk_tokens_max"] = max(tokens, default=0)
+
+    # Re-chunking from the parsed-document store instead of the PDFs, and
+    # how soon the first row arrives on a cold store (blocks are streamed)
+    from indexer import docstore
+    from indexer.parse import iter_points
+
+    root = docstore.DOCSTORE_DIR
+    docstore.DOCSTORE_DIR = tempfile.mkdtemp()
+    try:
+        first_row = []
+        start = time.perf_counter()
+        for path in pdf_paths:
+            started = time.perf_counter()
+            rows = iter_points(str(path))
+            next(rows, None)
+            first_row.append(time.perf_counter() - started)
+            for _ in rows:
+                pass
+        elapsed = time.perf_counter() - start
+        results["parse.docstore.cold_docs_per_sec"] = len(pdf_paths) / elapsed
+        results["parse.iter_points.cold_first_row_ms"] = (
+            1000 * sum(first_row) / len(first_row)
+        )
+        start = time.perf_counter()
+        for path in pdf_paths:
+            docstore.get_document(path)
+        elapsed = time.perf_counter() - start
+        results["parse.docstore.build_docs_per_sec"] = len(pdf_paths) / elapsed
+        start = time.perf_counter()
+        for path in pdf_paths:
+            extract_points(str(path))
+        elapsed = time.perf_counter() - start
+        results["parse.extract_points.stored_docs_per_sec"] = len(pdf_paths) / elapsed
+    finally:
+        docstore.DOCSTORE_DIR = root
+    return results
+
+
+def bench_ingest(pdf_dir: Path, backends: OfflineBackends) -> dict:
+    """Rows/sec through the purpose (embedded) and policy/procedure ingest paths."""
+    from indexer.db import create_table
+    from indexer.main import (
+        insert_purpose_pdfs_in_dir,
+        insert_policyprocedure_pdfs_in_dir,
+    )
+
+    results = {}
+    for table, insert in (
+        ("policy_purpose", insert_purpose_pdfs_in_dir),
+        ("policy_procedure", insert_policyprocedure_pdfs_in_dir),
+    ):
+        create_table(table)
+        start = time.perf_counter()
+        insert(str(pdf_dir))
+        elapsed = time.perf_counter() - start
+        rows = len(backends.db.rows(table))
+        results[f"ingest.{table}.rows"] = rows
+        results[f"ingest.{table}.rows_per_sec"] = rows / elapsed
+    return results
+
+
+def bench_search(queries: list[str], top_k: int) -> dict:
+    """Latency percentiles of the purpose search, first pass and repeated."""
+    from indexer.search import search_similar_purpose
+
+    results = {}
+    for name in ("search.purpose", "search.purpose_repeat"):
+        samples = []
+        for q in queries:
+            start = time.perf_counter()
+            search_similar_purpose(q, top_k=top_k)
+            samples.append((time.perf_counter() - start) * 1000)
+        results.update(_percentiles(samples, name))
+    return results
+
+
+def bench_api(questionnaire: str, questions: list, top_k: int, concurrency: int):
+    """End-to-end throughput of /audit and /audit_one through the ASGI app."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    results = {}
+
+    start = time.perf_counter()
+    response = client.post("/audit", json={"text": questionnaire})
+    elapsed = time.perf_counter() - start
+    results["api.audit.status"] = response.status_code
+    results["api.audit.questions_per_sec"] = len(questions) / elapsed
+    results["api.audit.total_ms"] = elapsed * 1000
+
+    def one(item):
+        payload = {"id": item.id, "requirement": item.requirement, "top_k": top_k}
+        t0 = time.perf_counter()
+        res = client.post("/audit_one", json=payload)
+        return (time.perf_counter() - t0) * 1000, res.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, questions))
+    elapsed = time.perf_counter() - start
+
+    results["api.audit_one.requests_per_sec"] = len(questions) / elapsed
+    results["api.audit_one.errors"] = sum(1 for _, s in outcomes if s != 200)
+    results.update(_percentiles([ms for ms, _ in outcomes], "api.audit_one"))
+
+    payload = [
+        {"id": item.id, "requirement": item.requirement, "top_k": top_k}
+        for item in questions
+    ]
+    start = time.perf_counter()
+    response = client.post("/audit_batch", json=payload)
+    elapsed = time.perf_counter() - start
+    results["api.audit_batch.questions_per_sec"] = len(questions) / elapsed
+    results["api.audit_batch.errors"] = (
+        len(questions)
+        if response.status_code != 200
+        else sum(1 for r in response.json()["results"] if r["error"])
+    )
+    return results
+
+
+def stage_breakdown() -> dict:
+    """Mean time per instrumented stage over the whole run."""
+    from metrics import STAGE_SECONDS
+
+    return {
+        f"stage.{key[0]}.mean_ms": total / count * 1000
+        for key, (total, count) in STAGE_SECONDS.totals().items()
+        if count
+    }
+
+
+def run(
+    out: str = None,
+    docs: int = 20,
+    paragraphs: int = 8,
+    questions: int = 20,
+    top_k: int = 3,
+    concurrency: int = 1,
+    embed_latency_ms: float = 0.0,
+    generate_latency_ms: float = 0.0,
+    db_latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 0,
+    quiet: bool = True,
+):
+    """
+    Run the full benchmark suite offline and write a JSON result file.
+    Args:
+        out: Output path (default benchmarks/results/<commit>.json)
+        docs: Number of synthetic policy PDFs
+        paragraphs: Paragraphs per POLICY / PROCEDURE section
+        questions: Number of questionnaire questions for search and API runs
+        top_k: top_k passed to search and /audit_one
+        concurrency: Concurrent /audit_one clients
+        embed_latency_ms: Simulated latency per embedding call
+        generate_latency_ms: Simulated latency per generation call
+        db_latency_ms: Simulated latency per SQL statement
+        jitter_ms: Uniform random jitter added to Gemini latencies
+        error_rate: Probability that a Gemini call raises an injected 429
+        seed: Seed for corpus generation and the fakes
+        quiet: Silence the repo's INFO/DEBUG logging during the run
+    Returns:
+        Path of the written result file
+    """
+    embed_cfg = FakeConfig(embed_latency_ms, jitter_ms, error_rate, seed=seed)
+    gen_cfg = FakeConfig(generate_latency_ms, jitter_ms, error_rate, seed=seed + 1)
+
+    with tempfile.TemporaryDirectory() as tmp, OfflineBackends(
+        embed_cfg, gen_cfg, db_latency_ms
+    ) as backends:
+        pdf_dir = Path(tmp)
+        pdf_paths = generate_policy_pdfs(tmp, docs, paragraphs, seed)
+        questionnaire = generate_questionnaire(questions, seed)
+
+        import main  # noqa: F401  # import the whole app before rebinding fakes
+        import indexer.main  # noqa: F401
+        from extractor.extract import extract_questions
+        from logs import logger
+
+        backends.rebind()
+        if quiet:
+            logger.setLevel("WARNING")
+            logging.getLogger("httpx").setLevel("WARNING")
+
+        items = extract_questions(questionnaire)
+        results = {}
+        results.update(bench_parse(pdf_paths))
+        results.update(bench_ingest(pdf_dir, backends))
+        results.update(bench_search([i.requirement for i in items], top_k))
+        results.update(bench_api(questionnaire, items, top_k, concurrency))
+        results.update(stage_breakdown())
+        results["fake.embed_calls"] = embed_cfg.calls
+        results["fake.generate_calls"] = gen_cfg.calls
+        results["fake.injected_errors"] = embed_cfg.errors + gen_cfg.errors
+        results["fake.db_connections"] = backends.db.connections
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "docs": docs,
+                "paragraphs": paragraphs,
+                "questions": questions,
+                "top_k": top_k,
+                "concurrency": concurrency,
+                "embed_latency_ms": embed_latency_ms,
+                "generate_latency_ms": generate_latency_ms,
+                "db_latency_ms": db_latency_ms,
+                "jitter_ms": jitter_ms,
+                "error_rate": error_rate,
+                "seed": seed,
+            },
+        },
+        "results": results,
+    }
+
+    out_path = Path(out) if out else RESULTS_DIR / f"{commit}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2, sort_keys=True))
+    for key, value in sorted(results.items()):
+        print(f"{key:55s} {value:12.3f}")
+    print(f"Results written to {out_path}")
+    return str(out_path)
+
+
+def _better(key: str) -> int:
+    """+1 if higher is better for this metric, -1 if lower is better, 0 if neutral."""
+    if key.endswith(("_per_sec",)):
+        return 1
+    if key.endswith(("_ms", ".errors")):
+        return -1
+    return 0
+
+
+def compare(base: str, head: str, threshold: float = 0.10):
+    """
+    Compare two result files and flag regressions larger than `threshold`.
+    Exits with status 1 if any metric regressed.
+    """
+    base_results = json.loads(Path(base).read_text())["results"]
+    head_results = json.loads(Path(head).read_text())["results"]
+
+    regressions = []
+    for key in sorted(set(base_results) & set(head_results)):
+        old, new = base_results[key], head_results[key]
+        direction = _better(key)
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if direction and change * direction < -threshold:
+            flag = "REGRESSION"
+            regressions.append(key)
+        print(f"{key:55s} {old:12.3f} {new:12.3f} {change:+8.1%} {flag}")
+
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    fire.Fire({"run": run, "compare": compare})
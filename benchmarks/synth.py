@@ -0,0 +1,141 @@
+import random
+import textwrap
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+# Topics give each synthetic policy a distinctive vocabulary so that the
+# generated questionnaire has a "right" document for every question.
+TOPICS = [
+    ("retrospective requests", "14 calendar days", "utilization management"),
+    ("prior authorization", "72 hours", "urgent requests"),
+    ("grievance resolution", "30 calendar days", "member notification"),
+    ("provider credentialing", "36 months", "recredentialing"),
+    ("continuity of care", "12 months", "out-of-network providers"),
+    ("interpreter services", "24 hours a day", "limited English proficiency"),
+    ("transportation benefits", "non-emergency medical", "scheduling"),
+    ("pharmacy formulary", "step therapy", "exception requests"),
+    ("behavioral health", "care coordination", "screening tools"),
+    ("fraud waste and abuse", "compliance committee", "reporting"),
+    ("emergency services", "prudent layperson", "post-stabilization"),
+    ("network adequacy", "time and distance", "access standards"),
+]
+
+FILLER = (
+    "the health network shall ensure that members receive timely access to "
+    "covered services consistent with applicable state and federal "
+    "requirements and contractual obligations including documentation "
+    "monitoring oversight and corrective action where deficiencies are "
+    "identified by the department or internal audit staff"
+).split()
+
+LINE_WIDTH = 95
+LINES_PER_PAGE = 70
+FONT_SIZE = 8
+
+
+def _sentence(rng: random.Random, topic: tuple) -> str:
+    words = rng.sample(FILLER, k=rng.randint(10, 20))
+    words.insert(rng.randrange(len(words)), rng.choice(topic))
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def _paragraph(rng: random.Random, topic: tuple) -> str:
+    return " ".join(_sentence(rng, topic) for _ in range(rng.randint(2, 6)))
+
+
+def policy_text(rng: random.Random, topic: tuple, paragraphs: int = 8) -> str:
+    """Build the text of one CalOptima-style policy with the usual headings."""
+    subject, deadline, area = topic
+    sections = [
+        (
+            "I. PURPOSE",
+            [
+                f"This policy describes the requirements for {subject} "
+                f"related to {area}."
+            ]
+            + [_paragraph(rng, topic) for _ in range(max(1, paragraphs // 4))],
+        ),
+        (
+            "II. POLICY",
+            [
+                f"The plan shall complete {subject} no later than {deadline} "
+                f"from receipt."
+            ]
+            + [_paragraph(rng, topic) for _ in range(paragraphs)],
+        ),
+        (
+            "III. PROCEDURE",
+            [_paragraph(rng, topic) for _ in range(paragraphs)],
+        ),
+        ("IV. ATTACHMENT(S)", ["Not Applicable"]),
+    ]
+
+    blocks = []
+    for heading, body in sections:
+        blocks.append(heading)
+        blocks.extend(body)
+    return "\n\n".join(blocks)
+
+
+def _layout_lines(text: str) -> list[str]:
+    """Wrap text into PDF lines; blank lines become a single space like real PDFs."""
+    lines = []
+    for block in text.split("\n\n"):
+        lines.extend(textwrap.wrap(block, LINE_WIDTH) or [""])
+        lines.append(" ")
+    return lines
+
+
+def write_pdf(text: str, path: Path):
+    """Render plain text into a multi-page PDF."""
+    lines = _layout_lines(text)
+    with fitz.open() as doc:
+        for start in range(0, len(lines), LINES_PER_PAGE):
+            page = doc.new_page()
+            page.insert_text(
+                (40, 40),
+                "\n".join(lines[start : start + LINES_PER_PAGE]),
+                fontsize=FONT_SIZE,
+            )
+        doc.save(str(path))
+
+
+def generate_policy_pdfs(
+    directory: str, count: int = 20, paragraphs: int = 8, seed: int = 0
+) -> list[Path]:
+    """
+    Write `count` synthetic policy PDFs into `directory`.
+    Args:
+        directory: Output directory (created if missing)
+        count: Number of PDFs to generate
+        paragraphs: Paragraphs per POLICY / PROCEDURE section, controls page count
+        seed: RNG seed, the same seed always yields the same corpus
+    Returns:
+        List of written PDF paths
+    """
+    rng = random.Random(seed)
+    out_dir = Path(directory)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)]
+        path = out_dir / f"GG.{1000 + i}.pdf"
+        write_pdf(policy_text(rng, topic, paragraphs), path)
+        paths.append(path)
+    return paths
+
+
+def generate_questionnaire(count: int = 20, seed: int = 0) -> str:
+    """Build a numbered audit questionnaire whose questions target the synthetic topics."""
+    rng = random.Random(seed)
+    lines = ["Policy and Procedure Review Checklist", ""]
+    for i in range(1, count + 1):
+        subject, deadline, area = TOPICS[rng.randrange(len(TOPICS))]
+        lines.append(
+            f"{i}. Does the P&P state that the MCP must complete {subject} "
+            f"for {area} no later than {deadline} from receipt?"
+        )
+    return "\n".join(lines)
@@ -1,15 +1,50 @@
 #!/usr/bin/env python3
 
+import sys
+
 import fire
-from indexer import parse, main, search
+from indexer import (
+    bulk,
+    dedup,
+    docstore,
+    insert,
+    parse,
+    main,
+    rebuild,
+    search,
+    snapshot,
+)
 from extractor import extract
+import compliance
+import profiling
 
 if __name__ == "__main__":
-    fire.Fire(
-        {
-            "parse": parse,
-            "index": main,
-            "search": search,
-            "extract": extract,
-        }
-    )
+    # `--profile` anywhere on the command line samples the whole command,
+    # e.g. `python cli-fire.py index insert_purpose_pdfs_in_dir ./pdfs --profile`
+    profile_run = "--profile" in sys.argv
+    if profile_run:
+        sys.argv.remove("--profile")
+
+    commands = {
+        "parse": parse,
+        # `import` is a keyword, so the snapshot commands are added by name.
+        "index": {
+            **{k: v for k, v in vars(main).items() if not k.startswith("_")},
+            "clear_table": insert.clear_table,
+            "check_results_in_db": insert.check_results_in_db,
+            "export": snapshot.export,
+            "import": snapshot.import_,
+        },
+        "search": search,
+        "extract": extract,
+        "matrix": compliance,
+        "rebuild": rebuild,
+        "docstore": docstore,
+        "bulk": bulk,
+        "dedup": dedup,
+    }
+    if profile_run:
+        with profiling.profile("cli-" + "-".join(sys.argv[1:3])):
+            fire.Fire(commands)
+    else:
+        fire.Fire(commands)
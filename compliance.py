@@ -0,0 +1,373 @@
+"""
+Precomputed compliance matrix for standard checklists.
+
+A registered checklist (e.g. a DHCS/APL questionnaire) is evaluated offline
+against the indexed corpus by `sync`, which stores one verdict per
+requirement x retrieved policy together with the index version it was
+computed at and the version of each policy document. `/audit` answers a
+requirement found in the matrix straight from it; if the index has changed
+since, retrieval is re-run and only the policies whose documents changed
+are checked again, and the refreshed rows are written back.
+
+    python cli-fire.py matrix register dhcs ./checklists/dhcs.pdf
+    python cli-fire.py matrix sync dhcs
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from datamodels import CitationMatch, PolicyRow, ResponseItem
+from extractor.cite import check_policy
+from extractor.extract import extract_questions
+from extractor.verify import locate, verify_citation
+from indexer.db import get_connection
+from indexer.reader import iter_page_texts
+from indexer.rerank import rerank
+from indexer.search import get_policyprocedure, search_similar_purpose
+from indexer.versions import current_version, document_versions
+from logs import logger
+from metrics import CACHE_REQUESTS, Counter, span, timed
+
+CHECKLIST_TABLE = "checklists"
+MATRIX_TABLE = "compliance_matrix"
+
+USE_MATRIX = os.environ.get("COMPLIANCE_MATRIX", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+MATRIX_TOP_K = int(os.environ.get("MATRIX_TOP_K", 3))
+
+MATRIX_CELLS = Counter(
+    "readily_matrix_cells_total",
+    "Requirement x policy verdicts, reused from the matrix or evaluated",
+    ("result",),
+)
+
+_WORD_RE = re.compile(r"\w+")
+_ready = False
+
+
+@dataclass
+class MatrixCell:
+    file_name: str
+    rank: int
+    doc_version: int
+    is_met: Optional[bool]  # None: not checked (below the rerank cutoff)
+    citation: Optional[str] = None
+    explanation: Optional[str] = None
+    citation_match: Optional[CitationMatch] = None
+
+
+def requirement_key(requirement: str) -> str:
+    """Match requirements regardless of case, punctuation and spacing."""
+    return " ".join(_WORD_RE.findall(requirement.lower()))
+
+
+def create_matrix_tables(cur):
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CHECKLIST_TABLE} (
+            name TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            registered_at TIMESTAMPTZ DEFAULT now()
+        );
+    """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MATRIX_TABLE} (
+            checklist TEXT NOT NULL,
+            requirement_key TEXT NOT NULL,
+            requirement TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            candidate_rank INT NOT NULL,
+            doc_version BIGINT NOT NULL,
+            index_version BIGINT NOT NULL,
+            is_met BOOLEAN,
+            citation TEXT,
+            explanation TEXT,
+            citation_match TEXT,
+            PRIMARY KEY (checklist, requirement_key, file_name)
+        );
+    """
+    )
+
+
+def _ensure():
+    """Create the tables once per process, committed on their own connection."""
+    global _ready
+    if _ready:
+        return
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        create_matrix_tables(cur)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    _ready = True
+
+
+def register(name: str, path: str):
+    """Store a checklist (PDF or text file) under a name, replacing any previous one."""
+    if Path(path).suffix.lower() == ".pdf":
+        content = "".join(iter_page_texts(path))
+    else:
+        content = Path(path).read_text()
+    questions = extract_questions(content)
+    if not questions:
+        raise ValueError(f"No numbered questions found in {path}")
+
+    conn = get_connection()
+    cur = conn.cursor()
+    _ensure()
+    cur.execute(f"DELETE FROM {CHECKLIST_TABLE} WHERE name = %s;", (name,))
+    cur.execute(
+        f"INSERT INTO {CHECKLIST_TABLE} (name, content) VALUES (%s, %s)",
+        (name, content),
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+    logger.info(f"✅ Registered checklist {name} with {len(questions)} questions")
+
+
+def _load_cells(cur, key: str) -> Optional[Tuple[str, int, List[MatrixCell]]]:
+    """Stored cells of a requirement from the most recently synced checklist."""
+    _ensure()
+    cur.execute(
+        f"""
+        SELECT checklist, index_version, file_name, candidate_rank, doc_version,
+            is_met, citation, explanation, citation_match
+        FROM {MATRIX_TABLE} WHERE requirement_key = %s
+    """,
+        (key,),
+    )
+    by_checklist: Dict[str, Tuple[int, List[MatrixCell]]] = {}
+    for checklist, index_version, *cell in cur.fetchall():
+        match = cell[-1]
+        cell[-1] = CitationMatch.model_validate_json(match) if match else None
+        _, cells = by_checklist.setdefault(checklist, (index_version, []))
+        cells.append(MatrixCell(*cell))
+    if not by_checklist:
+        return None
+    checklist = max(by_checklist, key=lambda c: by_checklist[c][0])
+    index_version, cells = by_checklist[checklist]
+    return checklist, index_version, sorted(cells, key=lambda c: c.rank)
+
+
+def _store_cells(
+    cur,
+    checklist: str,
+    requirement: str,
+    cells: List[MatrixCell],
+    index_version: int,
+):
+    key = requirement_key(requirement)
+    cur.execute(
+        f"DELETE FROM {MATRIX_TABLE} WHERE checklist = %s AND requirement_key = %s;",
+        (checklist, key),
+    )
+    for cell in cells:
+        cur.execute(
+            f"""
+            INSERT INTO {MATRIX_TABLE}
+            (checklist, requirement_key, requirement, file_name, candidate_rank,
+            doc_version, index_version, is_met, citation, explanation,
+            citation_match)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+            (
+                checklist,
+                key,
+                requirement,
+                cell.file_name,
+                cell.rank,
+                cell.doc_version,
+                index_version,
+                cell.is_met,
+                cell.citation,
+                cell.explanation,
+                cell.citation_match.model_dump_json() if cell.citation_match else None,
+            ),
+        )
+
+
+@timed("matrix_evaluate")
+def evaluate_requirement(
+    requirement: str,
+    previous: List[MatrixCell],
+    doc_versions: Dict[str, int],
+    top_k: int = MATRIX_TOP_K,
+) -> List[MatrixCell]:
+    """
+    Retrieve the candidate policies of a requirement and give each a verdict,
+    reusing a previous verdict when the policy's document has not changed.
+    """
+    with span("retrieve"):
+        candidates: List[PolicyRow] = []
+        for p in search_similar_purpose(requirement, top_k=top_k):
+            if any(c.file_name == p.file_name for c in candidates):
+                continue
+            row = PolicyRow(
+                file_name=p.file_name, section="policy+procedure", content=""
+            )
+            for section in get_policyprocedure(p.file_name):
+                row.sections.append((section.section, len(row.content)))
+                row.content += section.content
+            candidates.append(row)
+    kept, _ = rerank(requirement, candidates, [c.content for c in candidates])
+    kept_names = {c.file_name for c in kept}
+    ordered = kept + [c for c in candidates if c.file_name not in kept_names]
+    old = {cell.file_name: cell for cell in previous}
+
+    cells = []
+    for rank, policy in enumerate(ordered):
+        version = doc_versions.get(policy.file_name, 0)
+        cell = old.get(policy.file_name)
+        if cell is not None and cell.doc_version == version and cell.is_met is not None:
+            MATRIX_CELLS.inc(result="reused")
+            cell.rank = rank
+        elif policy.file_name not in kept_names:
+            cell = MatrixCell(policy.file_name, rank, version, None)
+        else:
+            MATRIX_CELLS.inc(result="evaluated")
+            with span("check"):
+                result = check_policy(policy.content, requirement)
+            citation = result.get("citation")
+            if isinstance(citation, list):
+                citation = " ... ".join(str(c) for c in citation)
+            match = result.get("citation_match")
+            if result["is_met"] and match is None:
+                match = verify_citation(citation, policy.content)
+            match = locate(match, policy)
+            cell = MatrixCell(
+                policy.file_name,
+                rank,
+                version,
+                bool(result["is_met"]),
+                citation if result["is_met"] else None,
+                result.get("explanation"),
+                match if result["is_met"] else None,
+            )
+        cells.append(cell)
+    return cells
+
+
+def fill_response(item: ResponseItem, cells: List[MatrixCell]) -> ResponseItem:
+    """Turn matrix cells into the same verdict `audit_one` would give."""
+    for cell in cells:
+        if cell.is_met:
+            item.is_met = True
+            item.file_name = cell.file_name
+            item.citation = cell.citation
+            item.citation_match = cell.citation_match
+            return item
+    item.is_met = False
+    item.citation = None
+    item.explanation = "Documents reviewed: " + "; ".join(c.file_name for c in cells)
+    return item
+
+
+@timed("matrix_sync")
+def sync(name: str, top_k: int = MATRIX_TOP_K):
+    """
+    Evaluate a registered checklist against the current index. Requirements
+    already synced at the current index version are skipped; otherwise only
+    policies whose documents changed since the last sync are re-checked.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    _ensure()
+    cur.execute(f"SELECT content FROM {CHECKLIST_TABLE} WHERE name = %s", (name,))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"Unknown checklist: {name}")
+
+    questions = extract_questions(row[0])
+    index_version = current_version(cur)
+    doc_versions = document_versions(cur)
+    evaluated_before = MATRIX_CELLS.value(result="evaluated")
+    skipped = 0
+
+    for i, question in enumerate(questions, 1):
+        stored = _load_cells(cur, requirement_key(question.requirement))
+        previous: List[MatrixCell] = []
+        if stored is not None and stored[0] == name:
+            if stored[1] == index_version:
+                skipped += 1
+                continue
+            previous = stored[2]
+        logger.info(f"Syncing {i}/{len(questions)}: {question.requirement[:50]}...")
+        cells = evaluate_requirement(
+            question.requirement, previous, doc_versions, top_k
+        )
+        _store_cells(cur, name, question.requirement, cells, index_version)
+        conn.commit()
+
+    cur.close()
+    conn.close()
+    evaluated = MATRIX_CELLS.value(result="evaluated") - evaluated_before
+    logger.info(
+        f"✅ Synced checklist {name} at index version {index_version}: "
+        f"{len(questions) - skipped} requirements refreshed, {skipped} up to date, "
+        f"{evaluated:.0f} policy checks run"
+    )
+
+
+class MatrixReader:
+    """
+    Answers requirements from the matrix during one audit, over one
+    connection opened on first use; `close` it when the audit is done.
+    Index versions are read once per audit, on first use.
+    """
+
+    def __init__(self, top_k: int = MATRIX_TOP_K):
+        self.top_k = top_k
+        self._versions: Optional[Tuple[int, Dict[str, int]]] = None
+        self._conn = None
+
+    def _current(self, cur) -> Tuple[int, Dict[str, int]]:
+        if self._versions is None:
+            self._versions = (current_version(cur), document_versions(cur))
+        return self._versions
+
+    @timed("matrix_lookup")
+    def answer(self, item: ResponseItem) -> bool:
+        """Fill `item` from the matrix; False if the requirement is not in it."""
+        if self._conn is None:
+            self._conn = get_connection()
+        cur = self._conn.cursor()
+        try:
+            stored = _load_cells(cur, requirement_key(item.requirement))
+            if stored is None:
+                CACHE_REQUESTS.inc(cache="compliance_matrix", result="miss")
+                return False
+
+            checklist, synced_at, cells = stored
+            index_version, doc_versions = self._current(cur)
+            if synced_at == index_version:
+                CACHE_REQUESTS.inc(cache="compliance_matrix", result="hit")
+            else:
+                CACHE_REQUESTS.inc(cache="compliance_matrix", result="stale")
+                cells = evaluate_requirement(
+                    item.requirement, cells, doc_versions, self.top_k
+                )
+                _store_cells(cur, checklist, item.requirement, cells, index_version)
+                self._conn.commit()
+            fill_response(item, cells)
+            return True
+        finally:
+            cur.close()
+            # Do not sit idle in a transaction while the next question is checked.
+            self._conn.rollback()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
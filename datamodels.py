@@ -1,11 +1,23 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 
 class TextRequest(BaseModel):
     text: str
 
 
+class CitationMatch(BaseModel):
+    verified: bool
+    score: float
+    method: str  # "exact", "fuzzy" or "none"
+    # Where the quote is: the stored section row of the cited document,
+    # character offsets in that row's content, and the 1-based PDF page.
+    section: Optional[str] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
+    page: Optional[int] = None
+
+
 class ResponseItem(BaseModel):
     id: int
     requirement: str
@@ -14,6 +26,32 @@ class ResponseItem(BaseModel):
     citation: Optional[str] = None
     explanation: Optional[str] = None
     top_k: Optional[int] = 3
+    citation_match: Optional[CitationMatch] = None
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one item of /audit_batch, in input order."""
+
+    id: int
+    status: int = 200
+    response: Optional[ResponseItem] = None
+    error: Optional[str] = None
+
+
+class ExtractedQuestion(BaseModel):
+    """Response schema of question extraction."""
+
+    id: int
+    requirement: str
+
+
+class RequirementCheck(BaseModel):
+    """Response schema of a requirement check."""
+
+    is_met: bool
+    citation: Optional[str] = None
+    explanation: Optional[str] = None
+    confidence: Optional[float] = None
 
 
 class PolicyRow(BaseModel):
@@ -22,3 +60,7 @@ class PolicyRow(BaseModel):
     paragraph_id: Optional[int] = None
     content: str
     embedding: Optional[List[float]] = None
+    # Other documents holding a near-duplicate of this paragraph
+    duplicate_files: List[str] = []
+    # (section, offset in `content`) of each stored row joined into `content`
+    sections: List[Tuple[str, int]] = []
@@ -1,30 +1,38 @@
 import os
-import google.generativeai as genai
-import re
+import threading
 
+from datamodels import RequirementCheck
+from extractor.context_cache import context_cache
+from extractor.structured import StructuredOutputError, generate_structured
+from extractor.verify import verify_citation
 from logs import logger
+from metrics import Counter, timed
 
 logger.setLevel("INFO")
 
-# Configure API key
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-
-def check_requirement(policy_text: str, requirement: str) -> dict:
-    """
-    Uses Google Gemini to determine if a requirement is met by a given policy+procedure text.
-    If met, cites the relevant portion word-for-word.
-
-    Args:
-        policy_text (str): Combined policy and procedure section text.
-        requirement (str): Compliance requirement or audit question.
-
-    Returns:
-        dict: { "requirement": str, "is_met": bool, "explanation": str, "citation": str }
-    """
-    model = genai.GenerativeModel("gemini-pro-latest")
-
-    prompt = f"""
+# "single" asks the strongest tier only; "cascade" starts at the first tier
+# and escalates when the answer is unsure or its citation cannot be found.
+CHECK_MODE = os.environ.get("CHECK_MODE", "single").lower()
+CHECK_MODELS = [
+    m.strip()
+    for m in os.environ.get(
+        "CHECK_MODELS", "gemini-flash-latest,gemini-pro-latest"
+    ).split(",")
+    if m.strip()
+]
+CHECK_MIN_CONFIDENCE = float(os.environ.get("CHECK_MIN_CONFIDENCE", 0.8))
+
+CASCADE_CHECKS = Counter(
+    "readily_check_cascade_total",
+    "Cascade answers per model tier: accepted, or escalated and why",
+    ("model", "outcome"),
+)
+
+_stats_lock = threading.Lock()
+_stats = {"checks": 0, "escalations": 0, "answered_by": {}, "reasons": {}}
+
+
+CHECK_PROMPT_PREFIX = """
 You are an expert compliance officer.
 
 You are given:
@@ -39,34 +47,160 @@ Your task:
 
 ---
 
-**Requirement:**
-{requirement}
-
 **Policy + Procedure Text:**
 \"\"\"{policy_text}\"\"\"
+"""
+
+
+def _generate_check(model_name: str, prefix: str, suffix: str) -> RequirementCheck:
+    """Ask the model, sending the document as a cached context when one is held."""
+    with context_cache.lease(model_name, prefix) as cached:
+        if cached is not None:
+            try:
+                contents, config = context_cache.request(cached, suffix)
+                return generate_structured(
+                    model_name,
+                    RequirementCheck,
+                    contents,
+                    "check_requirement",
+                    config=config,
+                )
+            except Exception as e:
+                if not context_cache.is_missing(e):
+                    raise
+                logger.warning(f"Cached context {cached.name} is gone: {e}")
+                context_cache.invalidate(cached)
+    return generate_structured(
+        model_name, RequirementCheck, prefix + suffix, "check_requirement"
+    )
+
+
+@timed("check_requirement")
+def check_requirement(
+    policy_text: str, requirement: str, model_name: str = CHECK_MODELS[-1]
+) -> dict:
+    """
+    Uses Google Gemini to determine if a requirement is met by a given policy+procedure text.
+    If met, cites the relevant portion word-for-word.
+
+    Args:
+        policy_text (str): Combined policy and procedure section text.
+        requirement (str): Compliance requirement or audit question.
+        model_name (str): Gemini model; defaults to the strongest tier.
+
+    Returns:
+        dict: { "requirement": str, "is_met": bool, "explanation": str,
+                "citation": str, "confidence": float, "model": str }
+    """
+
+    # Document first, so every check of the same text shares the prefix.
+    prefix = CHECK_PROMPT_PREFIX.format(policy_text=policy_text)
+    suffix = f"""
+**Requirement:**
+{requirement}
 
 Respond in JSON with the following keys:
 - "is_met": true or false
 - "citation": exact quoted text if met (if any)
 - "explanation": brief reasoning if not met (if any)
+- "confidence": how sure you are of the answer, from 0 to 1
     """
 
-    response = model.generate_content(prompt)
-
-    # Try to parse model output safely
-    text = response.text.strip()
     try:
-        # If model outputs valid JSON
-        import json
+        check = _generate_check(model_name, prefix, suffix)
+        result = check.model_dump()
+    except StructuredOutputError as e:
+        logger.error(f"Requirement check returned no valid answer: {e}")
+        result = {
+            "is_met": None,
+            "citation": None,
+            "explanation": "The model did not return a valid answer.",
+            "confidence": None,
+        }
 
-        logger.debug(f"Model output: {text}")
-        cleaned = re.sub(r"^```(?:json)?", "", text.strip(), flags=re.IGNORECASE)
-        cleaned = re.sub(r"```$", "", cleaned.strip())
+    result["requirement"] = requirement
+    result["model"] = model_name
+    return result
 
-        result = json.loads(cleaned)
-    except Exception:
-        # Fallback if model outputs plain text
-        result = {"is_met": None, "citation": None, "explanation": None}
 
-    result["requirement"] = requirement
+def _escalation_reason(result: dict, policy_text: str):
+    """Why a lower-tier answer is not good enough, or None to accept it."""
+    if result["is_met"] is None:
+        return "invalid"
+    confidence = result.get("confidence")
+    if confidence is None or confidence < CHECK_MIN_CONFIDENCE:
+        return "low_confidence"
+    if result["is_met"]:
+        match = verify_citation(result.get("citation"), policy_text)
+        if match is None or not match.verified:
+            return "unverified_citation"
+        result["citation_match"] = match
+    return None
+
+
+@timed("check_cascade")
+def check_requirement_cascade(policy_text: str, requirement: str) -> dict:
+    """
+    Check a requirement with the cheapest model tier that answers it confidently.
+
+    Each tier but the last is accepted only if it returns a valid answer with
+    confidence >= CHECK_MIN_CONFIDENCE and, when met, a citation that is found
+    in the policy text. Otherwise the next tier in CHECK_MODELS is asked; the
+    last tier's answer is always final.
+
+    Returns:
+        The check_requirement result of the accepted tier, plus "escalations"
+        (number of tiers skipped) and, when verified here, "citation_match".
+    """
+    escalations = 0
+    for model_name in CHECK_MODELS[:-1]:
+        result = check_requirement(policy_text, requirement, model_name)
+        reason = _escalation_reason(result, policy_text)
+        if reason is None:
+            break
+        logger.info(f"Escalating check from {model_name}: {reason}")
+        CASCADE_CHECKS.inc(model=model_name, outcome=f"escalated_{reason}")
+        _record(reason=reason)
+        escalations += 1
+    else:
+        model_name = CHECK_MODELS[-1]
+        result = check_requirement(policy_text, requirement, model_name)
+
+    CASCADE_CHECKS.inc(model=model_name, outcome="accepted")
+    _record(answered_by=model_name, escalations=escalations)
+    result["escalations"] = escalations
     return result
+
+
+def _record(answered_by: str = None, escalations: int = 0, reason: str = None):
+    with _stats_lock:
+        if reason is not None:
+            _stats["reasons"][reason] = _stats["reasons"].get(reason, 0) + 1
+        if answered_by is not None:
+            _stats["checks"] += 1
+            _stats["escalations"] += escalations
+            by = _stats["answered_by"]
+            by[answered_by] = by.get(answered_by, 0) + 1
+
+
+def cascade_stats() -> dict:
+    """Checks answered per tier and how often the cascade escalated, since start."""
+    with _stats_lock:
+        checks = _stats["checks"]
+        escalated = checks - _stats["answered_by"].get(CHECK_MODELS[0], 0)
+        return {
+            "mode": CHECK_MODE,
+            "models": CHECK_MODELS,
+            "checks": checks,
+            "escalations": _stats["escalations"],
+            "escalation_rate": round(escalated / checks, 3) if checks else None,
+            "answered_by": dict(_stats["answered_by"]),
+            "reasons": dict(_stats["reasons"]),
+        }
+
+
+def check_policy(policy_text: str, requirement: str) -> dict:
+    """Check a requirement with the model strategy selected by CHECK_MODE."""
+    if CHECK_MODE == "cascade" and len(CHECK_MODELS) > 1:
+        return check_requirement_cascade(policy_text, requirement)
+    return check_requirement(policy_text, requirement)
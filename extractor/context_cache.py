@@ -0,0 +1,328 @@
+"""
+Reuse of large, repeated prompt prefixes through the provider's context cache.
+
+The same policy+procedure text is sent to `check_requirement` for every
+requirement that retrieves it. Check prompts are therefore split into a
+stable prefix (instructions and document) and a short suffix (the
+requirement). Once a (model, prefix) pair has been seen CONTEXT_CACHE_MIN_USES
+times and is at least CONTEXT_CACHE_MIN_TOKENS long, the prefix is registered
+with the backend, and later calls send only the suffix plus a reference to
+it. The model then does not process the document again.
+
+Backends (CONTEXT_CACHE, opt-in):
+- "gemini": Gemini cached content (`client.caches`), billed per hour stored;
+- "local": keeps prefixes in the process and sends the joined prompt, a
+  stand-in for tests and the offline benchmarks;
+- "off" (default).
+
+Entries are reference counted while calls use them. They are renewed when
+less than half their TTL is left. They are deleted once unused and expired,
+evicted (least recently used beyond CONTEXT_CACHE_MAX_ENTRIES) or rejected
+by the provider.
+"""
+
+import hashlib
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+from google.genai import types
+
+import limiter
+from extractor import structured
+from logs import logger
+from metrics import CACHE_REQUESTS, Counter, Gauge
+
+BACKEND = os.environ.get("CONTEXT_CACHE", "off").lower()
+# Gemini refuses cached content below a model-dependent minimum size.
+MIN_TOKENS = int(os.environ.get("CONTEXT_CACHE_MIN_TOKENS", 4096))
+MIN_USES = int(os.environ.get("CONTEXT_CACHE_MIN_USES", 2))
+TTL_SECONDS = float(os.environ.get("CONTEXT_CACHE_TTL", 900))
+MAX_ENTRIES = int(os.environ.get("CONTEXT_CACHE_MAX_ENTRIES", 64))
+# Entries this close to expiry are not handed out any more.
+EXPIRY_MARGIN = 30.0
+USE_HISTORY = 4096
+
+CONTEXT_EVENTS = Counter(
+    "readily_context_cache_events_total",
+    "Cached contexts created, renewed, evicted, expired, invalidated or failed",
+    ("model", "event"),
+)
+CONTEXT_ENTRIES = Gauge(
+    "readily_context_cache_entries", "Cached contexts held by this process"
+)
+
+
+class ContextBackend(ABC):
+    """A provider of cached prompt prefixes."""
+
+    @abstractmethod
+    def create(self, model: str, prefix: str, ttl: float) -> Tuple[str, float]:
+        """Register a prefix; returns (name, expiry as a UNIX time)."""
+
+    @abstractmethod
+    def extend(self, model: str, name: str, ttl: float) -> float:
+        """Push an entry's expiry to `ttl` seconds from now; returns it."""
+
+    @abstractmethod
+    def delete(self, model: str, name: str):
+        """Remove an entry."""
+
+    @abstractmethod
+    def request(self, name: str, suffix: str) -> Tuple[str, dict]:
+        """(contents, extra GenerateContentConfig fields) for a call on an entry."""
+
+    def is_missing(self, error: Exception) -> bool:
+        """Whether a call failed because the entry is gone on the provider side."""
+        return False
+
+
+class GeminiContextBackend(ContextBackend):
+    def __init__(self, genai_client=None):
+        self._client = genai_client
+
+    @property
+    def client(self):
+        return self._client or structured.client
+
+    # Cache calls count against the model's quota like generate_content, so
+    # they go through the same limiter.
+    def create(self, model: str, prefix: str, ttl: float) -> Tuple[str, float]:
+        cached = limiter.call(
+            model,
+            lambda: self.client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=[prefix], ttl=f"{int(ttl)}s", display_name="readily-check"
+                ),
+            ),
+            tokens=limiter.estimate_tokens(prefix),
+        )
+        expire_time = getattr(cached, "expire_time", None)
+        return cached.name, (
+            expire_time.timestamp() if expire_time else time.time() + ttl
+        )
+
+    def extend(self, model: str, name: str, ttl: float) -> float:
+        limiter.call(
+            model,
+            lambda: self.client.caches.update(
+                name=name, config=types.UpdateCachedContentConfig(ttl=f"{int(ttl)}s")
+            ),
+        )
+        return time.time() + ttl
+
+    def delete(self, model: str, name: str):
+        limiter.call(model, lambda: self.client.caches.delete(name=name))
+
+    def request(self, name: str, suffix: str) -> Tuple[str, dict]:
+        return suffix, {"cached_content": name}
+
+    def is_missing(self, error: Exception) -> bool:
+        code = getattr(error, "code", None)
+        return code in (403, 404) or (code == 400 and "cache" in str(error).lower())
+
+
+class LocalContextBackend(ContextBackend):
+    """In-process stand-in: stores prefixes and re-joins them on each call."""
+
+    def __init__(self):
+        self.prefixes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def create(self, model: str, prefix: str, ttl: float) -> Tuple[str, float]:
+        name = f"local/{uuid.uuid4().hex}"
+        with self._lock:
+            self.prefixes[name] = prefix
+        return name, time.time() + ttl
+
+    def extend(self, model: str, name: str, ttl: float) -> float:
+        return time.time() + ttl
+
+    def delete(self, model: str, name: str):
+        with self._lock:
+            self.prefixes.pop(name, None)
+
+    def request(self, name: str, suffix: str) -> Tuple[str, dict]:
+        with self._lock:
+            return self.prefixes[name] + suffix, {}
+
+    def is_missing(self, error: Exception) -> bool:
+        return isinstance(error, KeyError)
+
+
+@dataclass
+class CachedContext:
+    key: str
+    model: str
+    name: str
+    expires_at: float
+    refs: int = 0
+    last_used: float = 0.0
+    stale: bool = False
+
+
+class ContextCache:
+    def __init__(
+        self,
+        backend: Optional[ContextBackend],
+        min_tokens: int = MIN_TOKENS,
+        min_uses: int = MIN_USES,
+        ttl: float = TTL_SECONDS,
+        max_entries: int = MAX_ENTRIES,
+    ):
+        self.backend = backend
+        self.min_tokens = min_tokens
+        self.min_uses = min_uses
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, CachedContext] = {}
+        self._uses: "OrderedDict[str, int]" = OrderedDict()
+        self._pending: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, prefix: str) -> str:
+        return hashlib.sha256(f"{model}\0{prefix}".encode()).hexdigest()
+
+    @contextmanager
+    def lease(self, model: str, prefix: str) -> Iterator[Optional[CachedContext]]:
+        """The cached context for a prefix, held for the block, or None."""
+        entry = self._acquire(model, prefix)
+        try:
+            yield entry
+        finally:
+            if entry is not None:
+                self._release(entry)
+
+    def request(self, entry: CachedContext, suffix: str) -> Tuple[str, dict]:
+        return self.backend.request(entry.name, suffix)
+
+    def is_missing(self, error: Exception) -> bool:
+        return self.backend is not None and self.backend.is_missing(error)
+
+    def invalidate(self, entry: CachedContext):
+        """Stop using an entry the provider no longer has; deleted on release."""
+        with self._lock:
+            entry.stale = True
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+        CONTEXT_EVENTS.inc(model=entry.model, event="invalidated")
+        CONTEXT_ENTRIES.set(len(self._entries))
+
+    # ---- internals ----
+
+    def _acquire(self, model: str, prefix: str) -> Optional[CachedContext]:
+        if self.backend is None or limiter.estimate_tokens(prefix) < self.min_tokens:
+            return None
+        key = self.key(model, prefix)
+        now = time.time()
+        expired = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at - EXPIRY_MARGIN > now:
+                entry.refs += 1
+                entry.last_used = now
+                renew = (
+                    entry.expires_at - now < self.ttl / 2 and key not in self._pending
+                )
+                if renew:
+                    self._pending.add(key)
+            else:
+                if entry is not None:
+                    expired = self._unlink(entry)
+                    entry = None
+                uses = self._uses.pop(key, 0) + 1
+                self._uses[key] = uses
+                while len(self._uses) > USE_HISTORY:
+                    self._uses.popitem(last=False)
+                create = uses >= self.min_uses and key not in self._pending
+                if create:
+                    self._pending.add(key)
+
+        if expired is not None:
+            CONTEXT_EVENTS.inc(model=model, event="expired")
+            self._delete(expired)
+        if entry is not None:
+            CACHE_REQUESTS.inc(cache="context", result="hit")
+            if renew:
+                self._renew(entry)
+            return entry
+        CACHE_REQUESTS.inc(cache="context", result="miss")
+        return self._create(key, model, prefix) if create else None
+
+    def _unlink(self, entry: CachedContext) -> Optional[CachedContext]:
+        """Forget an entry (lock held); returns it if it can be deleted now."""
+        entry.stale = True
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+        return entry if entry.refs == 0 else None
+
+    def _create(self, key: str, model: str, prefix: str) -> Optional[CachedContext]:
+        try:
+            name, expires_at = self.backend.create(model, prefix, self.ttl)
+        except Exception as e:
+            logger.warning(f"Could not cache context for {model}: {e}")
+            CONTEXT_EVENTS.inc(model=model, event="failed")
+            return None
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+        CONTEXT_EVENTS.inc(model=model, event="created")
+
+        entry = CachedContext(key, model, name, expires_at, 1, time.time())
+        with self._lock:
+            self._entries[key] = entry
+            idle = sorted(
+                (e for e in self._entries.values() if e.refs == 0),
+                key=lambda e: e.last_used,
+            )
+            excess = max(0, len(self._entries) - self.max_entries)
+            evicted = [self._unlink(e) for e in idle[:excess]]
+        for e in evicted:
+            CONTEXT_EVENTS.inc(model=e.model, event="evicted")
+            self._delete(e)
+        CONTEXT_ENTRIES.set(len(self._entries))
+        return entry
+
+    def _renew(self, entry: CachedContext):
+        try:
+            entry.expires_at = self.backend.extend(entry.model, entry.name, self.ttl)
+            CONTEXT_EVENTS.inc(model=entry.model, event="renewed")
+        except Exception as e:
+            logger.warning(f"Could not renew cached context {entry.name}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(entry.key)
+
+    def _release(self, entry: CachedContext):
+        with self._lock:
+            entry.refs -= 1
+            delete = entry.refs == 0 and entry.stale
+        if delete:
+            self._delete(entry)
+
+    def _delete(self, entry: CachedContext):
+        try:
+            self.backend.delete(entry.model, entry.name)
+        except Exception as e:
+            # Expired entries are removed by the provider itself.
+            logger.debug(f"Could not delete cached context {entry.name}: {e}")
+        CONTEXT_ENTRIES.set(len(self._entries))
+
+
+def _backend() -> Optional[ContextBackend]:
+    if BACKEND == "gemini":
+        return GeminiContextBackend()
+    if BACKEND == "local":
+        return LocalContextBackend()
+    return None
+
+
+context_cache = ContextCache(_backend())
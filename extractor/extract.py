@@ -1,11 +1,22 @@
-from google import genai
-import json
+import contextvars
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from logs import logger
 from typing import List, Dict, Optional
-from datamodels import ResponseItem
+from datamodels import ExtractedQuestion, ResponseItem
+from extractor.structured import StructuredOutputError, generate_structured
+import limiter
+from metrics import timed
 
-client = genai.Client()
+# Texts longer than CHUNK_CHARS are extracted in chunks of about that size.
+CHUNK_CHARS = int(os.environ.get("EXTRACT_CHUNK_CHARS", 12000))
+CHUNK_OVERLAP = int(os.environ.get("EXTRACT_CHUNK_OVERLAP", 1))  # question units
+CHUNK_CONCURRENCY = int(os.environ.get("EXTRACT_CHUNK_CONCURRENCY", 4))
+CHUNK_RETRIES = int(os.environ.get("EXTRACT_CHUNK_RETRIES", 2))
+
+_QUESTION_START_RE = re.compile(r"^\s*\d+[.)]\s")
+_WORD_RE = re.compile(r"\w+")
 
 
 def extract_questions(text: str) -> List[ResponseItem]:
@@ -22,19 +33,24 @@ def extract_questions(text: str) -> List[ResponseItem]:
     return responses
 
 
-def extract_compliance_questions(text: str) -> List[ResponseItem]:
+@timed("extract_compliance_questions")
+def extract_compliance_questions(
+    text: str, chunked: Optional[bool] = None
+) -> List[ResponseItem]:
     """
     Extract audit or compliance questions from the given text using Gemini AI.
 
     Args:
         text (str): The input text to analyze for compliance questions
+        chunked (Optional[bool]): Split the text and extract from the chunks
+            concurrently. By default only texts longer than CHUNK_CHARS are split.
 
     Returns:
-        List[Dict[str, str]]: A list of dictionaries containing id and requirement
+        List[ResponseItem]: Questions with sequential ids starting from 1
 
     Raises:
         ValueError: If text is empty or None
-        json.JSONDecodeError: If the model response is not valid JSON
+        StructuredOutputError: If the model response does not match the schema
         Exception: For other API or processing errors
     """
     # Input validation
@@ -44,8 +60,19 @@ def extract_compliance_questions(text: str) -> List[ResponseItem]:
     # Clean and prepare the text
     cleaned_text = _preprocess_text(text)
 
-    # Create the prompt
-    prompt = f"""
+    if chunked is None:
+        chunked = len(cleaned_text) > CHUNK_CHARS
+    if not chunked:
+        questions = _extract_from_text(cleaned_text)
+    else:
+        questions = _extract_chunked(cleaned_text)
+
+    logger.info(f"Successfully extracted {len(questions)} compliance questions")
+    return [ResponseItem(**question) for question in questions]
+
+
+def _build_prompt(cleaned_text: str) -> str:
+    return f"""
 You are an expert compliance officer tasked with extracting audit and compliance questions from text.
 
 Please analyze the following text and extract ALL audit or compliance related questions.
@@ -72,61 +99,160 @@ Text to analyze:
 {cleaned_text}
 """
 
+
+def _extract_from_text(cleaned_text: str) -> List[Dict]:
+    """
+    One model call over preprocessed text. Returns validated question dicts
+    numbered from 1.
+    """
+    prompt = _build_prompt(cleaned_text)
+
     try:
         # Generate response from Gemini
         logger.info("Generating content from Gemini model...")
-        response = client.models.generate_content(
-            model="gemini-flash-latest", contents=prompt
+        questions = generate_structured(
+            "gemini-flash-latest",
+            List[ExtractedQuestion],
+            prompt,
+            "extract_questions",
         )
 
-        if not response or not response.text:
-            logger.warning("Empty response from model")
-            return []
-
-        # Clean the response text (remove markdown formatting if present)
-        cleaned_response = _clean_model_response(response.text)
-
-        # Parse JSON response
-        questions = json.loads(cleaned_response)
-
-        # Validate response format
-        if not isinstance(questions, list):
-            logger.error(f"Expected list from model, got {type(questions)}")
-            return []
-
-        # Validate each question object
+        # Keep only real questions, numbered in order
         validated_questions = []
-        for i, question in enumerate(questions, 1):
+        for question in questions:
+            question = question.model_dump()
             if _is_valid_question(question):
-                # Ensure id matches the sequential order
-                question["id"] = i
-                # Validate that we can create a ResponseItem from this data
-                try:
-                    ResponseItem(**question)
-                    validated_questions.append(question)
-                except Exception as e:
-                    logger.warning(
-                        f"Skipping question that cannot be converted to ResponseItem: {question}, error: {e}"
-                    )
+                question["id"] = len(validated_questions) + 1
+                validated_questions.append(question)
             else:
                 logger.warning(f"Skipping invalid question format: {question}")
 
-        logger.info(
-            f"Successfully extracted {len(validated_questions)} compliance questions"
-        )
-        return [ResponseItem(**question) for question in validated_questions]
+        return validated_questions
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse JSON response: {e}")
-        logger.error(f"Response text: {response.text if response else 'No response'}")
-        raise json.JSONDecodeError(
-            f"Invalid JSON response from model: {e}", e.doc, e.pos
-        )
+    except (limiter.RateLimitError, StructuredOutputError):
+        raise
     except Exception as e:
         logger.error(f"Error extracting compliance questions: {e}")
         raise Exception(f"Failed to extract compliance questions: {str(e)}")
 
 
+def _split_units(cleaned_text: str) -> List[str]:
+    """
+    Split text into units that each start at a numbered question (the text
+    before the first question is a unit of its own). A unit longer than
+    CHUNK_CHARS is further split on line boundaries.
+    """
+    units: List[str] = []
+    current: List[str] = []
+    for line in cleaned_text.split("\n"):
+        if _QUESTION_START_RE.match(line) and current:
+            units.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        units.append("\n".join(current))
+
+    split_units = []
+    for unit in units:
+        while len(unit) > CHUNK_CHARS:
+            cut = unit.rfind("\n", 0, CHUNK_CHARS)
+            if cut <= 0:
+                cut = CHUNK_CHARS
+            split_units.append(unit[:cut])
+            unit = unit[cut:].lstrip("\n")
+        split_units.append(unit)
+    return split_units
+
+
+def _chunk_text(cleaned_text: str) -> List[str]:
+    """
+    Pack question units into chunks of at most about CHUNK_CHARS characters.
+    Each chunk starts with the last CHUNK_OVERLAP units of the previous one,
+    so a question cut off at a boundary is seen whole by one of the chunks.
+    """
+    units = _split_units(cleaned_text)
+    chunks: List[str] = []
+    start = 0
+    while start < len(units):
+        end = start
+        size = 0
+        while end < len(units) and (
+            end == start or size + len(units[end]) <= CHUNK_CHARS
+        ):
+            size += len(units[end]) + 1
+            end += 1
+        chunks.append("\n".join(units[start:end]))
+        if end >= len(units):
+            break
+        # Step back for the overlap, but always make progress.
+        start = max(start + 1, end - CHUNK_OVERLAP)
+    return chunks
+
+
+def _extract_chunk(index: int, chunk: str) -> List[Dict]:
+    """Extract one chunk, retrying only this chunk when it fails."""
+    for attempt in range(1, CHUNK_RETRIES + 2):
+        try:
+            return _extract_from_text(chunk)
+        except limiter.RateLimitError:
+            # The limiter has already retried with backoff.
+            raise
+        except Exception as e:
+            if attempt > CHUNK_RETRIES:
+                raise
+            logger.warning(
+                f"Chunk {index} extraction failed (attempt {attempt}), retrying: {e}"
+            )
+
+
+def _question_key(question: Dict) -> str:
+    return " ".join(_WORD_RE.findall(question["requirement"].lower()))
+
+
+def _overlap_length(previous: List[Dict], current: List[Dict]) -> int:
+    """
+    Number of leading questions of `current` that repeat the trailing
+    questions of `previous`, i.e. that were extracted from the overlap.
+    """
+    longest = min(CHUNK_OVERLAP, len(previous), len(current))
+    for m in range(longest, 0, -1):
+        tail = [_question_key(q) for q in previous[-m:]]
+        head = [_question_key(q) for q in current[:m]]
+        if tail == head:
+            return m
+    return 0
+
+
+def _extract_chunked(cleaned_text: str) -> List[Dict]:
+    """
+    Extract from the chunks concurrently, then merge in document order,
+    dropping the questions each chunk repeats from the previous chunk's
+    overlap and renumbering. Questions repeated elsewhere in the document
+    are kept, as in single-pass extraction.
+    """
+    chunks = _chunk_text(cleaned_text)
+    logger.info(f"Extracting questions from {len(chunks)} chunks")
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(CHUNK_CONCURRENCY, len(chunks)))
+    ) as pool:
+        # Run in a copy of the caller's context so spans reach its trace.
+        futures = [
+            pool.submit(contextvars.copy_context().run, _extract_chunk, i, chunk)
+            for i, chunk in enumerate(chunks, 1)
+        ]
+        results = [f.result() for f in futures]
+
+    merged: List[Dict] = []
+    previous: List[Dict] = []
+    for questions in results:
+        for question in questions[_overlap_length(previous, questions) :]:
+            question["id"] = len(merged) + 1
+            merged.append(question)
+        previous = questions
+    return merged
+
+
 def _preprocess_text(text: str) -> str:
     """Clean and prepare text for analysis."""
     if not text:
@@ -142,21 +268,6 @@ def _preprocess_text(text: str) -> str:
     return cleaned
 
 
-def _clean_model_response(response_text: str) -> str:
-    """Clean the model's response text."""
-    if not response_text:
-        return ""
-
-    # Remove markdown code block formatting if present
-    cleaned = re.sub(r"```json\s*", "", response_text)
-    cleaned = re.sub(r"```\s*$", "", cleaned)
-
-    # Remove any leading/trailing whitespace
-    cleaned = cleaned.strip()
-
-    return cleaned
-
-
 def _is_valid_question(question: Dict) -> bool:
     """Validate that a question object has the required format."""
     if not isinstance(question, dict):
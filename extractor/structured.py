@@ -0,0 +1,141 @@
+import json
+import os
+import re
+from typing import Any, Optional
+
+from google import genai
+from google.genai import types
+from pydantic import TypeAdapter, ValidationError
+
+import limiter
+from logs import logger
+from metrics import Counter, record_llm_call
+
+client = genai.Client()
+
+# Extra model calls allowed when an output is invalid and cannot be repaired locally.
+STRUCTURED_RETRIES = int(os.environ.get("STRUCTURED_RETRIES", 1))
+
+STRUCTURED_REPAIRS = Counter(
+    "readily_structured_output_repairs_total",
+    "Gemini outputs that failed schema validation, by how they were resolved",
+    ("model", "operation", "outcome"),
+)
+
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", flags=re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+
+
+class StructuredOutputError(ValueError):
+    """The model did not return output matching the schema, even after repair and retries."""
+
+
+def _repair(text: str) -> str:
+    """
+    Cheap local fixes for near-miss JSON: markdown fences, prose around the
+    JSON value and trailing commas.
+    """
+    text = _FENCE_RE.sub("", text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        start = min(starts)
+        try:
+            # raw_decode stops at the end of the first complete value.
+            _, end = json.JSONDecoder().raw_decode(text, start)
+            return text[start:end]
+        except json.JSONDecodeError:
+            text = text[start:]
+    return _TRAILING_COMMA_RE.sub(r"\1", text)
+
+
+def _validate(adapter: TypeAdapter, response) -> Any:
+    """Validate the SDK's parsed object if it has one, otherwise the raw text."""
+    parsed = getattr(response, "parsed", None)
+    if parsed is not None:
+        return adapter.validate_python(parsed, from_attributes=True)
+    return adapter.validate_json(response.text or "")
+
+
+def generate_structured(
+    model: str,
+    schema: Any,
+    prompt: str,
+    operation: str,
+    config: Optional[dict] = None,
+) -> Any:
+    """
+    Call Gemini with a response schema and return the validated result.
+
+    The schema (a pydantic model or e.g. list[Model]) is sent as the response
+    schema, so the model is constrained to it, and the answer is validated in
+    one step. Invalid output is first repaired locally; only if that fails is
+    the model asked again, with the validation error in the prompt.
+
+    Args:
+        model: Gemini model name.
+        schema: Pydantic model or type accepted by pydantic.TypeAdapter.
+        prompt: The prompt.
+        operation: Operation label for metrics.
+        config: Extra GenerateContentConfig fields.
+
+    Returns:
+        An instance of `schema`.
+
+    Raises:
+        StructuredOutputError: If no valid output was obtained.
+        limiter.RateLimitError: If Gemini is still throttling after retries.
+    """
+    adapter = TypeAdapter(schema)
+    generate_config = types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=schema,
+        **(config or {}),
+    )
+
+    contents = prompt
+    error = None
+    for attempt in range(STRUCTURED_RETRIES + 1):
+        try:
+            response = limiter.call(
+                model,
+                lambda: client.models.generate_content(
+                    model=model, contents=contents, config=generate_config
+                ),
+                tokens=limiter.estimate_tokens(contents),
+            )
+        except Exception as e:
+            record_llm_call(model, operation, error=e)
+            raise
+        record_llm_call(model, operation, response, len(contents))
+
+        try:
+            result = _validate(adapter, response)
+            if attempt:
+                STRUCTURED_REPAIRS.inc(
+                    model=model, operation=operation, outcome="retried"
+                )
+            return result
+        except ValidationError as e:
+            error = e
+            text = response.text or ""
+
+        try:
+            result = adapter.validate_json(_repair(text))
+            STRUCTURED_REPAIRS.inc(model=model, operation=operation, outcome="repaired")
+            logger.debug(f"Repaired {operation} output from {model}")
+            return result
+        except ValidationError as e:
+            error = e
+
+        logger.warning(
+            f"Invalid {operation} output from {model} (attempt {attempt + 1}): "
+            f"{error.errors()[0]['msg'] if error.errors() else error}"
+        )
+        contents = (
+            f"{prompt}\n\nYour previous answer was not valid:\n{text[:2000]}\n\n"
+            f"Validation errors: {error}\n"
+            "Answer again with JSON that matches the response schema exactly."
+        )
+
+    STRUCTURED_REPAIRS.inc(model=model, operation=operation, outcome="failed")
+    raise StructuredOutputError(f"Invalid {operation} output from {model}: {error}")
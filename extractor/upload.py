@@ -0,0 +1,135 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from datamodels import ResponseItem
+from extractor.extract import extract_questions
+from indexer.reader import iter_page_texts
+from logs import logger
+from metrics import CACHE_REQUESTS, timed
+
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", 20)) * 1024 * 1024)
+QUESTION_CACHE_SIZE = int(os.environ.get("PDF_QUESTION_CACHE_SIZE", 128))
+
+
+class UploadTooLarge(Exception):
+    """The uploaded file exceeds MAX_UPLOAD_MB."""
+
+
+async def read_pdf_upload(
+    request, field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES
+) -> Tuple[bytes, str]:
+    """
+    Read one file field of a multipart/form-data request straight into memory.
+
+    The body is parsed while it streams in, so nothing is spooled to a
+    temporary file, the size limit is enforced before the whole upload has
+    arrived, and the SHA-256 is computed on the fly.
+
+    Returns:
+        (file bytes, hex SHA-256 digest)
+    Raises:
+        ValueError: If the request is not multipart, lacks the field or is not a PDF
+        UploadTooLarge: If the file is larger than `max_bytes`
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("Expected a multipart/form-data upload")
+
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes + 64 * 1024:
+        raise UploadTooLarge(f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+
+    data = bytearray()
+    hasher = hashlib.sha256()
+    state = {"header": b"", "value": b"", "headers": {}, "capture": False}
+    found = []
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(chunk, start, end):
+        state["header"] += chunk[start:end]
+
+    def on_header_value(chunk, start, end):
+        state["value"] += chunk[start:end]
+
+    def on_header_end():
+        state["headers"][state["header"].lower()] = state["value"]
+        state["header"] = state["value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(
+            state["headers"].get(b"content-disposition", b"")
+        )
+        state["capture"] = not found and disposition.get(b"name") == field.encode()
+
+    def on_part_data(chunk, start, end):
+        if not state["capture"]:
+            return
+        if len(data) + (end - start) > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+        data.extend(chunk[start:end])
+        hasher.update(chunk[start:end])
+
+    def on_part_end():
+        if state["capture"]:
+            found.append(True)
+            state["capture"] = False
+
+    parser = MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+    async for chunk in request.stream():
+        parser.write(chunk)
+    parser.finalize()
+
+    if not found:
+        raise ValueError(f"Missing file field '{field}'")
+    if not data.startswith(b"%PDF"):
+        raise ValueError("Uploaded file is not a PDF")
+    return bytes(data), hasher.hexdigest()
+
+
+# Parsed questions per PDF digest, most recently used last.
+_question_cache: "OrderedDict[str, List[Tuple[int, str]]]" = OrderedDict()
+_question_cache_lock = threading.Lock()
+
+
+@timed("extract_pdf_questions")
+def extract_pdf_questions(data: bytes, digest: str) -> List[ResponseItem]:
+    """
+    Extract the numbered questions of an uploaded questionnaire PDF.
+    Re-uploads of the same file (same digest) skip parsing.
+    """
+    with _question_cache_lock:
+        cached = _question_cache.get(digest)
+        if cached is not None:
+            _question_cache.move_to_end(digest)
+    if cached is not None:
+        CACHE_REQUESTS.inc(cache="pdf_questions", result="hit")
+        logger.info(f"Reusing {len(cached)} parsed questions for upload {digest[:12]}")
+    else:
+        CACHE_REQUESTS.inc(cache="pdf_questions", result="miss")
+        text = "".join(iter_page_texts(data))
+        cached = [(q.id, q.requirement) for q in extract_questions(text)]
+        with _question_cache_lock:
+            _question_cache[digest] = cached
+            while len(_question_cache) > QUESTION_CACHE_SIZE:
+                _question_cache.popitem(last=False)
+
+    # Fresh items every time: the audit fills them in place.
+    return [ResponseItem(id=i, requirement=r) for i, r in cached]
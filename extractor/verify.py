@@ -0,0 +1,200 @@
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import List, Optional
+
+from datamodels import CitationMatch, PolicyRow
+from indexer.docstore import page_of
+from logs import logger
+
+# Map typographic quotes and dashes to ASCII one-to-one, so that offsets in the
+# normalised text are offsets in the original text.
+_TRANSLATION = str.maketrans(
+    {
+        "‘": "'",
+        "’": "'",
+        "‚": "'",
+        "‛": "'",
+        "“": '"',
+        "”": '"',
+        "„": '"',
+        "–": "-",
+        "—": "-",
+        "−": "-",
+        "\u00a0": " ",  # non-breaking space
+    }
+)
+_WORD_RE = re.compile(r"\w+")
+_TOKEN_RE = re.compile(r"\S+")
+_ELLIPSIS_RE = re.compile(r"\s*(?:\.\.\.|…|\[\.\.\.\])\s*")
+_QUOTES = "\"'` "
+
+SHINGLE = 3
+MIN_SCORE = 0.6
+
+
+def _normalise(text: str) -> str:
+    """Lowercase and ASCII-fold punctuation while keeping character offsets."""
+    folded = text.translate(_TRANSLATION)
+    lowered = folded.lower()
+    # A handful of characters change length when lowercased; keep offsets exact.
+    return lowered if len(lowered) == len(folded) else folded
+
+
+@lru_cache(maxsize=64)
+def _normalised_source(source: str) -> str:
+    return _normalise(source)
+
+
+@lru_cache(maxsize=64)
+def _source_index(source: str):
+    """Word spans and a hashed word k-gram -> positions index, built only for fuzzy matching."""
+    norm = _normalised_source(source)
+    spans = [m.span() for m in _WORD_RE.finditer(norm)]
+    words = [norm[s:e] for s, e in spans]
+    index: dict[int, list[int]] = {}
+    shingles = zip(*(words[k:] for k in range(SHINGLE)))
+    for i, shingle in enumerate(shingles):
+        index.setdefault(hash(shingle), []).append(i)
+    return spans, words, index
+
+
+def _exact(segment: str, norm_source: str) -> Optional[tuple[int, int]]:
+    tokens = _TOKEN_RE.findall(_normalise(segment).strip(_QUOTES))
+    if not tokens:
+        return None
+    pattern = r"\s+".join(re.escape(t) for t in tokens)
+    match = re.search(pattern, norm_source)
+    return (match.start(), match.end()) if match else None
+
+
+def _fuzzy(segment: str, source: str) -> tuple[float, Optional[tuple[int, int]]]:
+    """
+    Align the segment's word k-grams against the hashed k-gram index of the
+    source and vote on the diagonal (source position - segment position).
+    """
+    spans, words, index = _source_index(source)
+    seg_words = _WORD_RE.findall(_normalise(segment))
+    if not seg_words or not words:
+        return 0.0, None
+
+    k = min(SHINGLE, len(seg_words))
+    votes: dict[int, int] = {}
+    if k == SHINGLE:
+        for j in range(len(seg_words) - k + 1):
+            for i in index.get(hash(tuple(seg_words[j : j + k])), ()):
+                votes[i - j] = votes.get(i - j, 0) + 1
+    else:
+        for i in range(len(words) - k + 1):
+            if words[i : i + k] == seg_words:
+                votes[i] = votes.get(i, 0) + 1
+    if not votes:
+        return 0.0, None
+
+    diagonal = max(votes, key=votes.get)
+    total = len(seg_words) - k + 1
+    score = min(1.0, votes[diagonal] / total)
+
+    first = max(0, diagonal)
+    last = min(len(spans), diagonal + len(seg_words)) - 1
+    if last < first:
+        return 0.0, None
+    return score, (spans[first][0], spans[last][1])
+
+
+def verify_citation(
+    citation: Optional[str],
+    source: str,
+    page_offsets: Optional[List[int]] = None,
+    min_score: float = MIN_SCORE,
+) -> Optional[CitationMatch]:
+    """
+    Locate a model-quoted citation in the text it was supposedly quoted from.
+
+    Exact matching runs on text normalised for case, quotes, dashes and
+    whitespace; if that fails, a hashed word-k-gram alignment finds the best
+    fuzzy span. Quotes elided with "..." are matched segment by segment.
+
+    Args:
+        citation: The quote returned by the model.
+        source: The policy/procedure text sent to the model.
+        page_offsets: Character offset at which each page starts in `source`;
+            pages in the result are 1-based.
+        min_score: Fuzzy score below which the quote is marked as not found.
+
+    Returns:
+        CitationMatch with character span in `source`, page, score and
+        `verified` flag, or None if there is no citation to check. See
+        `locate` for spans relative to the stored section rows.
+    """
+    if not citation or not citation.strip() or not source:
+        return None
+
+    norm_source = _normalised_source(source)
+    segments = [s for s in _ELLIPSIS_RE.split(citation) if s.strip(_QUOTES + ".")]
+    if not segments:
+        return None
+
+    method = "exact"
+    weighted_score = 0.0
+    total_words = 0
+    start = end = None
+    for segment in segments:
+        n_words = max(1, len(_WORD_RE.findall(segment)))
+        span = _exact(segment, norm_source)
+        score = 1.0
+        if span is None:
+            method = "fuzzy"
+            score, span = _fuzzy(segment, source)
+        weighted_score += score * n_words
+        total_words += n_words
+        if span is not None:
+            start = span[0] if start is None else min(start, span[0])
+            end = span[1] if end is None else max(end, span[1])
+
+    score = weighted_score / total_words
+    verified = score >= min_score and start is not None
+    page = None
+    if page_offsets and start is not None:
+        page = bisect_right(page_offsets, start)
+
+    return CitationMatch(
+        verified=verified,
+        score=round(score, 3),
+        method=method if verified else "none",
+        start=start if verified else None,
+        end=end if verified else None,
+        page=page if verified else None,
+    )
+
+
+def locate(match: Optional[CitationMatch], row: PolicyRow) -> Optional[CitationMatch]:
+    """
+    Re-express a verified match on `row.content` against the stored section
+    row it falls in (`row.sections` lists the rows joined into it) and add
+    the PDF page from the document store. Other matches pass through.
+    """
+    if match is None or not match.verified or match.start is None:
+        return match
+    if match.section is not None:
+        return match  # already located
+    sections = row.sections or [(row.section, 0)]
+    starts = [offset for _, offset in sections]
+    i = max(0, bisect_right(starts, match.start) - 1)
+    name, offset = sections[i]
+    section_end = starts[i + 1] if i + 1 < len(starts) else len(row.content)
+    end = min(match.end, section_end)
+    page = match.page
+    if page is None:
+        try:
+            page = page_of(row.file_name, row.content[match.start : end])
+        except Exception as e:  # the page is a nicety, never fail the audit
+            logger.debug(f"No page for citation in {row.file_name}: {e}")
+    return match.model_copy(
+        update={
+            "section": name,
+            "start": match.start - offset,
+            "end": end - offset,
+            "page": page,
+        }
+    )
@@ -0,0 +1,167 @@
+"""
+Cached liveness and readiness state.
+
+A daemon thread refreshes a status snapshot every HEALTH_REFRESH_SECONDS over
+one connection: row estimates from the Postgres catalog (pg_class.reltuples,
+maintained by ANALYZE/autovacuum, no table scan), document counts from the
+index manifest and the index version. Probes only read that snapshot plus
+in-process state (request thread pool and Gemini limiters), so they never
+touch the database themselves.
+
+Ready means: the snapshot is fresh, the database answered, every served
+table has documents, the request thread pool has free threads and no Gemini
+model is both saturated and being throttled.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import limiter
+from indexer.db import get_connection
+from indexer.versions import MANIFEST_TABLE, current_version
+from logs import logger
+from metrics import Gauge
+
+REFRESH_SECONDS = float(os.environ.get("HEALTH_REFRESH_SECONDS", 5))
+# A snapshot older than this means the refresh thread is stuck or the
+# database hangs.
+STALE_SECONDS = float(os.environ.get("HEALTH_STALE_SECONDS", 30))
+MAX_POOL_UTILISATION = float(os.environ.get("READY_MAX_POOL_UTILISATION", 0.95))
+THROTTLE_WINDOW = float(os.environ.get("READY_THROTTLE_WINDOW_SECONDS", 10))
+SERVED_TABLES = ("policy_procedure", "policy_purpose")
+
+TABLE_ROWS_ESTIMATE = Gauge(
+    "readily_table_rows_estimate",
+    "Rows per served table, from the catalog statistics",
+    ("table",),
+)
+
+
+def _row_estimates(cur) -> Dict[str, int]:
+    cur.execute(
+        "SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)",
+        (list(SERVED_TABLES),),
+    )
+    # reltuples is -1 (or 0 before PostgreSQL 14) until the table is analyzed
+    return {name: int(rows) for name, rows in cur.fetchall()}
+
+
+def _document_counts(cur) -> Dict[str, int]:
+    cur.execute(f"SELECT table_name FROM {MANIFEST_TABLE};")
+    counts = dict.fromkeys(SERVED_TABLES, 0)
+    for (table_name,) in cur.fetchall():
+        if table_name in counts:
+            counts[table_name] += 1
+    return counts
+
+
+def table_rows(snapshot: dict, table: str) -> int:
+    """Catalog row estimate, or the manifest's document count before ANALYZE ran."""
+    rows = snapshot.get("rows_estimate", {}).get(table, 0)
+    return rows if rows > 0 else snapshot.get("documents", {}).get(table, 0)
+
+
+class HealthMonitor:
+    def __init__(self, interval: float = REFRESH_SECONDS):
+        self.interval = interval
+        self.started_at = time.time()
+        self._snapshot: Optional[dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> dict:
+        """Take a new snapshot; errors are recorded in it, not raised."""
+        snapshot = {"taken_at": time.time(), "database": "ok"}
+        try:
+            conn = get_connection()
+            try:
+                cur = conn.cursor()
+                snapshot["index_version"] = current_version(cur)
+                snapshot["documents"] = _document_counts(cur)
+                snapshot["rows_estimate"] = _row_estimates(cur)
+                conn.commit()
+                cur.close()
+            finally:
+                conn.close()
+            for table, rows in snapshot["rows_estimate"].items():
+                TABLE_ROWS_ESTIMATE.set(rows, table=table)
+        except Exception as e:
+            snapshot["database"] = f"error: {e}"
+        self._snapshot = snapshot
+        return snapshot
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:  # keep the thread alive whatever happens
+                logger.error(f"Health refresh failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="health-monitor", daemon=True
+                )
+                self._thread.start()
+
+    def snapshot(self) -> Optional[dict]:
+        """Latest snapshot; starts the refresh thread on first use."""
+        self.start()
+        return self._snapshot
+
+    def readiness(self, pool: Tuple[int, int]) -> Tuple[bool, dict]:
+        """
+        Args:
+            pool: (busy, total) threads of the request thread pool
+        Returns:
+            (ready, details)
+        """
+        problems: List[str] = []
+        snapshot = self.snapshot()
+        if snapshot is None:
+            problems.append("no status snapshot yet")
+            snapshot = {}
+        else:
+            age = time.time() - snapshot["taken_at"]
+            if age > STALE_SECONDS:
+                problems.append(f"status snapshot is {age:.0f}s old")
+            if snapshot["database"] != "ok":
+                problems.append(f"database {snapshot['database']}")
+            for table in SERVED_TABLES:
+                if snapshot["database"] == "ok" and not table_rows(snapshot, table):
+                    problems.append(f"no documents in {table}")
+
+        busy, total = pool
+        if total and busy / total >= MAX_POOL_UTILISATION:
+            problems.append(f"request thread pool saturated ({busy}/{total})")
+
+        models = limiter.snapshot()
+        for model, state in models.items():
+            since = state["seconds_since_throttle"]
+            if (
+                state["in_flight"] >= state["concurrency_limit"]
+                and since is not None
+                and since < THROTTLE_WINDOW
+            ):
+                problems.append(f"Gemini {model} saturated and throttled")
+
+        details = {
+            "status": "ok" if not problems else "unavailable",
+            "problems": problems,
+            "index_version": snapshot.get("index_version"),
+            "documents": snapshot.get("documents"),
+            "rows_estimate": snapshot.get("rows_estimate"),
+            "snapshot_age_seconds": (
+                round(time.time() - snapshot["taken_at"], 1) if snapshot else None
+            ),
+            "thread_pool": {"busy": busy, "total": total},
+            "gemini": models,
+        }
+        return not problems, details
+
+
+monitor = HealthMonitor()
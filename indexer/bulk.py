@@ -0,0 +1,124 @@
+"""
+Streaming reads of whole tables.
+
+`iter_rows` walks a table through a named (server-side) cursor, so only
+BULK_FETCH_SIZE rows are in client memory at any time whatever the table
+size. Rows are plain tuples (`BulkRow`) with the embedding decoded straight
+into a float32 NumPy array; convert to `PolicyRow` only where a row leaves
+the process.
+
+    python cli-fire.py bulk export policy_purpose purpose.jsonl.gz
+"""
+
+import gzip
+import json
+import os
+import uuid
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from datamodels import PolicyRow
+from indexer.db import get_connection
+from logs import logger
+from metrics import timed
+
+BULK_FETCH_SIZE = int(os.environ.get("BULK_FETCH_SIZE", 2000))
+
+
+class BulkRow(NamedTuple):
+    id: int
+    file_name: str
+    section: Optional[str]
+    paragraph_id: Optional[int]
+    content: str
+    embedding: Optional[np.ndarray] = None
+
+    def to_policy_row(self, with_embedding: bool = False) -> PolicyRow:
+        return PolicyRow(
+            file_name=self.file_name,
+            section=self.section or "",
+            paragraph_id=self.paragraph_id,
+            content=self.content,
+            embedding=(
+                self.embedding.tolist()
+                if with_embedding and self.embedding is not None
+                else None
+            ),
+        )
+
+
+def decode_vector(value) -> Optional[np.ndarray]:
+    """pgvector's text form '[0.1,0.2,...]' (or an array) as float32."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return np.fromstring(value[1:-1], dtype=np.float32, sep=",")
+    return np.asarray(value, dtype=np.float32)
+
+
+def iter_batches(
+    table_name: str,
+    where: str = "",
+    params: Sequence = (),
+    with_embedding: bool = False,
+    fetch_size: int = BULK_FETCH_SIZE,
+) -> Iterator[List[BulkRow]]:
+    """
+    Yield a table's rows in id order, one fetch (at most `fetch_size` rows)
+    at a time, over a named server-side cursor.
+
+    Args:
+        where: Optional SQL condition, e.g. "file_name = %s", with `params`
+    """
+    columns = "id, file_name, section, paragraph_id, content"
+    if with_embedding:
+        columns += ", embedding"
+    query = f"SELECT {columns} FROM {table_name}"
+    if where:
+        query += f" WHERE {where}"
+    query += " ORDER BY id"
+
+    conn = get_connection()
+    # Named cursors live in a transaction on the server and are read in
+    # round trips of `itersize` rows.
+    cur = conn.cursor(name=f"bulk_{uuid.uuid4().hex[:12]}")
+    cur.itersize = fetch_size
+    try:
+        cur.execute(query, tuple(params))
+        while True:
+            fetched = cur.fetchmany(fetch_size)
+            if not fetched:
+                break
+            if with_embedding:
+                yield [BulkRow(*r[:5], decode_vector(r[5])) for r in fetched]
+            else:
+                yield [BulkRow(*r) for r in fetched]
+    finally:
+        cur.close()
+        conn.rollback()
+        conn.close()
+
+
+def iter_rows(table_name: str, **kwargs) -> Iterator[BulkRow]:
+    """Every row of a table, streamed; see `iter_batches` for the options."""
+    for batch in iter_batches(table_name, **kwargs):
+        yield from batch
+
+
+def stack_embeddings(rows: Sequence[BulkRow]) -> np.ndarray:
+    """(len(rows), dim) float32 matrix of a batch's embeddings."""
+    return np.stack([r.embedding for r in rows]).astype(np.float32, copy=False)
+
+
+@timed("bulk_export")
+def export(table_name: str, path: str, with_embedding: bool = False):
+    """Write a table as JSON lines (gzip-compressed if `path` ends in .gz)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    count = 0
+    with opener(path, "wt", encoding="utf-8") as f:
+        for row in iter_rows(table_name, with_embedding=with_embedding):
+            f.write(json.dumps(row.to_policy_row(with_embedding).model_dump()) + "\n")
+            count += 1
+    logger.info(f"✅ Exported {count} rows from {table_name} to {path}")
+    return count
@@ -0,0 +1,179 @@
+"""
+Token-budgeted chunking of section text into index rows.
+
+Paragraphs are packed greedily into chunks of at most CHUNK_TOKENS tokens,
+never across a section boundary. A paragraph larger than the budget is split
+at sentence boundaries (and a sentence larger than the budget at word
+boundaries). Consecutive chunks can share CHUNK_OVERLAP_TOKENS tokens of
+whole sentences, and a final chunk under CHUNK_MIN_TOKENS is folded into the
+one before it.
+
+Token counts are estimated at ~4 characters per token, which is close
+enough for Gemini's tokenizer on English prose and costs no API call.
+"""
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+from metrics import Histogram
+
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", 256))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", 0))
+CHUNK_MIN_TOKENS = int(os.environ.get("CHUNK_MIN_TOKENS", 48))
+CHARS_PER_TOKEN = 4
+
+CHUNK_SIZE = Histogram(
+    "readily_chunk_tokens",
+    "Estimated tokens per indexed chunk",
+    buckets=(16, 32, 64, 128, 192, 256, 384, 512, 1024),
+)
+
+# A sentence ends at . ! ? or ; followed by whitespace and an upper-case
+# letter, digit, bullet or opening bracket. List markers ("A.", "12."),
+# single initials and common abbreviations are not boundaries.
+_SENTENCE_END = re.compile(
+    r"(?<=[.!?;])(?<!\b[A-Za-z]\.)(?<!\b\d\.)(?<!\b\d\d\.)"
+    r"(?<!e\.g\.)(?<!i\.e\.)(?<!\bNo\.)(?<!\bSec\.)(?<!\bvs\.)"
+    r"\s+(?=[A-Z0-9(\"'•-])"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+@dataclass
+class ChunkStats:
+    """Size statistics of the chunks produced for one document."""
+
+    tokens: List[int] = field(default_factory=list)
+
+    def add(self, text: str):
+        size = estimate_tokens(text)
+        self.tokens.append(size)
+        CHUNK_SIZE.observe(size)
+
+    def summary(self) -> str:
+        if not self.tokens:
+            return "0 chunks"
+        return (
+            f"{len(self.tokens)} chunks, tokens min {min(self.tokens)} / "
+            f"mean {sum(self.tokens) / len(self.tokens):.0f} / max {max(self.tokens)}"
+        )
+
+
+@dataclass
+class _Unit:
+    """A sentence or paragraph to pack; `joiner` separates it from the previous unit."""
+
+    text: str
+    tokens: int
+    joiner: str
+
+
+class Chunker:
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        min_tokens: int = CHUNK_MIN_TOKENS,
+    ):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("Chunk overlap must be smaller than the chunk size")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+
+    def _units(self, paragraph: str) -> Iterator[_Unit]:
+        tokens = estimate_tokens(paragraph)
+        if tokens <= self.max_tokens:
+            yield _Unit(paragraph, tokens, "\n\n")
+            return
+        joiner = "\n\n"
+        for sentence in split_sentences(paragraph):
+            if estimate_tokens(sentence) <= self.max_tokens:
+                yield _Unit(sentence, estimate_tokens(sentence), joiner)
+            else:
+                yield from self._split_words(sentence, joiner)
+            joiner = " "
+
+    def _split_words(self, sentence: str, joiner: str) -> Iterator[_Unit]:
+        limit = self.max_tokens * CHARS_PER_TOKEN
+        piece = ""
+        for word in sentence.split():
+            if piece and len(piece) + 1 + len(word) > limit:
+                yield _Unit(piece, estimate_tokens(piece), joiner)
+                piece, joiner = "", " "
+            piece = f"{piece} {word}" if piece else word
+        if piece:
+            yield _Unit(piece, estimate_tokens(piece), joiner)
+
+    @staticmethod
+    def _join(units: List[_Unit]) -> str:
+        return "".join(
+            (u.joiner if i else "") + u.text for i, u in enumerate(units)
+        ).strip()
+
+    @staticmethod
+    def _size(units: List[_Unit]) -> int:
+        return sum(u.tokens for u in units)
+
+    def _overlap(self, units: List[_Unit]) -> List[_Unit]:
+        """Trailing whole units of a chunk that fit in the overlap budget."""
+        carried: List[_Unit] = []
+        size = 0
+        for unit in reversed(units[1:]):
+            size += unit.tokens
+            if size > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+        return carried
+
+    def chunks(
+        self, paragraphs: Iterable[str], stats: Optional[ChunkStats] = None
+    ) -> Iterator[str]:
+        """Pack the paragraphs of one section into chunks, streaming."""
+        held: Optional[List[_Unit]] = None  # last full chunk, emitted lazily
+        current: List[_Unit] = []
+        carried = 0  # leading units of `current` repeated from `held`
+
+        def emit(units: List[_Unit]) -> str:
+            text = self._join(units)
+            if stats is not None:
+                stats.add(text)
+            return text
+
+        for paragraph in paragraphs:
+            for unit in self._units(paragraph):
+                if current and self._size(current) + unit.tokens > self.max_tokens:
+                    if held is not None:
+                        yield emit(held)
+                    held = current
+                    current = self._overlap(held) if self.overlap_tokens else []
+                    carried = len(current)
+                    # Never let the overlap alone push a chunk over budget.
+                    while (
+                        current and self._size(current) + unit.tokens > self.max_tokens
+                    ):
+                        current.pop(0)
+                        carried -= 1
+                current.append(unit)
+
+        tail = current[carried:]
+        if held is not None and tail and self._size(tail) < self.min_tokens:
+            held = held + tail
+            tail = []
+        if held is not None:
+            yield emit(held)
+        if tail:
+            yield emit(current)
+
+
+chunker = Chunker()
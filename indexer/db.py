@@ -4,10 +4,12 @@ import psycopg2
 from psycopg2 import sql
 
 from logs import logger
+from metrics import DB_CONNECTIONS
 
 
 def get_connection():
     """Create and return a PostgreSQL connection."""
+    DB_CONNECTIONS.inc()
     return psycopg2.connect(
         host=os.environ.get("DB_HOST", "localhost"),
         dbname=os.environ.get("DB_NAME", "your_db_name"),
@@ -41,6 +43,11 @@ def create_table(table_name: str):
     conn.commit()
     cur.close()
     conn.close()
+
+    from indexer.dedup import dedup_table, ensure_columns
+
+    if dedup_table(table_name):
+        ensure_columns(table_name)
     logger.info(f"✅ Table ready: {table_name}")
 
 
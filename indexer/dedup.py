@@ -0,0 +1,327 @@
+"""
+Near-duplicate paragraph detection with MinHash and LSH.
+
+Each paragraph of an embedded table gets a 128-value MinHash signature of
+its word 5-grams and 16 LSH band keys. Rows are stored with the signature
+(`minhash`) and band keys (`lsh_bands`, GIN-indexed), so finding candidates
+for a new paragraph is one index lookup whatever the corpus size, and the
+index grows incrementally with every ingest.
+
+A paragraph whose estimated Jaccard similarity to an existing one is at
+least DEDUP_THRESHOLD is stored as a duplicate: `canonical_id` points at
+the first copy and it has no embedding, so it costs no embedding call,
+takes no room in the vector index and never crowds search results. Search
+returns canonical rows with the other documents sharing them listed in
+`PolicyRow.duplicate_files`.
+
+    python cli-fire.py dedup backfill policy_purpose
+"""
+
+import hashlib
+import os
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from indexer.bulk import iter_rows
+from indexer.db import get_connection
+from indexer.embed import embed_text
+from indexer.versions import GENERATION_MARK
+from logs import logger
+from metrics import Counter, timed
+
+ENABLED = os.environ.get("DEDUP", "true").lower() in ("1", "true", "yes")
+THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 0.85))
+# Tables whose rows are embedded; policy_procedure keeps whole sections.
+DEDUP_TABLES = {"policy_purpose", "policy_paragraphs"}
+
+NUM_PERM = 128
+BANDS = 16  # 8 rows per band: pairs above ~0.7 similarity become candidates
+SHINGLE_WORDS = 5
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_rng = np.random.RandomState(1)  # fixed, signatures must be stable across runs
+_A = _rng.randint(1, _MAX_HASH, NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, _MAX_HASH, NUM_PERM, dtype=np.uint64)
+_WORD_RE = re.compile(r"\w+")
+
+DEDUP_ROWS = Counter(
+    "readily_dedup_rows_total",
+    "Ingested paragraphs stored as canonical rows or as near-duplicates",
+    ("result",),
+)
+
+_ready_tables: set = set()
+
+
+def dedup_table(table_name: str) -> bool:
+    """Whether a table (or a rebuild generation of it) is deduplicated."""
+    return ENABLED and table_name.split(GENERATION_MARK)[0] in DEDUP_TABLES
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    words = _WORD_RE.findall(text.lower())
+    n = max(1, len(words) - SHINGLE_WORDS + 1)
+    shingles = {" ".join(words[i : i + SHINGLE_WORDS]) for i in range(n)}
+    return np.array(
+        [
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "big")
+            for s in shingles
+        ],
+        dtype=np.uint64,
+    )
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (uint32[NUM_PERM]) of a paragraph's word shingles."""
+    hashes = _shingle_hashes(text)
+    # (a * x + b) mod p fits in uint64 because a, x < 2**32
+    permuted = (np.outer(hashes, _A) + _B) % _PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    """One signed 64-bit key per band; equal keys mean an identical band."""
+    rows = NUM_PERM // BANDS
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            sig[band * rows : (band + 1) * rows].tobytes(),
+            digest_size=8,
+            salt=band.to_bytes(2, "big"),
+        ).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+def has_columns(cur, table_name: str) -> bool:
+    """Whether a table has the dedup columns; a read, safe on the search path."""
+    if table_name in _ready_tables:
+        return True
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s AND column_name = %s
+    """,
+        (table_name, "lsh_bands"),
+    )
+    if cur.fetchone() is None:
+        return False
+    _ready_tables.add(table_name)
+    return True
+
+
+def ensure_columns(table_name: str):
+    """
+    Add the dedup columns and band index to a table, committed on their own
+    connection. Run at table creation and before ingest, never on the search
+    path: the ALTER takes an exclusive lock on the table.
+    """
+    if table_name in _ready_tables:
+        return
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        if not has_columns(cur, table_name):
+            cur.execute(
+                f"""
+                ALTER TABLE {table_name}
+                    ADD COLUMN IF NOT EXISTS canonical_id INT,
+                    ADD COLUMN IF NOT EXISTS minhash BYTEA,
+                    ADD COLUMN IF NOT EXISTS lsh_bands BIGINT[];
+            """
+            )
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS {table_name}_lsh_idx "
+                f"ON {table_name} USING gin (lsh_bands);"
+            )
+            conn.commit()
+            logger.info(f"Added dedup columns to {table_name}")
+    finally:
+        cur.close()
+        conn.close()
+    _ready_tables.add(table_name)
+
+
+@timed("dedup_lookup")
+def find_canonical(
+    cur, table_name: str, sig: np.ndarray, bands: List[int]
+) -> Optional[int]:
+    """Id of the canonical row a paragraph duplicates, if any."""
+    cur.execute(
+        f"""
+        SELECT id, canonical_id, minhash FROM {table_name}
+        WHERE lsh_bands && %s::bigint[]
+    """,
+        (bands,),
+    )
+    best, best_score = None, THRESHOLD
+    for row_id, canonical_id, minhash in cur.fetchall():
+        if minhash is None:
+            continue
+        score = similarity(sig, np.frombuffer(bytes(minhash), dtype=np.uint32))
+        if score >= best_score:
+            best, best_score = canonical_id or row_id, score
+    return best
+
+
+def classify(
+    cur, table_name: str, content: str
+) -> Tuple[bytes, List[int], Optional[int]]:
+    """
+    (minhash, band keys, canonical id or None) of a paragraph about to be
+    stored in a table that has the dedup columns (see `ensure_columns`).
+    """
+    sig = signature(content)
+    bands = band_keys(sig)
+    canonical = find_canonical(cur, table_name, sig, bands)
+    DEDUP_ROWS.inc(result="duplicate" if canonical else "canonical")
+    return sig.tobytes(), bands, canonical
+
+
+def _orphans(cur, table_name: str) -> List[int]:
+    """
+    Ids of rows without an embedding whose canonical row is gone (or was
+    never set, e.g. a duplicate imported from a snapshot that no longer
+    matches anything); search cannot reach them.
+    """
+    cur.execute(
+        f"SELECT id, canonical_id FROM {table_name} WHERE embedding IS NULL ORDER BY id"
+    )
+    unembedded = cur.fetchall()
+    canonical_ids = list({c for _, c in unembedded if c is not None})
+    alive = set()
+    if canonical_ids:
+        cur.execute(
+            f"SELECT id FROM {table_name}"
+            " WHERE id = ANY(%s) AND embedding IS NOT NULL",
+            (canonical_ids,),
+        )
+        alive = {row[0] for row in cur.fetchall()}
+    return [row_id for row_id, c in unembedded if c not in alive]
+
+
+def _repair(cur, table_name: str, row_id: int) -> bool:
+    """
+    Re-point an orphaned duplicate at a surviving canonical row, or embed it
+    and make it canonical itself. True if it was re-pointed.
+    """
+    cur.execute(
+        f"SELECT content, minhash, lsh_bands FROM {table_name} WHERE id = %s",
+        (row_id,),
+    )
+    content, minhash, bands = cur.fetchone()
+    sig = np.frombuffer(bytes(minhash), dtype=np.uint32)
+    cur.execute(
+        f"""
+        SELECT id, minhash FROM {table_name}
+        WHERE lsh_bands && %s::bigint[] AND embedding IS NOT NULL
+    """,
+        (list(bands),),
+    )
+    best, best_score = None, THRESHOLD
+    for candidate, candidate_minhash in cur.fetchall():
+        if candidate_minhash is None:
+            continue
+        score = similarity(
+            sig, np.frombuffer(bytes(candidate_minhash), dtype=np.uint32)
+        )
+        if score >= best_score:
+            best, best_score = candidate, score
+    if best is not None:
+        cur.execute(
+            f"UPDATE {table_name} SET canonical_id = %s WHERE id = %s",
+            (best, row_id),
+        )
+        return True
+    cur.execute(
+        f"UPDATE {table_name} SET embedding = %s, canonical_id = NULL WHERE id = %s",
+        (embed_text(content), row_id),
+    )
+    return False
+
+
+@timed("dedup_backfill")
+def backfill(table_name: str):
+    """
+    Sign rows stored without a signature (ingested before dedup, or
+    imported from a snapshot) in id order, turning near-duplicates of
+    earlier rows into duplicates. Then repair duplicates whose canonical row
+    was deleted: each is re-pointed at a surviving near-duplicate or, failing
+    that, embedded again. Safe to re-run; only unsigned and orphaned rows
+    are touched.
+    """
+    ensure_columns(table_name)
+    conn = get_connection()
+    cur = conn.cursor()
+    signed = duplicates = 0
+    for row in iter_rows(table_name, where="minhash IS NULL"):
+        minhash, bands, canonical = classify(cur, table_name, row.content)
+        if canonical:
+            cur.execute(
+                f"""
+                UPDATE {table_name}
+                SET minhash = %s, lsh_bands = %s, canonical_id = %s, embedding = NULL
+                WHERE id = %s
+            """,
+                (minhash, bands, canonical, row.id),
+            )
+            duplicates += 1
+        else:
+            cur.execute(
+                f"UPDATE {table_name} SET minhash = %s, lsh_bands = %s WHERE id = %s",
+                (minhash, bands, row.id),
+            )
+        signed += 1
+        if signed % 1000 == 0:
+            conn.commit()
+    conn.commit()
+
+    repointed = embedded = 0
+    for row_id in _orphans(cur, table_name):
+        if _repair(cur, table_name, row_id):
+            repointed += 1
+        else:
+            embedded += 1
+        if (repointed + embedded) % 1000 == 0:
+            conn.commit()
+    conn.commit()
+    cur.close()
+    conn.close()
+    logger.info(
+        f"✅ Signed {signed} rows of {table_name}, {duplicates} near-duplicates; "
+        f"repaired {repointed + embedded} orphaned duplicates "
+        f"({repointed} re-pointed, {embedded} re-embedded)"
+    )
+    return {
+        "signed": signed,
+        "duplicates": duplicates,
+        "repointed": repointed,
+        "embedded": embedded,
+    }
+
+
+def duplicate_files(cur, table_name: str, ids: List[int]) -> dict:
+    """
+    Canonical id -> file names of the documents holding a duplicate of it;
+    empty for tables not migrated yet (`dedup backfill` adds the columns).
+    """
+    if not ids or not dedup_table(table_name) or not has_columns(cur, table_name):
+        return {}
+    cur.execute(
+        f"SELECT canonical_id, file_name FROM {table_name} WHERE canonical_id = ANY(%s)",
+        (list(ids),),
+    )
+    files: dict = {}
+    for canonical_id, file_name in cur.fetchall():
+        names = files.setdefault(canonical_id, [])
+        if file_name not in names:
+            names.append(file_name)
+    return files
@@ -0,0 +1,211 @@
+"""
+Parsed-document store.
+
+Keeps each PDF's normalised text and the page and offset of every paragraph
+block in a gzip-compressed JSON file keyed by the PDF's content hash and
+PARSER_VERSION:
+
+    <DOCSTORE_DIR>/<hash[:2]>/<hash>.p<PARSER_VERSION>.json.gz
+
+`document_blocks` serves the parsers from the store and only opens the PDF
+on a miss, so re-chunking, section-rule changes and re-embedding (e.g.
+`rebuild run`) no longer pay for PyMuPDF. On a miss the blocks are streamed
+from the PDF as usual and recorded on the way through; a parser that stops
+early (e.g. after PURPOSE) leaves a partial entry, which a later reader
+extends by reading the PDF past its end. Changing the reader's
+normalisation must bump PARSER_VERSION in indexer/reader.py; old entries
+are then simply not found.
+
+    python cli-fire.py docstore build ./pdfs
+    python cli-fire.py docstore stats
+"""
+
+import gzip
+import json
+import os
+import tempfile
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from indexer.reader import PARSER_VERSION, TextBlock, iter_pdf_blocks
+from indexer.versions import current_version, document_hash, file_hash
+from logs import logger
+from metrics import CACHE_REQUESTS, timed
+
+ENABLED = os.environ.get("DOCSTORE", "true").lower() in ("1", "true", "yes")
+DOCSTORE_DIR = os.environ.get(
+    "DOCSTORE_DIR", os.path.join(tempfile.gettempdir(), "readily-docstore")
+)
+
+
+@dataclass
+class StoredDocument:
+    file_name: str
+    content_hash: str
+    parser_version: int
+    text: str = ""  # blocks joined by blank lines, as TextBlock.offset assumes
+    # (page, offset, length) of each block in `text`
+    blocks: List[Tuple[int, int, int]] = field(default_factory=list)
+    complete: bool = False  # False: only the first blocks were read
+
+    def iter_blocks(self) -> Iterator[TextBlock]:
+        for page, offset, length in self.blocks:
+            yield TextBlock(self.text[offset : offset + length], page, offset)
+
+
+def _path(content_hash: str, root: Optional[str] = None) -> Path:
+    return (
+        Path(root or DOCSTORE_DIR)
+        / content_hash[:2]
+        / f"{content_hash}.p{PARSER_VERSION}.json.gz"
+    )
+
+
+def _stream(
+    pdf_path: Union[str, Path], document: StoredDocument, root: Optional[str] = None
+) -> Iterator[TextBlock]:
+    """
+    Yield a document's stored blocks, then read the PDF past them, recording
+    each new block. The entry is saved when the reader is done with it,
+    complete or not.
+    """
+    yield from document.iter_blocks()
+    if document.complete:
+        return
+    stored = len(document.text)
+    parts = [document.text] if document.blocks else []
+    known = len(parts)
+    try:
+        for block in iter_pdf_blocks(pdf_path):
+            if block.offset < stored:
+                continue  # the reader is deterministic: already stored
+            parts.append(block.text)
+            document.blocks.append((block.page, block.offset, len(block.text)))
+            yield block
+        document.complete = True
+    finally:
+        if len(parts) > known or document.complete:
+            document.text = "\n\n".join(parts)
+            try:
+                save(document, root)
+            except OSError as e:
+                logger.warning(f"Could not write docstore entry for {pdf_path}: {e}")
+
+
+def save(document: StoredDocument, root: Optional[str] = None):
+    path = _path(document.content_hash, root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename, so concurrent ingests never read a partial file.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(
+            fileobj=raw, mode="wb", compresslevel=6, mtime=0
+        ) as f:
+            f.write(json.dumps(document.__dict__).encode())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load(content_hash: str, root: Optional[str] = None) -> Optional[StoredDocument]:
+    path = _path(content_hash, root)
+    try:
+        with gzip.open(path, "rb") as f:
+            data = json.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable docstore entry {path}: {e}")
+        return None
+    data.pop("sections", None)  # written by earlier versions, never read
+    data["blocks"] = [tuple(b) for b in data["blocks"]]
+    data.setdefault("complete", True)
+    return StoredDocument(**data)
+
+
+def _lookup(pdf_path: Union[str, Path]) -> StoredDocument:
+    """The stored (possibly partial) document, or an empty one to fill."""
+    content_hash = file_hash(str(pdf_path))
+    document = load(content_hash)
+    if document is None or not document.complete:
+        CACHE_REQUESTS.inc(cache="docstore", result="miss")
+    else:
+        CACHE_REQUESTS.inc(cache="docstore", result="hit")
+    if document is None:
+        return StoredDocument(Path(pdf_path).name, content_hash, PARSER_VERSION)
+    # Same content may have been stored under another name.
+    document.file_name = Path(pdf_path).name
+    return document
+
+
+@timed("docstore_get")
+def get_document(pdf_path: Union[str, Path]) -> StoredDocument:
+    """The whole parsed document, from the store or by parsing (and storing) the PDF."""
+    document = _lookup(pdf_path)
+    if not document.complete:
+        for _ in _stream(pdf_path, document):
+            pass
+    return document
+
+
+def document_blocks(pdf_path: Union[str, Path]) -> Iterator[TextBlock]:
+    """
+    Paragraph blocks of a PDF, from the store or streamed from the PDF and
+    stored on the way through; straight from the PDF when the store is off.
+    """
+    if not ENABLED:
+        return iter_pdf_blocks(pdf_path)
+    return _stream(pdf_path, _lookup(pdf_path))
+
+
+@lru_cache(maxsize=64)
+def _stored_document(file_name: str, version: int) -> Optional[StoredDocument]:
+    # Keyed by index version: a re-indexed file may have new content.
+    content_hash = document_hash(file_name)
+    return load(content_hash) if content_hash else None
+
+
+def page_of(file_name: str, excerpt: str) -> Optional[int]:
+    """
+    1-based PDF page on which `excerpt` (text of an indexed row of the
+    file) starts, from the stored document; None if it is not stored or
+    the excerpt is not found in it.
+    """
+    excerpt = excerpt.strip()
+    if not ENABLED or not excerpt:
+        return None
+    document = _stored_document(file_name, current_version())
+    if document is None or not document.blocks:
+        return None
+    position = document.text.find(excerpt)
+    if position == -1:
+        # Pieces of one row may have been joined differently; try the first.
+        position = document.text.find(excerpt.split("\n\n")[0])
+    if position == -1:
+        return None
+    offsets = [offset for _, offset, _ in document.blocks]
+    return document.blocks[bisect_right(offsets, position) - 1][0]
+
+
+def build(directory_path: str):
+    """Parse every PDF in a directory into the store (skips stored ones)."""
+    pdf_files = sorted(Path(directory_path).glob("*.pdf"))
+    for i, pdf_file in enumerate(pdf_files, 1):
+        logger.info(f"Storing {pdf_file} ({i}/{len(pdf_files)})")
+        get_document(pdf_file)
+    logger.info(f"✅ {len(pdf_files)} documents in {DOCSTORE_DIR}")
+
+
+def stats(root: Optional[str] = None) -> dict:
+    """Entries and size of the store, per parser version."""
+    entries: Dict[str, int] = {}
+    size = 0
+    for path in Path(root or DOCSTORE_DIR).glob("*/*.json.gz"):
+        version = path.name.split(".")[1]
+        entries[version] = entries.get(version, 0) + 1
+        size += path.stat().st_size
+    return {"entries": entries, "megabytes": round(size / 1e6, 2)}
@@ -2,6 +2,9 @@
 import os
 import google.generativeai as genai
 
+import limiter
+from metrics import record_llm_call, timed
+
 # Configure API key (expects GEMINI_API_KEY to be set as an environment variable)
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
@@ -10,6 +13,7 @@ EMBEDDING_MODEL = "models/gemini-embedding-001"
 DEFAULT_DIM = 768  # Can be 768, 512, 256, or 128
 
 
+@timed("embed")
 def embed_text(text: str, dim: int = DEFAULT_DIM) -> list[float]:
     """
     Generate an embedding vector for a single text using Google Embedding Gemma.
@@ -22,15 +26,25 @@ def embed_text(text: str, dim: int = DEFAULT_DIM) -> list[float]:
     if not text.strip():
         raise ValueError("Text to embed cannot be empty.")
 
-    response = genai.embed_content(
-        model=EMBEDDING_MODEL,
-        content=text,
-        task_type="RETRIEVAL_DOCUMENT",  # can also use RETRIEVAL_QUERY
-        output_dimensionality=dim,
-    )
+    try:
+        response = limiter.call(
+            EMBEDDING_MODEL,
+            lambda: genai.embed_content(
+                model=EMBEDDING_MODEL,
+                content=text,
+                task_type="RETRIEVAL_DOCUMENT",  # can also use RETRIEVAL_QUERY
+                output_dimensionality=dim,
+            ),
+            tokens=limiter.estimate_tokens(text),
+        )
+    except Exception as e:
+        record_llm_call(EMBEDDING_MODEL, "embed", error=e)
+        raise
+    record_llm_call(EMBEDDING_MODEL, "embed", response, prompt_chars=len(text))
     return response["embedding"]
 
 
+@timed("embed_batch")
 def embed_texts(texts: list[str], dim: int = DEFAULT_DIM) -> list[list[float]]:
     """
     Embed multiple texts in batch.
@@ -44,11 +58,25 @@ def embed_texts(texts: list[str], dim: int = DEFAULT_DIM) -> list[list[float]]:
     if not texts:
         return []
 
-    response = genai.embed_content(
-        model=EMBEDDING_MODEL,
-        content=texts,
-        task_type="RETRIEVAL_DOCUMENT",
-        output_dimensionality=dim,
+    try:
+        response = limiter.call(
+            EMBEDDING_MODEL,
+            lambda: genai.embed_content(
+                model=EMBEDDING_MODEL,
+                content=texts,
+                task_type="RETRIEVAL_DOCUMENT",
+                output_dimensionality=dim,
+            ),
+            tokens=limiter.estimate_tokens(*texts),
+        )
+    except Exception as e:
+        record_llm_call(EMBEDDING_MODEL, "embed_batch", error=e)
+        raise
+    record_llm_call(
+        EMBEDDING_MODEL,
+        "embed_batch",
+        response,
+        prompt_chars=sum(len(t) for t in texts),
     )
     return response["embedding"]
 
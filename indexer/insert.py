@@ -1,11 +1,15 @@
 from indexer.db import get_connection
+from indexer.dedup import classify, dedup_table, ensure_columns
 from indexer.embed import embed_text
+from indexer.versions import record_clear
 from logs import logger
+from metrics import timed
 
 
+@timed("save_embedded_rows")
 def save_results_to_db(cur, results, table_name: str):
     """
-    Insert a list of dicts into the database.
+    Insert a list (or stream) of dicts into the database, embedding each one.
     Each result dict should have keys:
     file_name, section, paragraph_id, content
     """
@@ -13,7 +17,36 @@ def save_results_to_db(cur, results, table_name: str):
     # cur = conn.cursor()
     # logger.info(f"Connected to DB.")
 
+    deduplicate = dedup_table(table_name)
+    if deduplicate:
+        ensure_columns(table_name)
+    count = 0
     for r in results:
+        count += 1
+        if deduplicate:
+            minhash, bands, canonical = classify(cur, table_name, r["content"])
+            # A near-duplicate points at its canonical row and is not embedded.
+            embedding = None if canonical else embed_text(r["content"])
+            cur.execute(
+                f"""
+                INSERT INTO {table_name}
+                (file_name, section, paragraph_id, content, embedding,
+                canonical_id, minhash, lsh_bands)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+                (
+                    r["file_name"],
+                    r["section"],
+                    r["paragraph_id"],
+                    r["content"],
+                    embedding,
+                    canonical,
+                    minhash,
+                    bands,
+                ),
+            )
+            continue
+
         embedding = embed_text(r["content"])
         cur.execute(
             f"""
@@ -24,7 +57,7 @@ def save_results_to_db(cur, results, table_name: str):
             (r["file_name"], r["section"], r["paragraph_id"], r["content"], embedding),
         )
 
-    logger.info(f"Inserted {len(results)} rows, committing...")
+    logger.info(f"Inserted {count} rows, committing...")
 
     # conn.commit()
     # cur.close()
@@ -32,6 +65,7 @@ def save_results_to_db(cur, results, table_name: str):
     # logger.info(f"✅ Inserted {len(results)} rows into policy_paragraphs")
 
 
+@timed("save_policyprocedure_rows")
 def save_policyprocedure_to_db(cur, results, table_name: str):
     """
     Insert a list of dicts into the database.
@@ -52,18 +86,21 @@ def save_policyprocedure_to_db(cur, results, table_name: str):
     logger.info(f"Inserted {len(results)} rows, committing...")
 
 
+@timed("clear_table")
 def clear_table(table_name: str):
     """Delete all rows from the specified table."""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(f"DELETE FROM {table_name};")
     deleted = cur.rowcount
+    record_clear(cur, table_name)
     logger.info(f"Cleared table {table_name}, deleted {deleted} rows.")
     conn.commit()
     cur.close()
     conn.close()
 
 
+@timed("count_rows")
 def check_results_in_db(table_name: str) -> int:
     """Check how many rows are in the specified table."""
     conn = get_connection()
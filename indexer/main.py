@@ -1,14 +1,18 @@
 from indexer.db import get_connection
-from indexer.insert import (
-    save_results_to_db,
-    check_results_in_db,
-    clear_table,
-    save_policyprocedure_to_db,
+from indexer.insert import save_results_to_db, save_policyprocedure_to_db
+from indexer.versions import record_document
+from indexer.parse import (
+    extract_points,
+    extract_policy_and_procedure,
+    iter_points,
+    iter_purpose,
 )
-from indexer.parse import extract_points, extract_purpose, extract_policy_and_procedure
+from limiter import RateLimitError
 from logs import logger
+from metrics import timed
 
 
+@timed("index_pdf")
 def insert_one_pdf(file_path: str):
     """Parse a PDF and insert its contents into the database."""
     conn = get_connection()
@@ -22,6 +26,7 @@ def insert_one_pdf(file_path: str):
         return
 
     save_results_to_db(cur, results, "policy_paragraphs")
+    record_document(cur, "policy_paragraphs", file_path)
 
     conn.commit()
     cur.close()
@@ -29,29 +34,36 @@ def insert_one_pdf(file_path: str):
     logger.info(f"✅ Inserted {len(results)} rows into policy_paragraphs")
 
 
-def insert_pdf_all(cur, file_path: str):
-    """Parse a PDF and insert its contents into the database."""
+def _save_streamed(cur, rows, table_name: str, file_path: str):
+    """
+    Embed and insert paragraphs while the PDF is still being read. A parse
+    failure rolls back the rows already inserted for this file; on success
+    the file is recorded in the index manifest.
+    """
     try:
-        results = extract_points(file_path)
+        save_results_to_db(cur, rows, table_name)
+    except RateLimitError:
+        raise
     except Exception as e:
         logger.warning(f"Failed to extract points from {file_path}: {e}")
+        cur.connection.rollback()
         return
+    record_document(cur, table_name, file_path)
 
-    save_results_to_db(cur, results, "policy_paragraphs")
 
-
-def insert_pdf_purpose(cur, file_path: str):
+@timed("index_pdf")
+def insert_pdf_all(cur, file_path: str, table_name: str = "policy_paragraphs"):
     """Parse a PDF and insert its contents into the database."""
-    try:
-        results = extract_purpose(file_path)
-    except Exception as e:
-        logger.warning(f"Failed to extract points from {file_path}: {e}")
-        return
+    _save_streamed(cur, iter_points(file_path), table_name, file_path)
 
-    save_results_to_db(cur, results, "policy_purpose")
+
+@timed("index_pdf")
+def insert_pdf_purpose(cur, file_path: str, table_name: str = "policy_purpose"):
+    """Parse a PDF and insert its contents into the database."""
+    _save_streamed(cur, iter_purpose(file_path), table_name, file_path)
 
 
-def insert_purpose_pdfs_in_dir(directory_path: str):
+def insert_purpose_pdfs_in_dir(directory_path: str, table_name: str = "policy_purpose"):
     """Parse all PDFs in a directory and insert their contents into the database."""
     from pathlib import Path
 
@@ -63,15 +75,18 @@ def insert_purpose_pdfs_in_dir(directory_path: str):
     total = len(pdf_files)
     for pdf_file in pdf_files:
         logger.info(f"Processing {pdf_file} ({pdf_files.index(pdf_file)+1}/{total})")
-        insert_pdf_purpose(cur, str(pdf_file))
+        insert_pdf_purpose(cur, str(pdf_file), table_name)
         conn.commit()
 
     cur.close()
     conn.close()
-    logger.info(f"✅ Inserted {len(pdf_files)} files into policy_purpose")
+    logger.info(f"✅ Inserted {len(pdf_files)} files into {table_name}")
 
 
-def insert_pdf_policyprocedure(cur, file_path: str):
+@timed("index_pdf")
+def insert_pdf_policyprocedure(
+    cur, file_path: str, table_name: str = "policy_procedure"
+):
     """Parse a PDF and insert its contents into the database."""
     try:
         results = extract_policy_and_procedure(file_path)
@@ -79,10 +94,13 @@ def insert_pdf_policyprocedure(cur, file_path: str):
         logger.warning(f"Failed to extract points from {file_path}: {e}")
         return
 
-    save_policyprocedure_to_db(cur, results, "policy_procedure")
+    save_policyprocedure_to_db(cur, results, table_name)
+    record_document(cur, table_name, file_path)
 
 
-def insert_policyprocedure_pdfs_in_dir(directory_path: str):
+def insert_policyprocedure_pdfs_in_dir(
+    directory_path: str, table_name: str = "policy_procedure"
+):
     """Parse all PDFs in a directory and insert their contents into the database."""
     from pathlib import Path
 
@@ -94,9 +112,9 @@ def insert_policyprocedure_pdfs_in_dir(directory_path: str):
     total = len(pdf_files)
     for pdf_file in pdf_files:
         logger.info(f"Processing {pdf_file} ({pdf_files.index(pdf_file)+1}/{total})")
-        insert_pdf_policyprocedure(cur, str(pdf_file))
+        insert_pdf_policyprocedure(cur, str(pdf_file), table_name)
         conn.commit()
 
     cur.close()
     conn.close()
-    logger.info(f"✅ Inserted {len(pdf_files)} files into policy_procedure")
+    logger.info(f"✅ Inserted {len(pdf_files)} files into {table_name}")
@@ -1,229 +1,154 @@
-import fitz  # PyMuPDF
-import re
+from itertools import groupby
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Tuple
+from indexer.chunker import ChunkStats, Chunker, chunker as default_chunker
+from indexer.docstore import document_blocks
+from indexer.reader import TextBlock, iter_sections
+from indexer.sections import DEFAULT_SCHEMA
 from logs import logger
+from metrics import timed
 
 logger.setLevel("DEBUG")
 
 
-def extract_policy_and_procedure(pdf_path: str) -> List[Dict]:
+def _track_sections(
+    pieces: Iterable[Tuple[str, str, TextBlock]],
+    names: List[str],
+    pdf_path: Path,
+) -> Iterator[Tuple[str, str, TextBlock]]:
+    """Pass section pieces through; raise at the end if none of `names` was found."""
+    found = set()
+    for section_name, piece, block in pieces:
+        found.add(section_name)
+        yield section_name, piece, block
+
+    if not found:
+        raise ValueError(
+            f"Could not find {' / '.join(n.upper() for n in names)} sections in {pdf_path}"
+        )
+    missing = [n for n in names if n not in found]
+    if missing:
+        logger.warning(f"Missing sections {', '.join(missing)} in {pdf_path}")
+
+
+def _iter_section_pieces(pdf_path: Path, names: List[str], schema: str):
+    """
+    Stream the requested sections of a PDF, stopping once they have all
+    ended. Blocks come from the document store when it has the PDF.
+    """
+    pieces = iter_sections(document_blocks(pdf_path), schema, wanted=names)
+    return _track_sections(pieces, names, pdf_path)
+
+
+def _iter_paragraphs(
+    file_name: str,
+    pieces: Iterable[Tuple[str, str, TextBlock]],
+    chunker: Chunker = default_chunker,
+) -> Iterator[Dict]:
+    """
+    Split streamed section text into paragraphs and pack them into
+    token-budgeted chunks, one row per chunk (see indexer/chunker.py).
+    """
+    stats = ChunkStats()
+    for section_name, group in groupby(pieces, key=lambda p: p[0]):
+        paragraphs = (
+            paragraph.strip()
+            for _, piece, _ in group
+            for paragraph in piece.split("\n\n")
+            if paragraph.strip()
+        )
+        for paragraph_id, content in enumerate(chunker.chunks(paragraphs, stats), 1):
+            yield {
+                "file_name": file_name,
+                "section": section_name,
+                "paragraph_id": paragraph_id,
+                "content": content,
+            }
+    logger.debug(f"Chunked {file_name}: {stats.summary()}")
+
+
+@timed("parse_policy_and_procedure")
+def extract_policy_and_procedure(
+    pdf_path: str, schema: str = DEFAULT_SCHEMA
+) -> List[Dict]:
     """
     Extracts POLICY and PROCEDURE sections from a CalOptima-style policy PDF
     and returns them as a list of dictionaries with file_name and content keys.
 
     Args:
         pdf_path (str): Path to the PDF file.
+        schema (str): Heading schema of the document family (see indexer/sections.py).
     Returns:
         List[Dict]: List of dictionaries with "file_name" and "content" keys.
     """
     pdf_path = Path(pdf_path)
     file_name = pdf_path.name
+    names = ["policy", "procedure"]
 
-    # ---- Read entire PDF ----
-    with fitz.open(pdf_path) as doc:
-        full_text = "\n".join(page.get_text("text") for page in doc)
-
-    # ---- Normalize whitespace ----
-    full_text = re.sub(r"\r", "", full_text)
-    full_text = re.sub(r"[ \t]+", " ", full_text)
-    full_text = re.sub(r"\n{3,}", "\n\n", full_text)
-    full_text = re.sub(r"\n\s*\n", "\n\n", full_text)
-    full_text = full_text.strip()
-
-    # ---- Regex pattern to capture POLICY and PROCEDURE ----
-    # This captures the POLICY section up to PROCEDURE, and PROCEDURE up to ATTACHMENT(S)
-    pattern = re.compile(
-        r"II\.\s*POLICY(?P<policy>.*?)"
-        r"III\.\s*PROCEDURE(?P<procedure>.*?)"
-        r"I(V)?\.\s*ATTACHMENT\(S\)",
-        flags=re.S | re.I,
-    )
-
-    match = pattern.search(full_text)
-    if not match:
-        raise ValueError(f"Could not find POLICY / PROCEDURE sections in {pdf_path}")
-
-    # ---- Extract sections ----
-    policy_text = match.group("policy").strip()
-    procedure_text = match.group("procedure").strip()
+    sections: Dict[str, List[str]] = {}
+    for section_name, piece, _ in _iter_section_pieces(pdf_path, names, schema):
+        sections.setdefault(section_name, []).append(piece)
 
     # ---- Return as list of dictionaries ----
     results = [
         {
             "file_name": file_name,
-            "section": "policy",
-            "content": policy_text,
-        },
-        {
-            "file_name": file_name,
-            "section": "procedure",
-            "content": procedure_text,
-        },
+            "section": section_name,
+            "content": "\n\n".join(sections[section_name]),
+        }
+        for section_name in names
+        if section_name in sections
     ]
 
     logger.debug(f"Extracted {len(results)} sections from {file_name}")
     return results
 
 
-def extract_purpose(pdf_path: str) -> List[Dict]:
+def iter_purpose(
+    pdf_path: str, schema: str = DEFAULT_SCHEMA, chunker: Chunker = default_chunker
+) -> Iterator[Dict]:
     """
-    Extracts three main sections (Purpose, Policy, Procedure) and splits each into paragraphs.
-    Returns a list of {file_name, section, paragraph_id, content}.
+    Stream the PURPOSE section's chunks as {file_name, section, paragraph_id,
+    content}; reading stops at the end of the section.
     """
     pdf_path = Path(pdf_path)
-    file_name = pdf_path.name
+    pieces = _iter_section_pieces(pdf_path, ["purpose"], schema)
+    return _iter_paragraphs(pdf_path.name, pieces, chunker)
 
-    # ---- Read entire PDF ----
-    with fitz.open(pdf_path) as doc:
-        full_text = "\n".join(page.get_text("text") for page in doc)
-
-    # ---- Normalize spacing ----
-    full_text = re.sub(r"\r", "", full_text)
-    full_text = re.sub(r"[ \t]+", " ", full_text)
-    full_text = re.sub(r"\n{3,}", "\n\n", full_text)  # collapse excessive newlines
-    full_text = re.sub(r"\n\s*\n", "\n\n", full_text)  # collapse excessive newlines
-    full_text = full_text.strip()
-
-    # ---- Split into main sections ----
-    # Use non-greedy matching so each section captures up to the next Roman numeral
-    pattern = re.compile(
-        r"I\.\s*PURPOSE(?P<purpose>.*?)" r"II\.\s*POLICY(?P<policy>.*?)",
-        flags=re.S | re.I,
-    )
-
-    match = pattern.search(full_text)
-    if not match:
-        raise ValueError(
-            f"Could not find PURPOSE / POLICY / PROCEDURE sections in {pdf_path}"
-        )
 
-    sections = {
-        "purpose": match.group("purpose").strip(),
-    }
-
-    logger.debug(f"purpose: {sections['purpose'][:30]}...")
-    logger.info(f"Extracted sections: {', '.join(sections.keys())}")
-
-    # ---- Split each section by paragraph ----
-    results = []
-    for section_name, section_text in sections.items():
-        # Split paragraphs and strip whitespace
-        paragraphs = [p.strip() for p in section_text.split("\n\n") if p.strip()]
-
-        logger.debug(f"Found {len(paragraphs)} paragraphs in section {section_name}")
-
-        # Merge short paragraphs
-        merged_paragraphs = []
-        i = 0
-        while i < len(paragraphs):
-            current = paragraphs[i]
-
-            if len(current) < 200 and i + 1 < len(paragraphs):
-                # Merge with next paragraph
-                merged = current + "\n\n" + paragraphs[i + 1]
-                merged_paragraphs.append(merged)
-                i += 2  # Skip the next one
-            else:
-                merged_paragraphs.append(current)
-                i += 1
-
-        logger.debug(f"Found {len(paragraphs)} paragraphs in section {section_name}")
-
-        # Add merged paragraphs to results
-        for i, paragraph in enumerate(merged_paragraphs, start=1):
-            results.append(
-                {
-                    "file_name": file_name,
-                    "section": section_name,
-                    "paragraph_id": i,
-                    "content": paragraph,
-                }
-            )
-
-    logger.info(f"Extracted {len(results)} paragraphs from {file_name}")
-    return results
+def iter_points(
+    pdf_path: str, schema: str = DEFAULT_SCHEMA, chunker: Chunker = default_chunker
+) -> Iterator[Dict]:
+    """
+    Stream the chunks of the Purpose, Policy and Procedure sections as
+    {file_name, section, paragraph_id, content}, page by page.
+    """
+    pdf_path = Path(pdf_path)
+    pieces = _iter_section_pieces(pdf_path, ["purpose", "policy", "procedure"], schema)
+    return _iter_paragraphs(pdf_path.name, pieces, chunker)
 
 
-def extract_points(pdf_path: str) -> List[Dict]:
+@timed("parse_purpose")
+def extract_purpose(
+    pdf_path: str, schema: str = DEFAULT_SCHEMA, chunker: Chunker = default_chunker
+) -> List[Dict]:
     """
-    Extracts three main sections (Purpose, Policy, Procedure) and splits each into paragraphs.
+    Extracts the PURPOSE section and splits it into chunks.
     Returns a list of {file_name, section, paragraph_id, content}.
     """
-    pdf_path = Path(pdf_path)
-    file_name = pdf_path.name
+    results = list(iter_purpose(pdf_path, schema, chunker))
+    logger.info(f"Extracted {len(results)} chunks from {Path(pdf_path).name}")
+    return results
 
-    # ---- Read entire PDF ----
-    with fitz.open(pdf_path) as doc:
-        full_text = "\n".join(page.get_text("text") for page in doc)
-
-    # ---- Normalize spacing ----
-    full_text = re.sub(r"\r", "", full_text)
-    full_text = re.sub(r"[ \t]+", " ", full_text)
-    full_text = re.sub(r"\n{3,}", "\n\n", full_text)  # collapse excessive newlines
-    full_text = re.sub(r"\n\s*\n", "\n\n", full_text)  # collapse excessive newlines
-    full_text = full_text.strip()
-
-    # ---- Split into main sections ----
-    # Use non-greedy matching so each section captures up to the next Roman numeral
-    pattern = re.compile(
-        r"I\.\s*PURPOSE(?P<purpose>.*?)"
-        r"II\.\s*POLICY(?P<policy>.*?)"
-        r"III\.\s*PROCEDURE(?P<procedure>.*?)"
-        r"I(V)?\.\s*ATTACHMENT\(S\)(?P<attachment>.*?)",
-        flags=re.S | re.I,
-    )
-
-    match = pattern.search(full_text)
-    if not match:
-        raise ValueError(
-            f"Could not find PURPOSE / POLICY / PROCEDURE sections in {pdf_path}"
-        )
 
-    sections = {
-        "purpose": match.group("purpose").strip(),
-        "policy": match.group("policy").strip(),
-        "procedure": match.group("procedure").strip(),
-    }
-    logger.debug(f"purpose: {sections['purpose'][:30]}...")
-    logger.debug(f"policy: {sections['policy'][:30]}...")
-    logger.info(f"Extracted sections: {', '.join(sections.keys())}")
-
-    # ---- Split each section by paragraph ----
-    results = []
-    for section_name, section_text in sections.items():
-        # Split paragraphs and strip whitespace
-        paragraphs = [p.strip() for p in section_text.split("\n\n") if p.strip()]
-
-        logger.debug(f"Found {len(paragraphs)} paragraphs in section {section_name}")
-
-        # Merge short paragraphs
-        merged_paragraphs = []
-        i = 0
-        while i < len(paragraphs):
-            current = paragraphs[i]
-
-            if len(current) < 200 and i + 1 < len(paragraphs):
-                # Merge with next paragraph
-                merged = current + "\n\n" + paragraphs[i + 1]
-                merged_paragraphs.append(merged)
-                i += 2  # Skip the next one
-            else:
-                merged_paragraphs.append(current)
-                i += 1
-
-        logger.debug(f"Found {len(paragraphs)} paragraphs in section {section_name}")
-
-        # Add merged paragraphs to results
-        for i, paragraph in enumerate(merged_paragraphs, start=1):
-            results.append(
-                {
-                    "file_name": file_name,
-                    "section": section_name,
-                    "paragraph_id": i,
-                    "content": paragraph,
-                }
-            )
-
-    logger.info(f"Extracted {len(results)} paragraphs from {file_name}")
+@timed("parse_points")
+def extract_points(
+    pdf_path: str, schema: str = DEFAULT_SCHEMA, chunker: Chunker = default_chunker
+) -> List[Dict]:
+    """
+    Extracts three main sections (Purpose, Policy, Procedure) and splits each into chunks.
+    Returns a list of {file_name, section, paragraph_id, content}.
+    """
+    results = list(iter_points(pdf_path, schema, chunker))
+    logger.info(f"Extracted {len(results)} chunks from {Path(pdf_path).name}")
     return results
@@ -0,0 +1,135 @@
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+
+from indexer.sections import DEFAULT_SCHEMA, find_headings
+
+# Version of the text this module produces. Bump it whenever normalisation
+# or block splitting changes, so stored documents (indexer/docstore.py) are
+# parsed again.
+PARSER_VERSION = 2
+# Longest text carried over to the next page waiting for a paragraph break.
+MAX_CARRY_CHARS = 20000
+
+# ---- Whitespace normalisation, compiled once ----
+_CR_RE = re.compile(r"\r")
+_SPACES_RE = re.compile(r"[ \t]+")
+_MANY_NEWLINES_RE = re.compile(r"\n{3,}")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n")
+
+
+@dataclass
+class TextBlock:
+    """A run of whole paragraphs; the document text is the blocks joined by blank lines."""
+
+    text: str
+    page: int  # 1-based page on which the block starts
+    offset: int  # character offset of the block in the joined document text
+
+
+def normalize_text(text: str) -> str:
+    """Drop carriage returns, collapse spaces and blank lines (no stripping)."""
+    text = _CR_RE.sub("", text)
+    text = _SPACES_RE.sub(" ", text)
+    text = _MANY_NEWLINES_RE.sub("\n\n", text)  # collapse excessive newlines
+    return _BLANK_LINES_RE.sub("\n\n", text)  # collapse excessive newlines
+
+
+def iter_page_texts(source: Union[str, Path, bytes]) -> Iterator[str]:
+    """Yield the raw text of each page, loading one page at a time."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source)
+    with doc:
+        for page in doc:
+            yield page.get_text("text")
+
+
+def iter_text_blocks(pages: Iterable[str]) -> Iterator[TextBlock]:
+    """
+    Normalise page texts into paragraph-aligned blocks.
+
+    Text after the last blank line of a page is carried over to the next page,
+    so paragraphs (and headings) split by a page break come out whole and
+    whitespace is collapsed across the boundary. A carry that would exceed
+    MAX_CARRY_CHARS (text with no blank lines) is cut at the page's last line
+    break instead, or flushed whole if it has none, so only one page plus a
+    bounded tail is held in memory.
+    """
+    carry = ""
+    carry_page = 1
+    offset = 0
+    for page_no, raw in enumerate(pages, start=1):
+        if not carry:
+            carry_page = page_no
+            buf = normalize_text(raw)
+        else:
+            buf = normalize_text(carry + "\n" + raw)
+
+        # Everything before the last paragraph break is final.
+        cut, width = buf.rfind("\n\n"), 2
+        rest = cut + 2 if cut != -1 else 0
+        if len(buf) - rest > MAX_CARRY_CHARS:
+            line_end = buf.rfind("\n", rest)
+            cut, width = (line_end, 1) if line_end != -1 else (len(buf), 0)
+        if cut == -1:
+            carry = buf.lstrip()
+            continue
+        block = buf[:cut].strip()
+        carry = buf[cut + width :].lstrip()
+        if block:
+            yield TextBlock(block, carry_page, offset)
+            offset += len(block) + 2
+        carry_page = page_no
+
+    tail = carry.strip()
+    if tail:
+        yield TextBlock(tail, carry_page, offset)
+
+
+def iter_pdf_blocks(source: Union[str, Path, bytes]) -> Iterator[TextBlock]:
+    """Stream normalised paragraph blocks straight from a PDF path or bytes."""
+    return iter_text_blocks(iter_page_texts(source))
+
+
+def iter_sections(
+    blocks: Iterable[TextBlock],
+    schema: str = DEFAULT_SCHEMA,
+    wanted: Optional[Iterable[str]] = None,
+) -> Iterator[Tuple[str, str, TextBlock]]:
+    """
+    Split a block stream into sections without holding the document.
+
+    Yields (section name, text piece, source block) as blocks arrive; pieces of
+    the same section are separated by paragraph breaks. Follows the same
+    rules as `split_sections`: a section runs to the next recognised heading
+    and the first occurrence of a heading wins. With `wanted`, text outside
+    those sections is skipped and reading stops once they have all ended.
+    """
+    wanted = set(wanted) if wanted is not None else None
+    seen: set = set()
+    current = None
+
+    for block in blocks:
+        position = 0
+        for name, heading_start, content_start in find_headings(block.text, schema):
+            if current is not None:
+                piece = block.text[position:heading_start].strip()
+                if piece:
+                    yield current, piece, block
+            if wanted is not None and wanted <= seen:
+                return
+            current = None if name in seen else name
+            if current is not None and wanted is not None and current not in wanted:
+                current = None
+            seen.add(name)
+            position = content_start
+
+        if current is not None:
+            piece = block.text[position:].strip()
+            if piece:
+                yield current, piece, block
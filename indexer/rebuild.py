@@ -0,0 +1,265 @@
+"""
+Blue/green index rebuilds.
+
+A rebuild ingests the PDFs into shadow tables (<table>__g<N>) while the live
+tables keep serving searches untouched, creates the vector and lookup
+indexes on the shadows, then swaps every table in one transaction:
+
+    live policy_purpose       -> policy_purpose__g<previous>   (retired)
+    policy_purpose__g<N>      -> policy_purpose                (live)
+
+The swap only takes a short ACCESS EXCLUSIVE lock for the renames. Retired
+generations are kept for `rollback` (INDEX_RETAIN_GENERATIONS, default 2)
+and older ones are dropped, which also reclaims their space.
+
+    python cli-fire.py rebuild run ./pdfs
+    python cli-fire.py rebuild rollback
+    python cli-fire.py rebuild generations
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from indexer.db import create_table, get_connection
+from indexer.main import (
+    insert_pdf_all,
+    insert_pdf_policyprocedure,
+    insert_pdf_purpose,
+)
+from indexer.versions import (
+    GENERATION_MARK,
+    MANIFEST_TABLE,
+    bump_version,
+    move_documents,
+)
+from logs import logger
+from metrics import timed
+
+GENERATIONS_TABLE = "index_generations"
+RETAIN_GENERATIONS = int(os.environ.get("INDEX_RETAIN_GENERATIONS", 2))
+SWAP_LOCK_TIMEOUT = os.environ.get("INDEX_SWAP_LOCK_TIMEOUT", "5s")
+SWAP_ATTEMPTS = 3
+
+# Per-file ingest function of each rebuildable table
+BUILDERS = {
+    "policy_purpose": insert_pdf_purpose,
+    "policy_procedure": insert_pdf_policyprocedure,
+    "policy_paragraphs": insert_pdf_all,
+}
+EMBEDDED_TABLES = {"policy_purpose", "policy_paragraphs"}
+DEFAULT_TABLES = ("policy_purpose", "policy_procedure")
+
+
+def generation_table(table: str, generation: int) -> str:
+    return f"{table}{GENERATION_MARK}{generation}"
+
+
+def _tables(tables) -> List[str]:
+    tables = [tables] if isinstance(tables, str) else list(tables)
+    unknown = [t for t in tables if t not in BUILDERS]
+    if unknown:
+        raise ValueError(f"Cannot rebuild {', '.join(unknown)}")
+    return tables
+
+
+def _ensure(cur):
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {GENERATIONS_TABLE} (
+            table_name TEXT NOT NULL,
+            generation INT NOT NULL,
+            state TEXT NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            PRIMARY KEY (table_name, generation)
+        );
+    """
+    )
+
+
+def _generations(cur, table: str) -> Dict[int, str]:
+    """Generation -> state ("building", "live" or "retired") of a table."""
+    cur.execute(
+        f"SELECT generation, state FROM {GENERATIONS_TABLE} WHERE table_name = %s",
+        (table,),
+    )
+    return dict(cur.fetchall())
+
+
+def _live_generation(generations: Dict[int, str]) -> int:
+    # Generation 0 is the table as it was before the first rebuild.
+    return next((g for g, state in generations.items() if state == "live"), 0)
+
+
+def _set_state(cur, table: str, generation: int, state: str):
+    cur.execute(
+        f"DELETE FROM {GENERATIONS_TABLE} WHERE table_name = %s AND generation = %s;",
+        (table, generation),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO {GENERATIONS_TABLE} (table_name, generation, state)
+        VALUES (%s, %s, %s)
+    """,
+        (table, generation, state),
+    )
+
+
+def build_indexes(cur, name: str, table: str):
+    """
+    Index a freshly loaded copy `name` of `table` (a shadow or an imported
+    snapshot) before it serves, so the first searches are fast.
+    """
+    if table in EMBEDDED_TABLES:
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {name}_embedding_idx ON {name} "
+            "USING hnsw (embedding vector_l2_ops);"
+        )
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS {name}_file_name_idx ON {name} (file_name);"
+    )
+    cur.execute(f"ANALYZE {name};")
+
+
+def _swap(conn, cur, swaps: Dict[str, Tuple[int, int]]):
+    """
+    Atomically put generation `incoming` of each table live and retire the
+    current one. All tables switch in the same transaction, and the index
+    version moves with them.
+
+    Args:
+        swaps: table -> (incoming generation, outgoing generation)
+    """
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
+        try:
+            cur.execute("SET LOCAL lock_timeout = %s;", (SWAP_LOCK_TIMEOUT,))
+            # Lock in a fixed order so concurrent swaps cannot deadlock.
+            for table in sorted(swaps):
+                cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE;")
+
+            version = bump_version(cur)
+            for table, (incoming, outgoing) in swaps.items():
+                retired = generation_table(table, outgoing)
+                cur.execute(f"ALTER TABLE {table} RENAME TO {retired};")
+                cur.execute(
+                    f"ALTER TABLE {generation_table(table, incoming)} RENAME TO {table};"
+                )
+                move_documents(cur, table, retired)
+                move_documents(
+                    cur, generation_table(table, incoming), table, version, retired
+                )
+                _set_state(cur, table, outgoing, "retired")
+                _set_state(cur, table, incoming, "live")
+            conn.commit()
+            logger.info(f"✅ Swapped {', '.join(swaps)} (index version {version})")
+            return
+        except Exception as e:
+            conn.rollback()
+            if attempt == SWAP_ATTEMPTS:
+                raise
+            logger.warning(f"Swap attempt {attempt} failed, retrying: {e}")
+            time.sleep(attempt)
+
+
+@timed("index_rebuild")
+def run(
+    directory_path: str,
+    tables: Iterable[str] = DEFAULT_TABLES,
+    retain: int = RETAIN_GENERATIONS,
+):
+    """Rebuild tables from a directory of PDFs into shadows and swap them in."""
+    tables = _tables(tables)
+    pdf_files = sorted(Path(directory_path).glob("*.pdf"))
+    if not pdf_files:
+        raise ValueError(f"No PDFs in {directory_path}")
+
+    conn = get_connection()
+    cur = conn.cursor()
+    _ensure(cur)
+    known = {t: _generations(cur, t) for t in tables}
+    generation = 1 + max((g for gens in known.values() for g in gens), default=0)
+    for table in tables:
+        _set_state(cur, table, generation, "building")
+    conn.commit()
+
+    for table in tables:
+        shadow = generation_table(table, generation)
+        create_table(shadow)
+        for i, pdf_file in enumerate(pdf_files, 1):
+            logger.info(f"Building {shadow}: {pdf_file} ({i}/{len(pdf_files)})")
+            BUILDERS[table](cur, str(pdf_file), shadow)
+            conn.commit()
+        build_indexes(cur, shadow, table)
+        conn.commit()
+
+    _swap(
+        conn,
+        cur,
+        {t: (generation, _live_generation(known[t])) for t in tables},
+    )
+    cur.close()
+    conn.close()
+    prune(retain, tables)
+
+
+def rollback(tables: Iterable[str] = DEFAULT_TABLES):
+    """Put back the generation that was live before the current one."""
+    tables = _tables(tables)
+    conn = get_connection()
+    cur = conn.cursor()
+    _ensure(cur)
+    swaps = {}
+    for table in tables:
+        generations = _generations(cur, table)
+        live = _live_generation(generations)
+        older = [
+            g for g, state in generations.items() if state == "retired" and g < live
+        ]
+        if not older:
+            raise ValueError(f"No retained generation of {table} to roll back to")
+        swaps[table] = (max(older), live)
+    _swap(conn, cur, swaps)
+    cur.close()
+    conn.close()
+
+
+def prune(retain: int = RETAIN_GENERATIONS, tables: Iterable[str] = DEFAULT_TABLES):
+    """Drop retired generations beyond the newest `retain`, and abandoned builds."""
+    tables = _tables(tables)
+    conn = get_connection()
+    cur = conn.cursor()
+    _ensure(cur)
+    for table in tables:
+        generations = _generations(cur, table)
+        retired = sorted(
+            (g for g, state in generations.items() if state == "retired"), reverse=True
+        )
+        live = _live_generation(generations)
+        abandoned = [
+            g for g, state in generations.items() if state == "building" and g < live
+        ]
+        for generation in retired[retain:] + abandoned:
+            name = generation_table(table, generation)
+            cur.execute(f"DROP TABLE IF EXISTS {name};")
+            cur.execute(
+                f"DELETE FROM {GENERATIONS_TABLE} WHERE table_name = %s AND generation = %s;",
+                (table, generation),
+            )
+            cur.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = %s;", (name,))
+            logger.info(f"Dropped {name}")
+        conn.commit()
+    cur.close()
+    conn.close()
+
+
+def generations(tables: Iterable[str] = DEFAULT_TABLES) -> Dict[str, Dict[int, str]]:
+    """Generations and their state per table."""
+    conn = get_connection()
+    cur = conn.cursor()
+    _ensure(cur)
+    result = {t: dict(sorted(_generations(cur, t).items())) for t in _tables(tables)}
+    conn.commit()
+    cur.close()
+    conn.close()
+    return result
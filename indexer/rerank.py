@@ -0,0 +1,119 @@
+import os
+import re
+from typing import List, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from metrics import Counter, Histogram, timed
+
+T = TypeVar("T")
+
+RERANK_ENABLED = os.environ.get("RERANK", "true").lower() in ("1", "true", "yes")
+# Candidates scoring below this are not sent to the LLM check. Off (0) until
+# a threshold has been validated on labelled audits: a wrong cutoff skips
+# the one policy that meets the requirement.
+RERANK_MIN_SCORE = float(os.environ.get("RERANK_MIN_SCORE", 0.0))
+# Always keep at least this many of the best candidates, whatever their score.
+RERANK_KEEP_MIN = int(os.environ.get("RERANK_KEEP_MIN", 1))
+
+# BM25 term-frequency saturation
+K1 = 1.2
+
+RERANK_SKIPPED = Counter(
+    "readily_rerank_skipped_total",
+    "Retrieved candidates not sent to the LLM check because they scored too low",
+)
+RERANK_SKIPPED_PER_AUDIT = Histogram(
+    "readily_rerank_skipped_per_audit",
+    "LLM checks skipped by the reranker per audited requirement",
+    buckets=(0, 1, 2, 3, 5, 10, 20),
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    """
+    a an and any are as at be by can could did do does for from has have how if
+    in into is it its may must no not of on or p pp shall should state states
+    that the their there these this those to was were what when where which who
+    will with within would
+    """.split()
+)
+
+
+def _terms(text: str) -> List[str]:
+    """Lowercased content words with a crude plural strip."""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+@timed("rerank")
+def score_candidates(query: str, documents: Sequence[str]) -> np.ndarray:
+    """
+    Score a batch of documents against a query in one vectorised pass.
+
+    The score is the IDF-weighted share of the query's content terms found
+    in a document, each with BM25 term-frequency saturation, so it lies in
+    [0, 1) regardless of document length: 0 means no query term occurs.
+    IDF is taken over the batch, smoothed so a term present in every
+    candidate still counts.
+    """
+    query_terms = sorted(set(_terms(query)))
+    if not documents or not query_terms:
+        return np.zeros(len(documents))
+
+    column = {term: j for j, term in enumerate(query_terms)}
+    tf = np.zeros((len(documents), len(query_terms)))
+    for i, document in enumerate(documents):
+        for term in _terms(document):
+            j = column.get(term)
+            if j is not None:
+                tf[i, j] += 1
+
+    n = len(documents)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n + 1) / (df + 0.5))
+    saturated = tf / (tf + K1)
+    return saturated @ idf / idf.sum()
+
+
+def rerank(
+    query: str,
+    candidates: Sequence[T],
+    texts: Sequence[str],
+    min_score: float = RERANK_MIN_SCORE,
+    keep_min: int = RERANK_KEEP_MIN,
+) -> Tuple[List[T], int]:
+    """
+    Reorder candidates by lexical relevance and drop those below `min_score`.
+
+    Args:
+        query: The requirement being checked.
+        candidates: Retrieved items, in retrieval order.
+        texts: The text of each candidate that would be sent to the LLM.
+        min_score: Cutoff under which a candidate is skipped.
+        keep_min: Number of top candidates kept even if below the cutoff.
+
+    Returns:
+        (kept candidates, best first; number of candidates skipped)
+    """
+    if not RERANK_ENABLED or not candidates:
+        return list(candidates), 0
+
+    scores = score_candidates(query, texts)
+    # Stable sort keeps retrieval order between equal scores.
+    order = np.argsort(-scores, kind="stable")
+    kept = [
+        candidates[i]
+        for rank, i in enumerate(order)
+        if rank < keep_min or scores[i] >= min_score
+    ]
+    skipped = len(candidates) - len(kept)
+    RERANK_SKIPPED.inc(skipped)
+    RERANK_SKIPPED_PER_AUDIT.observe(skipped)
+    return kept, skipped
@@ -1,9 +1,65 @@
+from typing import Dict, List
+
 from indexer.db import get_connection
-from indexer.embed import embed_text
+from indexer.dedup import duplicate_files
+from indexer.embed import embed_text, embed_texts
+from indexer import search_cache as cache
 from datamodels import PolicyRow
 from logs import logger
+from metrics import span, timed
+
+# Texts per embedding request (the API accepts up to 100).
+EMBED_BATCH_SIZE = 100
+
+
+def _query_purpose(cur, query_vector, top_k: int) -> List[PolicyRow]:
+    """Nearest PURPOSE paragraphs to a query embedding."""
+    # Only search within PURPOSE sections
+    with span("pgvector_query"):
+        cur.execute(
+            """
+            SELECT
+                id,
+                file_name,
+                section,
+                paragraph_id,
+                content,
+                1 - (embedding <#> %s::vector) AS similarity
+            FROM policy_purpose
+            WHERE UPPER(section) LIKE '%%PURPOSE%%' AND embedding IS NOT NULL
+            ORDER BY embedding <-> %s::vector
+            LIMIT %s;
+        """,
+            (query_vector, query_vector, top_k),
+        )
+        results = cur.fetchall()
+    return _policy_rows(cur, "policy_purpose", results)
+
+
+def _policy_rows(cur, table_name: str, results) -> List[PolicyRow]:
+    """
+    PolicyRows from (id, file_name, section, paragraph_id, content, similarity)
+    rows, listing the documents whose near-duplicates each row stands for.
+    """
+    duplicates = duplicate_files(cur, table_name, [r[0] for r in results])
+    formatted = []
+    for r in results:
+        policy_row = PolicyRow(
+            file_name=r[1],
+            section=r[2],
+            paragraph_id=r[3],
+            content=r[4],
+            duplicate_files=[f for f in duplicates.get(r[0], []) if f != r[1]],
+        )
+        similarity = float(r[5])
+        logger.debug(
+            f"Similarity match: {policy_row.file_name} - {policy_row.section} (similarity: {similarity:.3f})"
+        )
+        formatted.append(policy_row)
+    return formatted
 
 
+@timed("search_purpose")
 def search_similar_purpose(query: str, top_k: int = 3):
     """
     Perform semantic similarity search against stored paragraphs,
@@ -14,46 +70,64 @@ def search_similar_purpose(query: str, top_k: int = 3):
     Returns:
         List of PolicyRow objects
     """
+    if cache.ENABLED:
+        key = cache.search_cache.key("policy_purpose", "PURPOSE", query, top_k)
+        cached = cache.search_cache.get(key)
+        if cached is not None:
+            return cached
+
     query_vector = embed_text(query)
 
     conn = get_connection()
     cur = conn.cursor()
-
-    # Only search within PURPOSE sections
-    cur.execute(
-        """
-        SELECT
-            file_name,
-            section,
-            paragraph_id,
-            content,
-            1 - (embedding <#> %s::vector) AS similarity
-        FROM policy_purpose
-        WHERE UPPER(section) LIKE '%%PURPOSE%%'
-        ORDER BY embedding <-> %s::vector
-        LIMIT %s;
-    """,
-        (query_vector, query_vector, top_k),
-    )
-
-    results = cur.fetchall()
+    formatted = _query_purpose(cur, query_vector, top_k)
     cur.close()
     conn.close()
 
-    formatted = []
-    for r in results:
-        policy_row = PolicyRow(
-            file_name=r[0], section=r[1], paragraph_id=r[2], content=r[3]
-        )
-        similarity = float(r[4])
-        logger.debug(
-            f"Similarity match: {policy_row.file_name} - {policy_row.section} (similarity: {similarity:.3f})"
-        )
-        formatted.append(policy_row)
-
+    if cache.ENABLED:
+        cache.search_cache.put(key, formatted)
     return formatted
 
 
+@timed("search_purpose_batch")
+def search_purpose_batch(
+    queries: List[str], top_ks: List[int]
+) -> List[List[PolicyRow]]:
+    """
+    search_similar_purpose for many queries at once: cache misses are
+    embedded in batched calls and searched over one connection.
+    """
+    results: List = [None] * len(queries)
+    keys: Dict[int, str] = {}
+    misses = []
+    for i, (query, top_k) in enumerate(zip(queries, top_ks)):
+        if cache.ENABLED:
+            keys[i] = cache.search_cache.key("policy_purpose", "PURPOSE", query, top_k)
+            results[i] = cache.search_cache.get(keys[i])
+        if results[i] is None:
+            misses.append(i)
+    if not misses:
+        return results
+
+    vectors = []
+    for start in range(0, len(misses), EMBED_BATCH_SIZE):
+        batch = misses[start : start + EMBED_BATCH_SIZE]
+        vectors.extend(embed_texts([queries[i] for i in batch]))
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for i, vector in zip(misses, vectors):
+            results[i] = _query_purpose(cur, vector, top_ks[i])
+            if cache.ENABLED:
+                cache.search_cache.put(keys[i], results[i])
+    finally:
+        cur.close()
+        conn.close()
+    return results
+
+
+@timed("search_paragraphs")
 def search_similar(query: str, top_k: int = 3):
     """
     Perform semantic similarity search against stored paragraphs.
@@ -63,45 +137,46 @@ def search_similar(query: str, top_k: int = 3):
     Returns:
         List of PolicyRow objects
     """
+    if cache.ENABLED:
+        key = cache.search_cache.key("policy_paragraphs", None, query, top_k)
+        cached = cache.search_cache.get(key)
+        if cached is not None:
+            return cached
+
     query_vector = embed_text(query)
 
     conn = get_connection()
     cur = conn.cursor()
 
     # The "<->" operator computes vector distance; lower = more similar
-    cur.execute(
-        """
-        SELECT
-            file_name,
-            section,
-            paragraph_id,
-            content,
-            1 - (embedding <#> %s::vector) AS similarity
-        FROM policy_paragraphs
-        ORDER BY embedding <-> %s::vector
-        LIMIT %s;
-    """,
-        (query_vector, query_vector, top_k),
-    )
-
-    results = cur.fetchall()
+    with span("pgvector_query"):
+        cur.execute(
+            """
+            SELECT
+                id,
+                file_name,
+                section,
+                paragraph_id,
+                content,
+                1 - (embedding <#> %s::vector) AS similarity
+            FROM policy_paragraphs
+            WHERE embedding IS NOT NULL
+            ORDER BY embedding <-> %s::vector
+            LIMIT %s;
+        """,
+            (query_vector, query_vector, top_k),
+        )
+        results = cur.fetchall()
+    formatted = _policy_rows(cur, "policy_paragraphs", results)
     cur.close()
     conn.close()
 
-    formatted = []
-    for r in results:
-        policy_row = PolicyRow(
-            file_name=r[0], section=r[1], paragraph_id=r[2], content=r[3]
-        )
-        similarity = float(r[4])
-        logger.info(
-            f"Similarity match: {policy_row.file_name} - {policy_row.section} (similarity: {similarity:.3f})"
-        )
-        formatted.append(policy_row)
-
+    if cache.ENABLED:
+        cache.search_cache.put(key, formatted)
     return formatted
 
 
+@timed("get_policyprocedure")
 def get_policyprocedure(file_path: str):
     """Fetch the policy and procedure sections from the policy_procedure table in db."""
     conn = get_connection()
@@ -128,6 +203,35 @@ def get_policyprocedure(file_path: str):
     return formatted
 
 
+@timed("get_policyprocedures")
+def get_policyprocedures(file_names: List[str]) -> Dict[str, List[PolicyRow]]:
+    """Fetch the policy and procedure sections of several files over one connection."""
+    conn = get_connection()
+    cur = conn.cursor()
+    documents: Dict[str, List[PolicyRow]] = {}
+    try:
+        for file_name in dict.fromkeys(file_names):
+            cur.execute(
+                """
+                SELECT
+                    file_name,
+                    section,
+                    content
+                FROM policy_procedure
+                WHERE file_name = %s
+            """,
+                (file_name,),
+            )
+            documents[file_name] = [
+                PolicyRow(file_name=r[0], section=r[1], content=r[2])
+                for r in cur.fetchall()
+            ]
+    finally:
+        cur.close()
+        conn.close()
+    return documents
+
+
 if __name__ == "__main__":
     # Example usage
     query = "Does the P&P state that the MCP must respond to retrospective requests no longer than 14 calendar days from receipt?"
@@ -0,0 +1,169 @@
+"""
+Search-result cache keyed by normalised query, top_k, section filter and
+index version.
+
+Two tiers: a per-process LRU and an optional SQLite file shared by all
+uvicorn workers on the host. The index version (see indexer/versions.py) is
+part of every key, so `index` commands invalidate all entries just by
+committing; the version is re-read from Postgres at most every
+SEARCH_CACHE_VERSION_TTL seconds, which bounds how long a worker can keep
+serving results from before an ingest.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from datamodels import PolicyRow
+from indexer.versions import current_version
+from logs import logger
+from metrics import CACHE_REQUESTS
+
+ENABLED = os.environ.get("SEARCH_CACHE", "true").lower() in ("1", "true", "yes")
+MEMORY_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", 1024))
+SHARED_SIZE = int(os.environ.get("SEARCH_CACHE_SHARED_SIZE", 20000))
+# Empty string disables the shared tier.
+SHARED_PATH = os.environ.get(
+    "SEARCH_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "readily-search-cache.sqlite"),
+)
+VERSION_TTL = float(os.environ.get("SEARCH_CACHE_VERSION_TTL", 2.0))
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalise_query(query: str) -> str:
+    """Case, punctuation and spacing do not change the embedding enough to matter."""
+    return " ".join(_WORD_RE.findall(query.lower()))
+
+
+class SearchCache:
+    def __init__(
+        self,
+        memory_size: int = MEMORY_SIZE,
+        shared_path: str = SHARED_PATH,
+        shared_size: int = SHARED_SIZE,
+        version_ttl: float = VERSION_TTL,
+    ):
+        self.memory_size = memory_size
+        self.shared_path = shared_path
+        self.shared_size = shared_size
+        self.version_ttl = version_ttl
+        self._memory: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._version = None
+        self._puts = 0
+
+    # ---- index version ----
+
+    def version(self) -> int:
+        version = current_version(max_age=self.version_ttl)
+        if version != self._version:
+            if self._version is not None:
+                logger.info(f"Index version {version}: search cache invalidated")
+                with self._lock:
+                    self._memory.clear()
+            self._version = version
+        return self._version
+
+    # ---- shared SQLite tier ----
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if not self.shared_path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.shared_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, version INTEGER, value TEXT, used REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _shared_get(self, key: str) -> Optional[list]:
+        try:
+            db = self._db()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT value FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE search_cache SET used = ? WHERE key = ?", (time.time(), key)
+            )
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Shared search cache unavailable: {e}")
+            return None
+
+    def _shared_put(self, key: str, version: int, rows: list):
+        try:
+            db = self._db()
+            if db is None:
+                return
+            db.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?)",
+                (key, version, json.dumps(rows), time.time()),
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                # Drop other versions, then the least recently used beyond the bound.
+                db.execute("DELETE FROM search_cache WHERE version != ?", (version,))
+                db.execute(
+                    "DELETE FROM search_cache WHERE key IN ("
+                    " SELECT key FROM search_cache ORDER BY used DESC"
+                    " LIMIT -1 OFFSET ?)",
+                    (self.shared_size,),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared search cache unavailable: {e}")
+
+    # ---- API ----
+
+    def key(self, table: str, section: Optional[str], query: str, top_k: int) -> str:
+        raw = f"{table}|{section or ''}|{top_k}|{normalise_query(query)}"
+        digest = hashlib.sha256(raw.encode()).hexdigest()
+        return f"{self.version()}:{digest}"
+
+    def get(self, key: str) -> Optional[List[PolicyRow]]:
+        with self._lock:
+            rows = self._memory.get(key)
+            if rows is not None:
+                self._memory.move_to_end(key)
+        if rows is not None:
+            CACHE_REQUESTS.inc(cache="search", result="hit")
+        else:
+            rows = self._shared_get(key)
+            if rows is None:
+                CACHE_REQUESTS.inc(cache="search", result="miss")
+                return None
+            CACHE_REQUESTS.inc(cache="search", result="shared_hit")
+            self._remember(key, rows)
+        return [PolicyRow(**r) for r in rows]
+
+    def put(self, key: str, results: List[PolicyRow]):
+        rows = [r.model_dump(exclude={"embedding"}) for r in results]
+        self._remember(key, rows)
+        self._shared_put(key, int(key.split(":", 1)[0]), rows)
+
+    def _remember(self, key: str, rows: list):
+        with self._lock:
+            self._memory[key] = rows
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
+search_cache = SearchCache()
@@ -0,0 +1,80 @@
+import re
+from typing import Dict, Tuple
+
+# Heading titles per document family. Keys are section names, values are
+# regexes for the heading title; the Roman numeral in front is not fixed, so
+# renumbered or reordered sections are still recognised. Sections that are
+# never extracted are listed too, because they terminate the previous section.
+CALOPTIMA_HEADINGS = {
+    "purpose": r"PURPOSE",
+    "policy": r"POLICY",
+    "procedure": r"PROCEDURES?",
+    "attachment": r"ATTACHMENT\(?S?\)?",
+    "references": r"REFERENCES?",
+    "approvals": r"REGULATORY\s+AGENCY\s+APPROVAL\(?S?\)?",
+    "board_action": r"BOARD\s+ACTIONS?",
+    "revision_history": r"REVISION\s+HISTORY",
+    "glossary": r"GLOSSARY",
+}
+
+DEFAULT_SCHEMA = "caloptima"
+
+_schemas: Dict[str, Tuple[re.Pattern, Dict[str, str]]] = {}
+
+
+def register_schema(name: str, headings: Dict[str, str]):
+    """
+    Register a heading schema for a document family.
+    Args:
+        name: Schema name passed to `split_sections`
+        headings: Section name -> heading title regex, e.g. {"policy": r"POLICY"};
+            titles must not contain capturing groups
+    """
+    alternatives = "|".join(
+        f"(?P<{key}>(?i:{title}))" for key, title in headings.items()
+    )
+    # One pass over the text: an upper-case Roman numeral, a dot and a known
+    # title at the start of a line. Only the title ignores case; lower-case
+    # numerals ("i.", "ii.") number sub-items inside a section. No DOTALL
+    # wildcards, so there is nothing to backtrack.
+    pattern = re.compile(
+        rf"^[ \t]*[IVXL]{{1,5}}\.\s*(?:{alternatives})(?![A-Za-z])",
+        flags=re.M,
+    )
+    _schemas[name] = (pattern, headings)
+
+
+register_schema(DEFAULT_SCHEMA, CALOPTIMA_HEADINGS)
+
+
+def find_headings(text: str, schema: str = DEFAULT_SCHEMA):
+    """
+    Scan the text once and return the headings in document order.
+    Returns:
+        List of (section name, heading start, content start) tuples.
+    """
+    pattern, _ = _schemas[schema]
+    return [(m.lastgroup, m.start(), m.end()) for m in pattern.finditer(text)]
+
+
+def split_sections(
+    text: str, schema: str = DEFAULT_SCHEMA
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Find section offsets in a normalised document.
+
+    Each section runs from the end of its heading to the start of the next
+    recognised heading (or the end of the text). Missing sections are simply
+    absent from the result; when a heading repeats, the first occurrence wins.
+
+    Returns:
+        Section name -> (start, end) character offsets of the section content.
+    """
+    headings = find_headings(text, schema)
+    sections: Dict[str, Tuple[int, int]] = {}
+    for i, (name, _, content_start) in enumerate(headings):
+        if name in sections:
+            continue
+        end = headings[i + 1][1] if i + 1 < len(headings) else len(text)
+        sections[name] = (content_start, end)
+    return sections
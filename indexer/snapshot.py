@@ -0,0 +1,290 @@
+"""
+Portable index snapshots.
+
+`export` writes the policy tables, embeddings included, to one zip of .npy
+members (readable with `numpy.load`), streamed batch by batch from the
+database:
+
+    meta.json                         format, embedding model/dim, row counts,
+                                      sha256 of every member, manifest rows
+    <table>/<batch>/id.npy            int64
+    <table>/<batch>/paragraph_id.npy  int64, -1 for NULL
+    <table>/<batch>/<column>.npy      uint8, UTF-8 of file_name, section or
+    <table>/<batch>/<column>_offsets.npy  content, cut at the int64 offsets,
+    <table>/<batch>/<column>_nulls.npy    with a bool mask for NULLs
+    <table>/<batch>/embedding.npy     float32 (rows, dim), embedded tables only
+    <table>/<batch>/embedding_nulls.npy   bool, rows stored without embedding
+
+`import_` checks the checksums and the embedding model, bulk-loads each
+table with COPY, records the documents in the index manifest and builds the
+vector indexes afterwards. No Gemini call is made.
+
+    python cli-fire.py index export snapshot.npz
+    python cli-fire.py index import snapshot.npz
+"""
+
+import hashlib
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from indexer.bulk import BULK_FETCH_SIZE, iter_batches, stack_embeddings
+from indexer.db import check_table_exists, create_table, get_connection
+from indexer.dedup import backfill, dedup_table
+from indexer.embed import DEFAULT_DIM, EMBEDDING_MODEL
+from indexer.rebuild import EMBEDDED_TABLES, build_indexes
+from indexer.versions import manifest_entries, restore_documents
+from logs import logger
+from metrics import timed
+
+FORMAT_VERSION = 1
+TABLES = ("policy_purpose", "policy_procedure", "policy_paragraphs")
+TEXT_COLUMNS = ("file_name", "section", "content")
+
+
+def _npy(array: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    np.save(buf, array, allow_pickle=False)
+    return buf.getvalue()
+
+
+def _encode_texts(values: List[Optional[str]]) -> Dict[str, np.ndarray]:
+    """Strings as one UTF-8 buffer, offsets into it and a mask of NULLs."""
+    encoded = [None if v is None else v.encode() for v in values]
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(e or b"") for e in encoded], out=offsets[1:])
+    nulls = np.array([e is None for e in encoded])
+    return {
+        "text": np.frombuffer(b"".join(e or b"" for e in encoded), dtype=np.uint8),
+        "text_offsets": offsets,
+        "text_nulls": nulls,
+    }
+
+
+def _decode_texts(text: np.ndarray, offsets: np.ndarray, nulls: np.ndarray):
+    data = text.tobytes()
+    return [
+        None if nulls[i] else data[offsets[i] : offsets[i + 1]].decode()
+        for i in range(len(nulls))
+    ]
+
+
+class _Writer:
+    def __init__(self, zf: zipfile.ZipFile):
+        self.zf = zf
+        self.checksums: Dict[str, str] = {}
+
+    def add(self, name: str, array: np.ndarray):
+        name += ".npy"
+        data = _npy(array)
+        self.checksums[name] = hashlib.sha256(data).hexdigest()
+        # Embeddings barely compress; text does.
+        compression = (
+            zipfile.ZIP_STORED if array.dtype == np.float32 else zipfile.ZIP_DEFLATED
+        )
+        self.zf.writestr(name, data, compress_type=compression)
+
+
+@timed("snapshot_export")
+def export(
+    path: str,
+    tables: Iterable[str] = TABLES,
+    fetch_size: int = BULK_FETCH_SIZE,
+):
+    """Write the policy tables to a snapshot file."""
+    tables = [tables] if isinstance(tables, str) else list(tables)
+    tables = [t for t in tables if check_table_exists(t)]
+    meta = {
+        "format": FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dim": DEFAULT_DIM,
+        "tables": {},
+    }
+
+    with zipfile.ZipFile(path, "w", allowZip64=True) as zf:
+        writer = _Writer(zf)
+        for table in tables:
+            embedded = table in EMBEDDED_TABLES
+            rows = batches = 0
+            for batch in iter_batches(
+                table, with_embedding=embedded, fetch_size=fetch_size
+            ):
+                prefix = f"{table}/{batches:06d}/"
+                writer.add(prefix + "id", np.array([r.id for r in batch], np.int64))
+                writer.add(
+                    prefix + "paragraph_id",
+                    np.array(
+                        [
+                            -1 if r.paragraph_id is None else r.paragraph_id
+                            for r in batch
+                        ],
+                        np.int64,
+                    ),
+                )
+                for column in TEXT_COLUMNS:
+                    for key, array in _encode_texts(
+                        [getattr(r, column) for r in batch]
+                    ).items():
+                        writer.add(prefix + key.replace("text", column), array)
+                if embedded:
+                    # Near-duplicates (indexer/dedup.py) have no embedding.
+                    nulls = np.array([r.embedding is None for r in batch])
+                    zero = np.zeros(DEFAULT_DIM, np.float32)
+                    embeddings = stack_embeddings(
+                        [
+                            r._replace(embedding=zero) if n else r
+                            for r, n in zip(batch, nulls)
+                        ]
+                    )
+                    if embeddings.shape[1] != DEFAULT_DIM:
+                        raise ValueError(
+                            f"{table} holds {embeddings.shape[1]}-d embeddings, "
+                            f"expected {DEFAULT_DIM}"
+                        )
+                    writer.add(prefix + "embedding", embeddings)
+                    writer.add(prefix + "embedding_nulls", nulls)
+                rows += len(batch)
+                batches += 1
+            meta["tables"][table] = {
+                "rows": rows,
+                "batches": batches,
+                "embedded": embedded,
+            }
+            logger.info(f"Exported {rows} rows of {table}")
+
+        conn = get_connection()
+        cur = conn.cursor()
+        meta["manifest"] = {t: manifest_entries(cur, t) for t in tables}
+        cur.close()
+        conn.close()
+        meta["checksums"] = writer.checksums
+        zf.writestr("meta.json", json.dumps(meta, indent=1))
+    logger.info(f"✅ Snapshot of {', '.join(tables)} written to {path}")
+    return meta["tables"]
+
+
+def _copy_value(value) -> str:
+    """A value in COPY's text format."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _vector_literal(vector: np.ndarray) -> str:
+    # 9 significant digits round-trip float32 exactly
+    return "[" + ",".join("%.9g" % x for x in vector.tolist()) + "]"
+
+
+class _Reader:
+    def __init__(self, zf: zipfile.ZipFile, checksums: Dict[str, str]):
+        self.zf = zf
+        self.checksums = checksums
+
+    def load(self, name: str) -> np.ndarray:
+        name += ".npy"
+        data = self.zf.read(name)
+        if hashlib.sha256(data).hexdigest() != self.checksums.get(name):
+            raise ValueError(f"Checksum mismatch for {name}")
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+    def texts(self, prefix: str, column: str) -> list:
+        return _decode_texts(
+            self.load(prefix + column),
+            self.load(prefix + column + "_offsets"),
+            self.load(prefix + column + "_nulls"),
+        )
+
+
+def _copy_batch(cur, table: str, reader: _Reader, prefix: str, embedded: bool):
+    columns = {c: reader.texts(prefix, c) for c in TEXT_COLUMNS}
+    paragraph_ids = reader.load(prefix + "paragraph_id")
+    embeddings = reader.load(prefix + "embedding") if embedded else None
+    nulls = (
+        reader.load(prefix + "embedding_nulls")
+        if embedded
+        else np.ones(len(paragraph_ids), bool)
+    )
+
+    buf = io.StringIO()
+    for i in range(len(paragraph_ids)):
+        values = [
+            columns["file_name"][i],
+            columns["section"][i],
+            None if paragraph_ids[i] < 0 else int(paragraph_ids[i]),
+            columns["content"][i],
+            None if nulls[i] else _vector_literal(embeddings[i]),
+        ]
+        buf.write("\t".join(_copy_value(v) for v in values) + "\n")
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} (file_name, section, paragraph_id, content, embedding) "
+        "FROM STDIN WITH (FORMAT text)",
+        buf,
+    )
+    return len(paragraph_ids)
+
+
+@timed("snapshot_import")
+def import_(path: str, replace: bool = False, force: bool = False):
+    """
+    Load a snapshot into the policy tables.
+
+    Args:
+        replace: Empty tables that already hold rows instead of refusing
+        force: Import even if the embedding model or dimension differs
+    """
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read("meta.json"))
+        if meta["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {meta['format']}")
+        if not force and (
+            meta["embedding_model"] != EMBEDDING_MODEL
+            or meta["embedding_dim"] != DEFAULT_DIM
+        ):
+            raise ValueError(
+                f"Snapshot embeddings are {meta['embedding_model']} "
+                f"({meta['embedding_dim']}-d), this build uses {EMBEDDING_MODEL} "
+                f"({DEFAULT_DIM}-d); pass --force to import anyway"
+            )
+        reader = _Reader(zf, meta["checksums"])
+
+        conn = get_connection()
+        cur = conn.cursor()
+        for table, info in meta["tables"].items():
+            create_table(table)
+            cur.execute(f"SELECT id FROM {table} LIMIT %s", (1,))
+            if cur.fetchone() is not None:
+                if not replace:
+                    raise ValueError(f"{table} is not empty; pass --replace")
+                cur.execute(f"DELETE FROM {table};")
+
+            rows = 0
+            for batch in range(info["batches"]):
+                prefix = f"{table}/{batch:06d}/"
+                rows += _copy_batch(cur, table, reader, prefix, info["embedded"])
+
+            # The rows and their manifest entries become visible together.
+            version = restore_documents(cur, table, meta["manifest"].get(table, []))
+            conn.commit()
+
+            # Signatures are not exported; re-sign so ingest keeps deduplicating.
+            if dedup_table(table):
+                backfill(table)
+            build_indexes(cur, table, table)
+            conn.commit()
+            logger.info(f"Imported {rows} rows into {table} (index version {version})")
+        cur.close()
+        conn.close()
+    logger.info(f"✅ Snapshot {path} imported")
+    return {t: info["rows"] for t, info in meta["tables"].items()}
@@ -0,0 +1,260 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from indexer.db import get_connection
+from logs import logger
+
+# Every change to the indexed tables increments the single-row counter in
+# STATE_TABLE, in the same transaction as the change, so readers see the new
+# number exactly when they can see the new rows. Derived data (the
+# compliance matrix, the search cache) records the number it was computed
+# at and is stale once the current number has moved on.
+STATE_TABLE = "index_state"
+MANIFEST_TABLE = "index_documents"
+# Tables named <table>__g<N> are rebuild generations, not live data.
+GENERATION_MARK = "__g"
+# How long current_version() without a cursor may serve a number it read.
+VERSION_TTL = float(os.environ.get("INDEX_VERSION_TTL", 2.0))
+
+_ready = False
+# (version, time.monotonic() when read) of the last read on a fresh connection.
+_cached: Optional[Tuple[int, float]] = None
+
+
+def ensure_version_tables(cur):
+    """Create the index version counter and the document manifest."""
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            id INT PRIMARY KEY,
+            version BIGINT NOT NULL
+        );
+    """
+    )
+    cur.execute(
+        f"INSERT INTO {STATE_TABLE} (id, version) VALUES (%s, %s) "
+        "ON CONFLICT (id) DO NOTHING;",
+        (1, 0),
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            table_name TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ DEFAULT now(),
+            PRIMARY KEY (table_name, file_name)
+        );
+    """
+    )
+
+
+def _ensure():
+    """Create the tables once per process, committed on their own connection."""
+    global _ready
+    if _ready:
+        return
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        ensure_version_tables(cur)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    _ready = True
+
+
+def bump_version(cur) -> int:
+    """
+    Increment the index version in the caller's transaction. The row lock
+    also serialises concurrent ingests until they commit.
+    """
+    _ensure()
+    cur.execute(
+        f"UPDATE {STATE_TABLE} SET version = version + 1 WHERE id = %s "
+        "RETURNING version;",
+        (1,),
+    )
+    return cur.fetchone()[0]
+
+
+def current_version(cur=None, max_age: float = VERSION_TTL) -> int:
+    """
+    The latest index version number (0 if nothing was ever indexed).
+
+    With a cursor, read in the caller's transaction. Without one, a number
+    read on a fresh connection less than `max_age` seconds ago is reused,
+    so per-request callers do not each open a connection.
+    """
+    global _cached
+    if cur is None:
+        now = time.monotonic()
+        if _cached is not None and now - _cached[1] <= max_age:
+            return _cached[0]
+        conn = get_connection()
+        try:
+            version = current_version(conn.cursor())
+            conn.rollback()
+        finally:
+            conn.close()
+        _cached = (version, now)
+        return version
+    _ensure()
+    cur.execute(f"SELECT version FROM {STATE_TABLE} WHERE id = %s", (1,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def record_document(cur, table_name: str, file_path: str) -> int:
+    """
+    Record that a file was (re)indexed into a table, in the caller's
+    transaction. Returns the new index version.
+
+    Rebuild generations (shadow tables) serve no searches, so recording into
+    one does not bump the version; the swap bumps it once for all of them.
+    """
+    if GENERATION_MARK in table_name:
+        version = current_version(cur)
+    else:
+        version = bump_version(cur)
+    file_name = Path(file_path).name
+    cur.execute(
+        f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = %s AND file_name = %s;",
+        (table_name, file_name),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO {MANIFEST_TABLE}
+        (table_name, file_name, content_hash, version)
+        VALUES (%s, %s, %s, %s)
+    """,
+        (table_name, file_name, file_hash(file_path), version),
+    )
+    logger.debug(f"Index version {version}: {file_name} -> {table_name}")
+    return version
+
+
+def record_clear(cur, table_name: str) -> int:
+    """Record that all documents were removed from a table."""
+    version = bump_version(cur)
+    cur.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = %s;", (table_name,))
+    return version
+
+
+def document_versions(cur=None) -> Dict[str, int]:
+    """Index version at which each file last changed, across all tables."""
+    if cur is None:
+        conn = get_connection()
+        try:
+            return document_versions(conn.cursor())
+        finally:
+            conn.close()
+    _ensure()
+    cur.execute(f"SELECT table_name, file_name, version FROM {MANIFEST_TABLE};")
+    versions: Dict[str, int] = {}
+    for table_name, file_name, version in cur.fetchall():
+        if GENERATION_MARK in table_name:
+            continue  # shadow or retired copy, see indexer/rebuild.py
+        versions[file_name] = max(version, versions.get(file_name, 0))
+    return versions
+
+
+def document_hash(file_name: str, cur=None) -> Optional[str]:
+    """Content hash of a file as last indexed into a live table, if any."""
+    if cur is None:
+        conn = get_connection()
+        try:
+            return document_hash(file_name, conn.cursor())
+        finally:
+            conn.close()
+    _ensure()
+    cur.execute(
+        f"SELECT table_name, content_hash FROM {MANIFEST_TABLE} WHERE file_name = %s",
+        (file_name,),
+    )
+    for table_name, content_hash in cur.fetchall():
+        if GENERATION_MARK not in table_name:
+            return content_hash
+    return None
+
+
+def move_documents(
+    cur,
+    from_table: str,
+    to_table: str,
+    version: Optional[int] = None,
+    baseline: Optional[str] = None,
+):
+    """
+    Re-key manifest rows when a table is renamed, in the caller's transaction.
+
+    With `version`, moved rows take that version, except files whose content
+    hash equals their row under `baseline`, which keep the baseline version
+    (their derived data stays valid). Without it, versions are kept.
+    """
+    _ensure()
+    query = f"SELECT file_name, content_hash, version FROM {MANIFEST_TABLE} WHERE table_name = %s"
+    cur.execute(query, (from_table,))
+    rows = cur.fetchall()
+    previous = {}
+    if baseline is not None:
+        cur.execute(query, (baseline,))
+        previous = {f: (h, v) for f, h, v in cur.fetchall()}
+
+    cur.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = %s;", (from_table,))
+    cur.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = %s;", (to_table,))
+    for file_name, content_hash, row_version in rows:
+        if version is not None:
+            base_hash, base_version = previous.get(file_name, (None, None))
+            row_version = base_version if base_hash == content_hash else version
+        cur.execute(
+            f"""
+            INSERT INTO {MANIFEST_TABLE}
+            (table_name, file_name, content_hash, version)
+            VALUES (%s, %s, %s, %s)
+        """,
+            (to_table, file_name, content_hash, row_version),
+        )
+
+
+def manifest_entries(cur, table_name: str) -> List[Tuple[str, str]]:
+    """(file_name, content_hash) of every document recorded for a table."""
+    _ensure()
+    cur.execute(
+        f"SELECT file_name, content_hash FROM {MANIFEST_TABLE} WHERE table_name = %s",
+        (table_name,),
+    )
+    return [tuple(r) for r in cur.fetchall()]
+
+
+def restore_documents(cur, table_name: str, entries: Iterable[Tuple[str, str]]) -> int:
+    """
+    Replace a table's manifest with (file_name, content_hash) entries loaded
+    from elsewhere (e.g. a snapshot), in the caller's transaction. Returns
+    the new index version, which every entry takes.
+    """
+    version = bump_version(cur)
+    cur.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = %s;", (table_name,))
+    for file_name, content_hash in entries:
+        cur.execute(
+            f"""
+            INSERT INTO {MANIFEST_TABLE}
+            (table_name, file_name, content_hash, version)
+            VALUES (%s, %s, %s, %s)
+        """,
+            (table_name, file_name, content_hash, version),
+        )
+    return version
@@ -0,0 +1,322 @@
+"""
+Client-side rate limiting for Gemini calls.
+
+Every call goes through `call(model, fn, tokens)`, which per model:
+- waits on token buckets for requests/min and tokens/min,
+- waits for a slot under an adaptive concurrency limit (AIMD: grows while
+  latency stays near its baseline, halves on 429, shrinks when latency climbs),
+- retries 429 and transient 5xx errors with full-jitter exponential backoff,
+  waiting at least as long as the server's retry hint (Retry-After header or
+  google.rpc.RetryInfo) when it sends one.
+
+Limits default to DEFAULT_LIMITS and can be overridden with the GEMINI_LIMITS
+environment variable, a JSON object such as
+`{"gemini-pro-latest": {"rpm": 60, "tpm": 1000000, "max_concurrency": 4}}`.
+The state is per process; with several uvicorn workers divide the quotas.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, TypeVar
+
+from logs import logger
+from metrics import Counter, Gauge, Histogram
+
+T = TypeVar("T")
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+}
+
+MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", 5))
+BACKOFF_BASE = float(os.environ.get("GEMINI_BACKOFF_BASE", 1.0))
+BACKOFF_CAP = float(os.environ.get("GEMINI_BACKOFF_CAP", 30.0))
+
+LIMITER_WAIT = Histogram(
+    "readily_gemini_limiter_wait_seconds",
+    "Time spent waiting for rate limit tokens and a concurrency slot",
+    ("model",),
+)
+LIMITER_RETRIES = Counter(
+    "readily_gemini_retries_total", "Retried Gemini calls", ("model", "reason")
+)
+LIMITER_CONCURRENCY = Gauge(
+    "readily_gemini_concurrency_limit", "Adaptive concurrency limit", ("model",)
+)
+
+
+@dataclass
+class ModelLimits:
+    rpm: float
+    tpm: float
+    max_concurrency: int = 8
+    min_concurrency: int = 1
+    latency_tolerance: float = 2.0
+
+
+DEFAULT_LIMITS = {
+    "models/gemini-embedding-001": ModelLimits(
+        rpm=3000, tpm=1_000_000, max_concurrency=16
+    ),
+    "gemini-flash-latest": ModelLimits(rpm=1000, tpm=1_000_000, max_concurrency=16),
+    "gemini-pro-latest": ModelLimits(rpm=150, tpm=2_000_000, max_concurrency=8),
+}
+FALLBACK_LIMITS = ModelLimits(rpm=60, tpm=250_000, max_concurrency=4)
+
+
+class RateLimitError(Exception):
+    """Gemini kept rejecting a call for quota reasons after all retries."""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(
+            f"Gemini quota exhausted for {model}; retry after {retry_after:.0f}s"
+        )
+        self.model = model
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills `per_minute` tokens evenly over a minute, bursting up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """Take `amount` tokens (possibly going negative); return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, amount: float = 1):
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket, used after a 429 to stop bursts."""
+        with self._lock:
+            self.tokens = min(self.tokens, 0.0)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit driven by observed latency and throttling."""
+
+    def __init__(self, limits: ModelLimits):
+        self.limits = limits
+        self.limit = float(max(limits.min_concurrency, limits.max_concurrency // 2))
+        self.in_flight = 0
+        self.baseline = None
+        self.throttled_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self, latency: float):
+        with self._cond:
+            if self.baseline is None:
+                self.baseline = latency
+            else:
+                # Slow-moving baseline that follows latency down quickly.
+                self.baseline = min(latency, 0.95 * self.baseline + 0.05 * latency)
+
+            if latency > self.baseline * self.limits.latency_tolerance:
+                self.limit = max(self.limits.min_concurrency, self.limit * 0.9)
+            else:
+                self.limit = min(
+                    self.limits.max_concurrency, self.limit + 1.0 / self.limit
+                )
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(self.limits.min_concurrency, self.limit / 2)
+            self.throttled_at = time.monotonic()
+
+
+class ModelLimiter:
+    def __init__(self, model: str, limits: ModelLimits):
+        self.model = model
+        self.limits = limits
+        self.requests = TokenBucket(limits.rpm)
+        self.tokens = TokenBucket(limits.tpm)
+        self.concurrency = AdaptiveConcurrency(limits)
+
+    def snapshot(self) -> dict:
+        c = self.concurrency
+        return {
+            "concurrency_limit": int(c.limit),
+            "in_flight": c.in_flight,
+            "seconds_since_throttle": (
+                time.monotonic() - c.throttled_at if c.throttled_at else None
+            ),
+        }
+
+
+def _load_limits() -> dict[str, ModelLimits]:
+    limits = dict(DEFAULT_LIMITS)
+    overrides = os.environ.get("GEMINI_LIMITS")
+    if overrides:
+        for model, values in json.loads(overrides).items():
+            limits[model] = replace(limits.get(model, FALLBACK_LIMITS), **values)
+    return limits
+
+
+_limits = _load_limits()
+_limiters: dict[str, ModelLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(model, _limits.get(model, FALLBACK_LIMITS))
+            _limiters[model] = limiter
+        return limiter
+
+
+def _status_code(error: Exception):
+    for attr in ("code", "status_code"):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    return (
+        _status_code(error) in RETRYABLE_CODES
+        or type(error).__name__ in RETRYABLE_NAMES
+    )
+
+
+def is_throttle(error: Exception) -> bool:
+    return _status_code(error) == 429 or type(error).__name__ in (
+        "ResourceExhausted",
+        "TooManyRequests",
+    )
+
+
+def retry_hint(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After or RetryInfo."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value is not None:
+            return max(0.0, float(value))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        inner = details.get("error", details)
+        details = inner.get("details") if isinstance(inner, dict) else None
+    for detail in details if isinstance(details, list) else ():
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return max(0.0, float(delay[:-1]))
+            except ValueError:
+                pass
+    return None
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token count (~4 characters per token) for the tokens/min bucket."""
+    return sum(len(t) for t in texts if t) // 4 + 1
+
+
+def call(model: str, fn: Callable[[], T], tokens: int = 0) -> T:
+    """
+    Run `fn` (a zero-argument Gemini call) under the model's rate limits.
+    Args:
+        model: Gemini model name the call is billed against
+        fn: The API call, e.g. `lambda: client.models.generate_content(...)`
+        tokens: Estimated tokens of the call for the tokens/min bucket
+    Returns:
+        Whatever `fn` returns
+    Raises:
+        RateLimitError: If the call is still throttled after GEMINI_MAX_RETRIES;
+            its `retry_after` is the server's hint or the next backoff step
+        Exception: Non-retryable errors from `fn` are re-raised unchanged
+    """
+    limiter = get_limiter(model)
+    for attempt in range(MAX_RETRIES + 1):
+        wait_start = time.perf_counter()
+        limiter.requests.acquire(1)
+        limiter.tokens.acquire(tokens)
+        limiter.concurrency.acquire()
+        LIMITER_WAIT.observe(time.perf_counter() - wait_start, model=model)
+
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            limiter.concurrency.release()
+
+        if error is None:
+            limiter.concurrency.on_success(time.perf_counter() - start)
+            LIMITER_CONCURRENCY.set(limiter.concurrency.limit, model=model)
+            return result
+
+        if not is_retryable(error):
+            raise error
+        throttled = is_throttle(error)
+        if throttled:
+            limiter.concurrency.on_throttle()
+            limiter.requests.drain()
+        LIMITER_CONCURRENCY.set(limiter.concurrency.limit, model=model)
+
+        hint = retry_hint(error)
+        if attempt == MAX_RETRIES:
+            if throttled:
+                ceiling = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt + 1))
+                raise RateLimitError(
+                    model, max(1.0, hint if hint is not None else ceiling)
+                ) from error
+            raise error
+        backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+        if hint is not None:
+            backoff = max(backoff, min(hint, BACKOFF_CAP))
+        reason = "throttled" if throttled else "server_error"
+        LIMITER_RETRIES.inc(model=model, reason=reason)
+        logger.warning(
+            f"Gemini {model} {reason} ({error}); retry {attempt + 1}/{MAX_RETRIES} in {backoff:.1f}s"
+        )
+        time.sleep(backoff)
+
+
+def snapshot() -> dict[str, dict]:
+    """Current limiter state per model that has been called."""
+    with _limiters_lock:
+        return {model: lim.snapshot() for model, lim in _limiters.items()}
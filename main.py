@@ -1,13 +1,63 @@
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager
+
+import anyio
+from typing import List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 import uvicorn
-from pydantic import BaseModel
 
-from indexer.insert import check_results_in_db
-from datamodels import ResponseItem, PolicyRow, TextRequest
-from workflows import audit_main, audit_test, audit_one
+from datamodels import ResponseItem, TextRequest
+from workflows import audit_main, audit_one, audit_questions, audit_batch
+from extractor.upload import UploadTooLarge, extract_pdf_questions, read_pdf_upload
+from limiter import RateLimitError
 from logs import logger
+from extractor.cite import cascade_stats
+import health
+import metrics
+import profiling
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The monitor thread is a daemon; it ends with the process.
+    health.monitor.start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Record request latency and per-stage spans; stages go out as Server-Timing."""
+    if not metrics.ENABLED:
+        return await call_next(request)
+
+    token = metrics.start_trace(f"{request.method} {request.url.path}")
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        trace = metrics.end_trace(token)
+        # The route template, not the raw path, keeps the label set bounded.
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
+    if trace is not None and trace.spans:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{stage};dur={ms:.1f}" for stage, ms in trace.summary().items()
+        )
+    return response
 
 
 @app.get("/")
@@ -17,31 +67,106 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    # Connect to DB and perform a simple query to check health
-    try:
-        procedure_rows = check_results_in_db("policy_procedure")
-        if not procedure_rows:
-            return {"status": "error", "message": "No procedures found"}
+    # Served from the background status snapshot, see health.py
+    snapshot = health.monitor.snapshot()
+    if snapshot is None:
+        return {"status": "error", "message": "Status not collected yet"}
+    if snapshot["database"] != "ok":
+        return {"status": "error", "message": snapshot["database"]}
 
-        purpose_rows = check_results_in_db("policy_purpose")
-        if not purpose_rows:
-            return {"status": "error", "message": "No purposes found"}
+    procedure_rows = health.table_rows(snapshot, "policy_procedure")
+    if not procedure_rows:
+        return {"status": "error", "message": "No procedures found"}
 
-        return {
-            "status": "ok",
-            "data": {"procedures": procedure_rows, "purposes": purpose_rows},
-        }
+    purpose_rows = health.table_rows(snapshot, "policy_purpose")
+    if not purpose_rows:
+        return {"status": "error", "message": "No purposes found"}
 
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    return {
+        "status": "ok",
+        "data": {"procedures": procedure_rows, "purposes": purpose_rows},
+    }
+
+
+@app.get("/livez")
+async def liveness():
+    """The process and its event loop are responsive."""
+    return {"status": "ok", "uptime_seconds": time.time() - health.monitor.started_at}
+
+
+@app.get("/readyz")
+async def readiness(response: Response):
+    """Whether this replica should get traffic; never queries the database."""
+    thread_limiter = anyio.to_thread.current_default_thread_limiter()
+    ready, details = health.monitor.readiness(
+        (thread_limiter.borrowed_tokens, int(thread_limiter.total_tokens))
+    )
+    if not ready:
+        response.status_code = 503
+    return details
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/metrics/traces")
+def traces_endpoint():
+    """Spans of the most recent requests, newest last."""
+    return {"traces": metrics.recent_traces()}
+
+
+@app.get("/metrics/cascade")
+def cascade_endpoint():
+    """How often the requirement-check cascade escalated to a stronger model."""
+    return cascade_stats()
 
 
 @app.post("/audit_one")
-def text_audit_one(request: ResponseItem):
+def text_audit_one(
+    request: ResponseItem,
+    http_response: Response,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(default=None),
+):
     try:
-        response = audit_one(request, request.top_k)
+        with profiling.maybe_profile("audit_one", profile or x_profile, http_response):
+            response = audit_one(request, request.top_k)
         return {"response": response}
 
+    except ValueError as ve:
+        logger.error(f"ValueError: {ve}")
+        raise HTTPException(status_code=400, detail=str(ve)) from ve
+    except RateLimitError as rle:
+        logger.error(f"RateLimitError: {rle}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(rle),
+            headers={"Retry-After": str(int(rle.retry_after))},
+        ) from rle
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post("/audit_batch")
+def text_audit_batch(
+    request: List[ResponseItem],
+    http_response: Response,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(default=None),
+):
+    """Audit several requirements; per-item failures are reported in `results`."""
+    try:
+        with profiling.maybe_profile(
+            "audit_batch", profile or x_profile, http_response
+        ):
+            results = audit_batch(request)
+        return {"results": results}
+
     except ValueError as ve:
         logger.error(f"ValueError: {ve}")
         raise HTTPException(status_code=400, detail=str(ve)) from ve
@@ -51,14 +176,71 @@ def text_audit_one(request: ResponseItem):
 
 
 @app.post("/audit")
-def text_audit(request: TextRequest):
+def text_audit(
+    request: TextRequest,
+    http_response: Response,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(default=None),
+):
+    try:
+        with profiling.maybe_profile("audit", profile or x_profile, http_response):
+            responses = audit_main(request)
+        return {"responses": responses}
+
+    except ValueError as ve:
+        logger.error(f"ValueError: {ve}")
+        raise HTTPException(status_code=400, detail=str(ve)) from ve
+    except RateLimitError as rle:
+        logger.error(f"RateLimitError: {rle}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(rle),
+            headers={"Retry-After": str(int(rle.retry_after))},
+        ) from rle
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post(
+    "/audit/pdf",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    },
+)
+async def pdf_audit(request: Request, top_k: int = 3):
+    """Audit a questionnaire PDF uploaded as the multipart field `file`."""
     try:
-        responses = audit_main(request)
+        data, digest = await read_pdf_upload(request)
+        questions = await run_in_threadpool(extract_pdf_questions, data, digest)
+        logger.info(f"Extracted {len(questions)} questions from upload {digest[:12]}")
+        responses = await run_in_threadpool(audit_questions, questions, top_k)
         return {"responses": responses}
 
+    except UploadTooLarge as utl:
+        logger.error(f"UploadTooLarge: {utl}")
+        raise HTTPException(status_code=413, detail=str(utl)) from utl
     except ValueError as ve:
         logger.error(f"ValueError: {ve}")
         raise HTTPException(status_code=400, detail=str(ve)) from ve
+    except RateLimitError as rle:
+        logger.error(f"RateLimitError: {rle}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(rle),
+            headers={"Retry-After": str(int(rle.retry_after))},
+        ) from rle
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail=str(e)) from e
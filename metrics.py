@@ -0,0 +1,342 @@
+"""
+In-process metrics and per-request trace spans, exported in the Prometheus
+text format by `/metrics` in main.py.
+
+Set METRICS_ENABLED=false to turn everything into no-ops: `timed` then returns
+the undecorated function and `span` returns a shared null context.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+
+ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_registry: list = []
+
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format (backslash, quote, newline)."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, key: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(
+                    f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+                )
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    def set(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # key -> [bucket counts..., sum, count]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def totals(self) -> dict[tuple, tuple[float, int]]:
+        """(sum, count) per label set."""
+        with self._lock:
+            return {key: (state[-2], state[-1]) for key, state in self._values.items()}
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {state[-2]}")
+                lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---- Metrics used across the app ----
+STAGE_SECONDS = Histogram(
+    "readily_stage_seconds", "Time spent in a pipeline stage", ("stage",)
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "readily_http_request_seconds",
+    'HTTP request latency per route template, "unmatched" for unknown paths',
+    ("method", "path", "status"),
+)
+LLM_CALLS = Counter(
+    "readily_llm_calls_total", "Gemini API calls", ("model", "operation", "outcome")
+)
+LLM_TOKENS = Counter(
+    "readily_llm_tokens_total",
+    "Gemini tokens, from usage metadata or estimated from characters",
+    ("model", "direction"),
+)
+CACHE_REQUESTS = Counter(
+    "readily_cache_requests_total", "Cache lookups", ("cache", "result")
+)
+DB_CONNECTIONS = Counter(
+    "readily_db_connections_total", "PostgreSQL connections opened"
+)
+
+
+# ---- Trace spans ----
+_current_trace: ContextVar = ContextVar("readily_trace", default=None)
+_recent_traces: deque = deque(maxlen=int(os.environ.get("METRICS_TRACE_BUFFER", 100)))
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans: list[dict] = []
+        self.depth = 0
+
+    def summary(self) -> dict[str, float]:
+        """Total milliseconds per stage name."""
+        totals: dict[str, float] = {}
+        for s in self.spans:
+            totals[s["stage"]] = totals.get(s["stage"], 0) + s["duration_ms"]
+        return totals
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "duration_ms": (self.duration or 0) * 1000,
+            "spans": self.spans,
+        }
+
+
+def start_trace(name: str):
+    """Start collecting spans for the current context; returns a reset token."""
+    if not ENABLED:
+        return None
+    return _current_trace.set(Trace(name))
+
+
+def end_trace(token):
+    """Finish the current trace, keep it in the recent-traces buffer and return it."""
+    if token is None:
+        return None
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is not None:
+        trace.duration = time.perf_counter() - trace.start
+        if trace.spans:
+            _recent_traces.append(trace.as_dict())
+    return trace
+
+
+def recent_traces() -> list[dict]:
+    return list(_recent_traces)
+
+
+class _Span:
+    __slots__ = ("stage", "start", "trace")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        if self.trace is not None:
+            self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, stage=self.stage)
+        trace = self.trace
+        if trace is not None:
+            trace.depth -= 1
+            trace.spans.append(
+                {
+                    "stage": self.stage,
+                    "offset_ms": (self.start - trace.start) * 1000,
+                    "duration_ms": elapsed * 1000,
+                    "depth": trace.depth,
+                    "error": exc[0].__name__ if exc[0] else None,
+                }
+            )
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str):
+    """Context manager timing a stage into STAGE_SECONDS and the current trace."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(stage)
+
+
+def timed(stage: str):
+    """Decorator form of `span`; a no-op when metrics are disabled."""
+
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_llm_call(
+    model: str, operation: str, response=None, prompt_chars: int = 0, error=None
+):
+    """Count a Gemini call and its tokens (usage metadata when the SDK returns it)."""
+    if not ENABLED:
+        return
+    LLM_CALLS.inc(model=model, operation=operation, outcome="error" if error else "ok")
+    if error is not None:
+        return
+
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens is None:
+        prompt_tokens = prompt_chars // 4
+    if output_tokens is None:
+        try:
+            output_tokens = len(response.text or "") // 4
+        except Exception:
+            output_tokens = 0
+    LLM_TOKENS.inc(prompt_tokens, model=model, direction="input")
+    LLM_TOKENS.inc(output_tokens, model=model, direction="output")
+    cached_tokens = getattr(usage, "cached_content_token_count", None)
+    if cached_tokens:
+        LLM_TOKENS.inc(cached_tokens, model=model, direction="cached")
@@ -0,0 +1,179 @@
+"""
+On-demand sampling profiler.
+
+A background thread samples the stack of one target thread and writes two
+profiles in the collapsed-stack format understood by flamegraph.pl,
+speedscope and inferno:
+
+- `<name>.wall.folded`: weighted by wall-clock microseconds, so time blocked
+  on Gemini, Postgres or disk shows up;
+- `<name>.cpu.folded`: weighted by the target thread's own CPU microseconds,
+  so only parsing, regex and other on-CPU work shows up.
+
+The difference between the two is time spent waiting.
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from logs import logger
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+# Off by default: profile requests cost CPU and write files on the server.
+PROFILING_ALLOWED = os.environ.get("PROFILING_ALLOWED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+def _flag(value) -> bool:
+    """A query or header value as a boolean; "0", "false", "no" and "" are off."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _thread_cpu_clock(thread_id: int):
+    """Per-thread CPU clock id, or None where the platform lacks one."""
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        file_name = Path(code.co_filename).name
+        names.append(f"{code.co_name} ({file_name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval, tracking wall and CPU time."""
+
+    def __init__(self, thread_id: int = None, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.wall: dict[str, int] = {}
+        self.cpu: dict[str, int] = {}
+        self.wall_seconds = 0.0
+        self.cpu_seconds = None
+        self._cpu_clock = _thread_cpu_clock(self.thread_id)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+
+    def _cpu_now(self):
+        if self._cpu_clock is None:
+            return None
+        try:
+            return time.clock_gettime(self._cpu_clock)
+        except OSError:  # target thread exited
+            return None
+
+    def _run(self):
+        last_wall = time.perf_counter()
+        last_cpu = self._cpu_now()
+        start_wall, start_cpu = last_wall, last_cpu
+
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now_wall = time.perf_counter()
+            now_cpu = self._cpu_now()
+            if frame is None:
+                break
+
+            stack = _collapse(frame)
+            wall_us = int((now_wall - last_wall) * 1e6)
+            self.wall[stack] = self.wall.get(stack, 0) + wall_us
+            if now_cpu is not None and last_cpu is not None:
+                cpu_us = int((now_cpu - last_cpu) * 1e6)
+                if cpu_us > 0:
+                    self.cpu[stack] = self.cpu.get(stack, 0) + cpu_us
+            last_wall, last_cpu = now_wall, now_cpu
+
+        self.wall_seconds = last_wall - start_wall
+        if start_cpu is not None and last_cpu is not None:
+            self.cpu_seconds = last_cpu - start_cpu
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def write(self, name: str, directory: str = PROFILE_DIR) -> list[str]:
+        """Write the collapsed stacks; returns the written paths."""
+        out_dir = Path(directory)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        paths = []
+        for kind, stacks in (("wall", self.wall), ("cpu", self.cpu)):
+            if not stacks:
+                continue
+            path = out_dir / f"{name}-{stamp}.{kind}.folded"
+            with open(path, "w") as f:
+                for stack, weight in sorted(stacks.items()):
+                    f.write(f"{stack} {weight}\n")
+            paths.append(str(path))
+        return paths
+
+
+@contextmanager
+def profile(name: str, thread_id: int = None):
+    """
+    Profile the calling thread (or `thread_id`) for the duration of the block.
+    Yields a list that is filled with the written profile paths on exit.
+    """
+    paths: list[str] = []
+    profiler = SamplingProfiler(thread_id).start()
+    try:
+        yield paths
+    finally:
+        profiler.stop()
+        paths.extend(profiler.write(name))
+        cpu = profiler.cpu_seconds
+        if cpu is not None and profiler.wall_seconds:
+            off_cpu = 1 - cpu / profiler.wall_seconds
+            logger.info(
+                f"Profile {name}: wall={profiler.wall_seconds:.3f}s cpu={cpu:.3f}s "
+                f"({off_cpu:.0%} off-CPU) -> {', '.join(paths)}"
+            )
+        else:
+            logger.info(
+                f"Profile {name}: wall={profiler.wall_seconds:.3f}s -> {', '.join(paths)}"
+            )
+
+
+@contextmanager
+def maybe_profile(name: str, requested, response=None):
+    """
+    Profile the block only when `requested` (a bool or a header value such
+    as "1" or "false") is on and profiling is allowed. The profile's id, the
+    file name stem under PROFILE_DIR, is returned to the client in the
+    `X-Profile-Id` header; server paths are not.
+
+    Only the calling thread is sampled: work handed to executor threads
+    (e.g. the checks of /audit_batch) shows up as time waiting on them.
+    """
+    if not _flag(requested) or not PROFILING_ALLOWED:
+        yield
+        return
+    with profile(name) as paths:
+        yield
+    if response is not None and paths:
+        response.headers["X-Profile-Id"] = Path(paths[0]).name.split(".")[0]
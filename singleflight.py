@@ -0,0 +1,219 @@
+"""
+Coalescing of identical in-flight work.
+
+`SingleFlight.do(key, fn)` runs `fn` once per key at a time: callers that
+arrive while it is running wait for it and get the same result (or the same
+exception) instead of repeating the work. Results must be JSON-serialisable.
+
+Two tiers, like the search cache:
+- in the process, followers wait on the leader's event;
+- across the uvicorn workers on a host, a SQLite file records which process
+  is computing each key and holds finished results for RESULT_SECONDS.
+  Followers in other workers poll it. A claim whose owner process has died,
+  or that is older than LEASE_SECONDS, is taken over.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from logs import logger
+from metrics import Counter, Gauge
+
+ENABLED = os.environ.get("SINGLEFLIGHT", "true").lower() in ("1", "true", "yes")
+# Empty string disables the cross-worker tier.
+SHARED_PATH = os.environ.get(
+    "SINGLEFLIGHT_PATH",
+    os.path.join(tempfile.gettempdir(), "readily-singleflight.sqlite"),
+)
+LEASE_SECONDS = float(os.environ.get("SINGLEFLIGHT_LEASE", 300))
+RESULT_SECONDS = float(os.environ.get("SINGLEFLIGHT_RESULT_TTL", 5))
+POLL_INTERVAL = 0.05
+
+FLIGHTS = Counter(
+    "readily_singleflight_total",
+    "Coalesced calls: computed (leader), shared in process, shared via the store",
+    ("flight", "result"),
+)
+IN_FLIGHT = Gauge(
+    "readily_singleflight_in_flight", "Keys being computed in this process", ("flight",)
+)
+
+
+@dataclass
+class _Call:
+    done: threading.Event = field(default_factory=threading.Event)
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SingleFlight:
+    def __init__(
+        self,
+        name: str,
+        shared_path: str = SHARED_PATH,
+        lease_seconds: float = LEASE_SECONDS,
+        result_seconds: float = RESULT_SECONDS,
+    ):
+        self.name = name
+        self.shared_path = shared_path
+        self.lease_seconds = lease_seconds
+        self.result_seconds = result_seconds
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._leads = 0
+
+    # ---- shared SQLite tier ----
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if not self.shared_path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.shared_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS flights ("
+                " flight TEXT, key TEXT, owner INTEGER, started REAL,"
+                " finished REAL, value TEXT, PRIMARY KEY (flight, key))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _claim(self, key: str) -> Tuple[bool, Optional[str]]:
+        """
+        (claimed, value): claim the key for this process, or return the
+        finished value another worker stored. (False, None) means another
+        live worker is computing it.
+        """
+        db = self._db()
+        if db is None:
+            return True, None
+        now = time.time()
+        pid = os.getpid()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT owner, started, finished, value FROM flights"
+                " WHERE flight = ? AND key = ?",
+                (self.name, key),
+            ).fetchone()
+            if row is not None:
+                owner, started, finished, value = row
+                if finished is not None and now - finished < self.result_seconds:
+                    return False, value
+                # Our own pid with no local call is left over from a crash.
+                running = (
+                    finished is None
+                    and owner != pid
+                    and now - started < self.lease_seconds
+                    and _alive(owner)
+                )
+                if running:
+                    return False, None
+            db.execute(
+                "INSERT OR REPLACE INTO flights VALUES (?, ?, ?, ?, NULL, NULL)",
+                (self.name, key, pid, now),
+            )
+            return True, None
+        finally:
+            db.execute("COMMIT")
+
+    def _publish(self, key: str, value: Optional[str]):
+        """Store the finished value, or drop the claim if the call failed."""
+        db = self._db()
+        if db is None:
+            return
+        if value is None:
+            db.execute(
+                "DELETE FROM flights WHERE flight = ? AND key = ? AND owner = ?",
+                (self.name, key, os.getpid()),
+            )
+            return
+        now = time.time()
+        db.execute(
+            "UPDATE flights SET finished = ?, value = ?"
+            " WHERE flight = ? AND key = ? AND owner = ?",
+            (now, value, self.name, key, os.getpid()),
+        )
+        self._leads += 1
+        if self._leads % 100 == 0:
+            db.execute(
+                "DELETE FROM flights WHERE finished < ? OR started < ?",
+                (now - self.result_seconds, now - self.lease_seconds),
+            )
+
+    def _wait_shared(self, key: str) -> Tuple[bool, Any]:
+        """Wait for another worker's result; (True, None) once we hold the claim."""
+        while True:
+            try:
+                claimed, value = self._claim(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared single-flight store unavailable: {e}")
+                return True, None
+            if claimed:
+                return True, None
+            if value is not None:
+                return False, json.loads(value)
+            time.sleep(POLL_INTERVAL)
+
+    # ---- API ----
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(result, shared): run `fn` or share the result of an identical call."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            FLIGHTS.inc(flight=self.name, result="shared")
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        IN_FLIGHT.inc(flight=self.name)
+        try:
+            claimed, value = self._wait_shared(key)
+            if not claimed:
+                call.value = value
+                FLIGHTS.inc(flight=self.name, result="shared_store")
+                return value, True
+            try:
+                call.value = fn()
+            except BaseException as e:
+                call.error = e
+                self._safe_publish(key, None)
+                raise
+            self._safe_publish(key, json.dumps(call.value))
+            FLIGHTS.inc(flight=self.name, result="leader")
+            return call.value, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            IN_FLIGHT.dec(flight=self.name)
+
+    def _safe_publish(self, key: str, value: Optional[str]):
+        try:
+            self._publish(key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared single-flight store unavailable: {e}")
@@ -1,10 +1,14 @@
 import streamlit as st
 import fitz  # PyMuPDF
 import requests
+import hashlib
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 import time
 import re
+from requests.adapters import HTTPAdapter
 
 from logs import logger
 
@@ -13,20 +17,30 @@ from datamodels import ResponseItem
 
 # API Configuration
 # API_URL = "https://readily-494772444195.europe-west1.run.app/audit"
-API_URL = "http://127.0.0.1:8080"
+API_URL = os.environ.get("API_URL", "http://127.0.0.1:8080")
+# Default number of questions in flight at once (1 sends them one by one)
+MAX_IN_FLIGHT = int(os.environ.get("STREAMLIT_MAX_IN_FLIGHT", 4))
+REQUEST_TIMEOUT = float(os.environ.get("STREAMLIT_REQUEST_TIMEOUT", 300))
 
 
-def extract_text_from_pdf(pdf_file) -> str:
-    """Extract text content from uploaded PDF file."""
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One keep-alive connection pool shared by every rerun and session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def extract_text_from_pdf(data: bytes) -> str:
+    """Extract text content from uploaded PDF bytes."""
     try:
         # Read the PDF file
-        pdf_document = fitz.open(stream=pdf_file.read(), filetype="pdf")
+        pdf_document = fitz.open(stream=data, filetype="pdf")
 
-        text_content = ""
-        # Extract text from each page
-        for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
-            text_content += page.get_text()
+        # Extract text from each page, joining once instead of `+=` per page
+        text_content = "".join(page.get_text() for page in pdf_document)
 
         pdf_document.close()
         return text_content.strip()
@@ -36,6 +50,17 @@ def extract_text_from_pdf(pdf_file) -> str:
         return ""
 
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def parse_pdf(digest: str, _data: bytes) -> list[ResponseItem]:
+    """
+    Questions of an uploaded PDF, cached by content hash so reruns (e.g.
+    moving the top_k slider) do not parse it again. `_data` is not hashed.
+    """
+    questions = extract_questions(extract_text_from_pdf(_data))
+    logger.info(f"Extracted {len(questions)} questions from PDF {digest[:12]}.")
+    return questions
+
+
 def extract_questions(text: str) -> list[ResponseItem]:
     """
     Extracts numbered questions from text and returns them as ResponseItem objects.
@@ -62,7 +87,9 @@ def call_api(text_content: str) -> Optional[dict]:
         payload = {"text": text_content}
         headers = {"Content-Type": "application/json"}
 
-        response = requests.post(f"{API_URL}/audit", json=payload, headers=headers)
+        response = get_session().post(
+            f"{API_URL}/audit", json=payload, headers=headers, timeout=REQUEST_TIMEOUT
+        )
         logger.debug(f"API response: {response.status_code} - {response.text}")
         response.raise_for_status()  # Raise an exception for bad status codes
 
@@ -76,27 +103,38 @@ def call_api(text_content: str) -> Optional[dict]:
         return None
 
 
-def call_api_one(req: ResponseItem) -> Optional[dict]:
-    try:
-        payload = {
-            "id": req.id,
-            "requirement": req.requirement,
-            "top_k": req.top_k,
-        }
-        headers = {"Content-Type": "application/json"}
-
-        response = requests.post(f"{API_URL}/audit_one", json=payload, headers=headers)
-        logger.debug(f"API response: {response.status_code} - {response.text}")
-        response.raise_for_status()  # Raise an exception for bad status codes
+def call_api_one(session: requests.Session, req: ResponseItem) -> dict:
+    """
+    POST one question to /audit_one. Runs on worker threads, so it raises
+    instead of calling st.*; the caller reports failures.
+    """
+    payload = {
+        "id": req.id,
+        "requirement": req.requirement,
+        "top_k": req.top_k,
+    }
+    headers = {"Content-Type": "application/json"}
+
+    response = session.post(
+        f"{API_URL}/audit_one", json=payload, headers=headers, timeout=REQUEST_TIMEOUT
+    )
+    logger.debug(f"API response: {response.status_code} - {response.text}")
+    response.raise_for_status()  # Raise an exception for bad status codes
+    return response.json()
 
-        return response.json()
 
-    except requests.exceptions.RequestException as e:
-        st.error(f"API request failed: {str(e)}")
-        return None
-    except json.JSONDecodeError as e:
-        st.error(f"Failed to parse API response: {str(e)}")
-        return None
+def render_response(placeholder, i: int, res: dict):
+    """Fill one question's placeholder with its result card."""
+    with placeholder.container():
+        with st.expander(f"Question {i}: {res.get('requirement', '')[:100]}..."):
+            st.markdown(
+                f"**✅ Requirement Met:** {'Yes' if res.get('is_met') else 'No'}"
+            )
+            st.markdown(f"**📄 Citation:** {res.get('citation', '—')}")
+            if res.get("explanation"):
+                st.markdown(f"**🧩 Explanation:** {res['explanation']}")
+            if res.get("file_name"):
+                st.caption(f"📁 Source: {res['file_name']}")
 
 
 def main():
@@ -117,15 +155,21 @@ def main():
         value=3,
         help="Controls how many top policy matches to retrieve from the database for each question.",
     )
+    in_flight = st.slider(
+        "Questions in flight",
+        min_value=1,
+        max_value=16,
+        value=MAX_IN_FLIGHT,
+        help="How many questions are sent to the API at once; 1 sends them one by one.",
+    )
 
     if uploaded_file is not None:
         st.success(f"✅ File uploaded: {uploaded_file.name}")
 
         if st.button("🚀 Extract Text and Process", type="primary"):
             with st.spinner("📖 Extracting text from PDF..."):
-                text_content = extract_text_from_pdf(uploaded_file)
-                questions = extract_questions(text_content)
-                logger.info(f"Extracted {len(questions)} questions from PDF.")
+                data = uploaded_file.getvalue()
+                questions = parse_pdf(hashlib.sha256(data).hexdigest(), data)
                 formatted_questions = format_questions(questions)
 
             if formatted_questions:
@@ -141,60 +185,43 @@ def main():
 
                 # Dynamic placeholders
                 status_area = st.empty()
-                question_area = st.empty()
-                responses_area = st.empty()
+                progress = st.progress(0.0)
+                st.subheader("📋 API Responses")
+                # One slot per question, in order; each is filled once when
+                # its answer arrives, so rendering stays linear.
+                slots = [st.empty() for _ in questions]
 
-                all_responses = []
                 total = len(questions)
+                done = failed = 0
                 status_area.info(f"⏳ Processing {total} questions with the API...")
 
-                # Loop over each question progressively
-                for i, question in enumerate(questions, start=1):
-                    with st.spinner(f"Processing Question {i}/{total}..."):
+                session = get_session()
+                with ThreadPoolExecutor(max_workers=in_flight) as pool:
+                    futures = {}
+                    for i, question in enumerate(questions, start=1):
                         # Assign user-selected top_k
                         question.top_k = top_k
-
-                        # Show current question temporarily
-                        question_area.markdown(
-                            f"📡 **Sending Question {i}/{total}:** {question.requirement}"
-                        )
-                        response = call_api_one(question)
-
-                        # Append and update progress
-                        if response:
-                            all_responses.append(response)
-                            status_area.info(f"✅ Processed {i}/{total} questions")
-                        else:
-                            all_responses.append({"error": f"Failed at question {i}"})
-                            status_area.warning(f"⚠️ Failed at Question {i}/{total}")
-
-                        # Update responses progressively with expandable cards
-                        responses_area.empty()  # clear the previous display
-                        with responses_area.container():
-                            st.subheader("📋 API Responses")
-                            for i, res in enumerate(all_responses, start=1):
-                                res = res.get("response")
-                                if res:
-                                    with st.expander(
-                                        f"Question {i}: {res.get('requirement', '')[:100]}..."
-                                    ):
-                                        st.markdown(
-                                            f"**✅ Requirement Met:** {'Yes' if res.get('is_met') else 'No'}"
-                                        )
-                                        st.markdown(
-                                            f"**📄 Citation:** {res.get('citation', '—')}"
-                                        )
-                                        if res.get("explanation"):
-                                            st.markdown(
-                                                f"**🧩 Explanation:** {res['explanation']}"
-                                            )
-                                        if res.get("file_name"):
-                                            st.caption(f"📁 Source: {res['file_name']}")
-
-                        # Clear the temporary question display
-                        question_area.empty()
-
-                status_area.success("🎉 All questions processed successfully!")
+                        futures[pool.submit(call_api_one, session, question)] = i
+
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        done += 1
+                        try:
+                            res = future.result().get("response")
+                            if res:
+                                render_response(slots[i - 1], i, res)
+                        except (requests.exceptions.RequestException, ValueError) as e:
+                            failed += 1
+                            slots[i - 1].warning(f"⚠️ Question {i} failed: {e}")
+                        progress.progress(done / total)
+                        status_area.info(f"✅ Processed {done}/{total} questions")
+
+                if failed:
+                    status_area.warning(
+                        f"⚠️ {failed} of {total} questions failed, see below."
+                    )
+                else:
+                    status_area.success("🎉 All questions processed successfully!")
 
             else:
                 st.error("❌ No text content could be extracted from the PDF.")
@@ -206,7 +233,7 @@ def main():
         1. **Upload PDF**  
         2. **Select your desired `top_k` value**  
         3. **Click Extract & Process**  
-        4. **Watch responses appear one by one!**
+        4. **Watch responses appear as they are answered!**
         """
         )
 
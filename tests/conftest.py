@@ -0,0 +1,41 @@
+"""
+Tests run offline against the fakes in benchmarks/fakes.py. Gemini and
+Postgres are patched here, before any repo module is imported, exactly as
+the benchmark runner does.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "offline-test")
+os.environ.setdefault("SEARCH_CACHE_PATH", "")
+os.environ.setdefault("SINGLEFLIGHT_PATH", "")
+os.environ.setdefault("CONTEXT_CACHE", "local")
+os.environ.setdefault("DOCSTORE_DIR", tempfile.mkdtemp(prefix="readily-docstore-"))
+
+from benchmarks.fakes import OfflineBackends  # noqa: E402
+
+_backends = OfflineBackends().__enter__()
+
+
+@pytest.fixture
+def backends():
+    """The fakes, with an empty database and the 'tables created' flags reset."""
+    import compliance
+    from indexer import dedup, search_cache, versions
+
+    _backends.rebind()
+    _backends.db.tables.clear()
+    _backends.db.columns.clear()
+    compliance._ready = False
+    versions._ready = False
+    versions._cached = None
+    dedup._ready_tables.clear()
+    search_cache.search_cache._memory.clear()
+    search_cache.search_cache._version = None
+    yield _backends
@@ -0,0 +1,66 @@
+import pytest
+
+from indexer.chunker import Chunker, ChunkStats, estimate_tokens, split_sentences
+
+
+def _sentence(i: int) -> str:
+    return f"Sentence number {i} describes one obligation of the plan in detail."
+
+
+def test_small_paragraphs_are_packed_within_the_budget():
+    paragraphs = [_sentence(i) for i in range(40)]
+    chunker = Chunker(max_tokens=64, overlap_tokens=0, min_tokens=0)
+    chunks = list(chunker.chunks(paragraphs))
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c) <= 64 for c in chunks)
+    assert "\n\n".join(chunks).split("\n\n") == paragraphs
+
+
+def test_long_paragraphs_split_at_sentences_and_words():
+    paragraph = " ".join(_sentence(i) for i in range(20))
+    giant = "word " * 400
+    chunker = Chunker(max_tokens=50, overlap_tokens=0, min_tokens=0)
+    chunks = list(chunker.chunks([paragraph, giant.strip()]))
+    assert all(estimate_tokens(c) <= 50 for c in chunks)
+    sentence_chunks = [c for c in chunks if "Sentence" in c]
+    assert all(c.endswith(".") for c in sentence_chunks)
+    assert " ".join(chunks).split() == (paragraph + " " + giant).split()
+
+
+def test_overlap_repeats_whole_trailing_sentences():
+    paragraph = " ".join(_sentence(i) for i in range(12))
+    chunker = Chunker(max_tokens=60, overlap_tokens=20, min_tokens=0)
+    chunks = list(chunker.chunks([paragraph]))
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last = split_sentences(previous)[-1]
+        assert chunk.startswith(last)
+    assert all(estimate_tokens(c) <= 60 for c in chunks)
+
+
+def test_short_tail_is_folded_into_the_previous_chunk():
+    paragraphs = [_sentence(i) for i in range(9)] + ["Short tail."]
+    chunker = Chunker(max_tokens=60, overlap_tokens=0, min_tokens=10)
+    stats = ChunkStats()
+    chunks = list(chunker.chunks(paragraphs, stats))
+    assert chunks[-1].endswith("Short tail.")
+    assert chunks[-1] != "Short tail."
+    assert len(stats.tokens) == len(chunks)
+
+
+def test_list_markers_and_abbreviations_are_not_sentence_ends():
+    text = "A. Members may appeal, e.g. by phone. No. 5 applies. See Sec. 2 below."
+    assert split_sentences(text) == [
+        "A. Members may appeal, e.g. by phone.",
+        "No. 5 applies.",
+        "See Sec. 2 below.",
+    ]
+
+
+def test_overlap_must_be_smaller_than_the_chunk():
+    with pytest.raises(ValueError):
+        Chunker(max_tokens=32, overlap_tokens=32)
+
+
+def test_empty_section_yields_nothing():
+    assert list(Chunker().chunks([])) == []
@@ -0,0 +1,28 @@
+from datamodels import ResponseItem
+
+
+def test_miss_then_miss_on_a_database_without_matrix_tables(backends):
+    import compliance
+
+    reader = compliance.MatrixReader()
+    try:
+        first = ResponseItem(id=1, requirement="Is there a grievance policy?")
+        second = ResponseItem(id=2, requirement="Are appeals answered in 30 days?")
+        assert reader.answer(first) is False
+        # The tables created on the first call must have been committed.
+        assert reader.answer(second) is False
+    finally:
+        reader.close()
+    assert compliance.MATRIX_TABLE in backends.db.tables
+
+
+def test_reader_uses_one_connection_per_audit(backends):
+    import compliance
+
+    compliance._ensure()
+    before = backends.db.connections
+    reader = compliance.MatrixReader()
+    for i in range(5):
+        reader.answer(ResponseItem(id=i, requirement=f"Requirement number {i}?"))
+    reader.close()
+    assert backends.db.connections - before == 1
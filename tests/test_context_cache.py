@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+import limiter
+from extractor.context_cache import (
+    ContextBackend,
+    ContextCache,
+    GeminiContextBackend,
+    LocalContextBackend,
+)
+
+
+def _cache(max_entries: int) -> ContextCache:
+    return ContextCache(
+        LocalContextBackend(), min_tokens=0, min_uses=1, max_entries=max_entries
+    )
+
+
+def _use(cache: ContextCache, prefix: str):
+    with cache.lease("model", prefix) as entry:
+        return entry
+
+
+def test_idle_entries_are_kept_under_the_limit():
+    cache = _cache(max_entries=8)
+    for i in range(7):
+        _use(cache, f"document {i}")
+    assert len(cache._entries) == 7
+    assert len(cache.backend.prefixes) == 7
+
+
+def test_least_recently_used_idle_entry_is_evicted_over_the_limit():
+    cache = _cache(max_entries=2)
+    first = _use(cache, "document 0")
+    _use(cache, "document 1")
+    _use(cache, "document 2")
+    assert len(cache._entries) == 2
+    assert first.key not in cache._entries
+    assert first.name not in cache.backend.prefixes
+
+
+def test_backends_must_implement_the_interface():
+    class Partial(ContextBackend):
+        def create(self, model, prefix, ttl):
+            return "name", 0.0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_gemini_cache_calls_go_through_the_limiter(monkeypatch):
+    calls = []
+
+    def call(model, fn, tokens=0):
+        calls.append((model, tokens))
+        return fn()
+
+    class Caches:
+        def create(self, model, config):
+            return SimpleNamespace(name="cachedContents/1", expire_time=None)
+
+        def update(self, name, config):
+            pass
+
+        def delete(self, name):
+            pass
+
+    monkeypatch.setattr(limiter, "call", call)
+    backend = GeminiContextBackend(SimpleNamespace(caches=Caches()))
+    name, _ = backend.create("model", "x" * 400, 60)
+    backend.extend("model", name, 60)
+    backend.delete("model", name)
+    assert calls == [("model", 101), ("model", 0), ("model", 0)]
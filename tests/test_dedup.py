@@ -0,0 +1,95 @@
+from indexer.db import get_connection
+
+ROW = {
+    "file_name": "a.pdf",
+    "section": "Purpose",
+    "paragraph_id": 1,
+    "content": "Members may appeal any denial within sixty days of the notice date.",
+}
+
+
+def _legacy_table(name: str):
+    """A table as created before dedup, without its columns."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} (id SERIAL PRIMARY KEY, file_name TEXT,"
+        " section TEXT, paragraph_id INT, content TEXT, embedding vector(768));"
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_search_lookup_runs_no_ddl(backends):
+    from indexer import dedup
+    from indexer.insert import save_results_to_db
+
+    _legacy_table("policy_purpose")
+    conn = get_connection()
+    cur = conn.cursor()
+    statements = []
+    execute = cur.execute
+    cur.execute = lambda q, p=(): statements.append(str(q)) or execute(q, p)
+    assert dedup.duplicate_files(cur, "policy_purpose", [1, 2]) == {}
+    conn.close()
+    assert not [q for q in statements if "ALTER" in q or "CREATE" in q]
+
+    # Ingest still migrates the table afterwards.
+    conn = get_connection()
+    save_results_to_db(conn.cursor(), [ROW], "policy_purpose")
+    conn.commit()
+    conn.close()
+    assert "lsh_bands" in backends.db.columns["policy_purpose"]
+
+
+def test_columns_added_at_ingest_survive_a_rollback(backends):
+    from indexer import dedup
+    from indexer.insert import save_results_to_db
+
+    _legacy_table("policy_purpose")
+    conn = get_connection()
+    save_results_to_db(conn.cursor(), [ROW], "policy_purpose")
+    conn.rollback()  # e.g. the PDF failed to parse further on
+    conn.close()
+    assert "lsh_bands" in backends.db.columns["policy_purpose"]
+    assert backends.db.rows("policy_purpose") == []
+
+    conn = get_connection()
+    cur = conn.cursor()
+    assert dedup.duplicate_files(cur, "policy_purpose", [1]) == {}
+    conn.close()
+
+
+def test_new_tables_are_created_with_the_columns(backends):
+    from indexer.db import create_table
+
+    create_table("policy_paragraphs")
+    assert "lsh_bands" in backends.db.columns["policy_paragraphs"]
+
+
+def test_backfill_repairs_duplicates_of_a_deleted_row(backends):
+    from indexer import dedup
+    from indexer.db import create_table
+    from indexer.insert import save_results_to_db
+
+    create_table("policy_purpose")
+    conn = get_connection()
+    cur = conn.cursor()
+    save_results_to_db(
+        cur,
+        [{**ROW, "file_name": name} for name in ("a.pdf", "b.pdf", "c.pdf")],
+        "policy_purpose",
+    )
+    rows = backends.db.rows("policy_purpose")
+    canonical = next(r["id"] for r in rows if r["file_name"] == "a.pdf")
+    assert [r["canonical_id"] for r in rows] == [None, canonical, canonical]
+    cur.execute("DELETE FROM policy_purpose WHERE id = %s", (canonical,))
+    conn.commit()
+    conn.close()
+
+    result = dedup.backfill("policy_purpose")
+    assert (result["embedded"], result["repointed"]) == (1, 1)
+    b, c = backends.db.rows("policy_purpose")
+    assert b["embedding"] is not None and b["canonical_id"] is None
+    assert c["embedding"] is None and c["canonical_id"] == b["id"]
+    assert dedup.backfill("policy_purpose")["embedded"] == 0
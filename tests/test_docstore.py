@@ -0,0 +1,49 @@
+from itertools import islice
+
+import pytest
+
+from benchmarks.synth import generate_policy_pdfs
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    from indexer import docstore
+
+    monkeypatch.setattr(docstore, "ENABLED", True)
+    monkeypatch.setattr(docstore, "DOCSTORE_DIR", str(tmp_path / "store"))
+    (pdf,) = generate_policy_pdfs(str(tmp_path / "pdfs"), count=1, paragraphs=30)
+    return docstore, pdf
+
+
+def _entry(docstore, pdf):
+    from indexer.versions import file_hash
+
+    return docstore.load(file_hash(str(pdf)))
+
+
+def test_stored_blocks_match_the_pdf(store):
+    from indexer.reader import iter_pdf_blocks
+
+    docstore, pdf = store
+    expected = list(iter_pdf_blocks(pdf))
+    assert len(expected) > 2
+    assert list(docstore.document_blocks(pdf)) == expected  # miss, streamed
+    assert _entry(docstore, pdf).complete
+    assert list(docstore.document_blocks(pdf)) == expected  # hit
+
+
+def test_early_stop_leaves_a_partial_entry_that_later_reads_extend(store):
+    from indexer.reader import iter_pdf_blocks
+
+    docstore, pdf = store
+    expected = list(iter_pdf_blocks(pdf))
+    blocks = docstore.document_blocks(pdf)
+    assert list(islice(blocks, 1)) == expected[:1]
+    blocks.close()  # e.g. iter_purpose stops once PURPOSE has ended
+
+    partial = _entry(docstore, pdf)
+    assert not partial.complete
+    assert list(partial.iter_blocks()) == expected[:1]
+
+    assert list(docstore.document_blocks(pdf)) == expected
+    assert _entry(docstore, pdf).complete
@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks.fakes import FakeDatabase, FakeProgrammingError
+
+
+def test_uncommitted_ddl_and_rows_are_rolled_back_on_close():
+    db = FakeDatabase()
+    conn = db.connect()
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS t (id INT PRIMARY KEY, name TEXT);")
+    cur.execute("INSERT INTO t (id, name) VALUES (%s, %s)", (1, "a"))
+    conn.close()
+
+    cur = db.connect().cursor()
+    with pytest.raises(FakeProgrammingError, match='relation "t" does not exist'):
+        cur.execute("SELECT name FROM t")
+
+
+def test_committed_changes_survive_and_later_ones_roll_back():
+    db = FakeDatabase()
+    conn = db.connect()
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS t (id INT PRIMARY KEY, n INT);")
+    cur.execute("INSERT INTO t (id, n) VALUES (%s, %s)", (1, 0))
+    conn.commit()
+    cur.execute("UPDATE t SET n = n + 1 WHERE id = %s", (1,))
+    cur.execute("ALTER TABLE t ADD COLUMN IF NOT EXISTS extra INT;")
+    conn.rollback()
+
+    cur.execute("SELECT n FROM t WHERE id = %s", (1,))
+    assert cur.fetchall() == [(0,)]
+    with pytest.raises(FakeProgrammingError, match='column "extra"'):
+        cur.execute("SELECT extra FROM t")
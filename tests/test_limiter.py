@@ -0,0 +1,60 @@
+import pytest
+
+import limiter
+from benchmarks.fakes import FakeAPIError
+
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(limiter, "MAX_RETRIES", 2)
+    monkeypatch.setattr(limiter.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(limiter, "_limiters", {})
+
+
+def _throttled(hint=None):
+    error = FakeAPIError(429, "quota")
+    if hint is not None:
+        error.details = {
+            "error": {
+                "details": [
+                    {
+                        "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                        "retryDelay": f"{hint}s",
+                    }
+                ]
+            }
+        }
+    return error
+
+
+def _fail(error):
+    def fn():
+        raise error
+
+    return fn
+
+
+def test_retry_after_comes_from_the_server_hint(fast):
+    with pytest.raises(limiter.RateLimitError) as raised:
+        limiter.call("test-model", _fail(_throttled(hint=42)))
+    assert raised.value.retry_after == 42
+
+
+def test_retry_after_follows_the_backoff_without_a_hint(fast):
+    with pytest.raises(limiter.RateLimitError) as raised:
+        limiter.call("test-model", _fail(_throttled()))
+    # Attempt 2 of 2 failed: the next step would have been BASE * 2**3.
+    expected = min(limiter.BACKOFF_CAP, limiter.BACKOFF_BASE * 8)
+    assert raised.value.retry_after == max(1.0, expected)
+
+
+def test_slot_is_released_whatever_the_call_raises(fast):
+    class Cancelled(BaseException):
+        pass
+
+    for error in (ValueError("bad request"), Cancelled(), _throttled()):
+        with pytest.raises((ValueError, Cancelled, limiter.RateLimitError)):
+            limiter.call("test-model", _fail(error))
+        assert limiter.get_limiter("test-model").concurrency.in_flight == 0
+    assert limiter.call("test-model", lambda: "ok") == "ok"
+    assert limiter.get_limiter("test-model").concurrency.in_flight == 0
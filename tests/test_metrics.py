@@ -0,0 +1,26 @@
+import metrics
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("readily_test_escape_total", "Escaping", ("value",))
+    try:
+        counter.inc(value='a "quoted"\\path\nnext')
+        (line,) = [l for l in counter.render() if not l.startswith("#")]
+        assert (
+            line == 'readily_test_escape_total{value="a \\"quoted\\"\\\\path\\nnext"} 1'
+        )
+    finally:
+        metrics._registry.remove(counter)
+
+
+def test_http_latency_is_labelled_by_route_template(backends):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    client.get("/")
+    client.get("/no/such/path/123")
+    paths = {key[1] for key in metrics.HTTP_REQUEST_SECONDS.totals()}
+    assert "/" in paths and "unmatched" in paths
+    assert not any("123" in p for p in paths)
@@ -0,0 +1,32 @@
+import pytest
+
+
+class _Response:
+    def __init__(self):
+        self.headers = {}
+
+
+@pytest.mark.parametrize("value", ["0", "false", "no", "", None, False])
+def test_off_header_values_do_not_profile(value, monkeypatch):
+    import profiling
+
+    monkeypatch.setattr(profiling, "PROFILING_ALLOWED", True)
+    response = _Response()
+    with profiling.maybe_profile("test", value, response):
+        pass
+    assert response.headers == {}
+
+
+def test_profile_id_does_not_reveal_server_paths(monkeypatch, tmp_path):
+    import profiling
+
+    monkeypatch.setattr(profiling, "PROFILING_ALLOWED", True)
+    monkeypatch.setattr(
+        profiling.SamplingProfiler,
+        "write",
+        lambda self, name: [str(tmp_path / f"{name}-1.wall.folded")],
+    )
+    response = _Response()
+    with profiling.maybe_profile("test", "1", response):
+        pass
+    assert response.headers == {"X-Profile-Id": "test-1"}
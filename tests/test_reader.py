@@ -0,0 +1,46 @@
+from indexer import reader
+from indexer.reader import iter_text_blocks
+
+
+def _joined(blocks) -> str:
+    text = "\n\n".join(b.text for b in blocks)
+    for b in blocks:
+        assert text[b.offset : b.offset + len(b.text)] == b.text
+    return text
+
+
+def test_paragraphs_split_by_a_page_break_come_out_whole():
+    pages = ["I. PURPOSE\n\nFirst paragraph starts", "and ends here.\n\nSecond."]
+    blocks = list(iter_text_blocks(pages))
+    assert [b.text for b in blocks] == [
+        "I. PURPOSE",
+        "First paragraph starts\nand ends here.",
+        "Second.",
+    ]
+    assert [b.page for b in blocks] == [1, 1, 2]
+    _joined(blocks)
+
+
+def test_carry_is_bounded_on_pages_without_blank_lines(monkeypatch):
+    monkeypatch.setattr(reader, "MAX_CARRY_CHARS", 200)
+    line = "a line of policy text with no paragraph break"
+    pages = ["\n".join([line] * 10) for _ in range(50)]
+
+    carried = []
+    normalize = reader.normalize_text
+    monkeypatch.setattr(
+        reader, "normalize_text", lambda t: carried.append(len(t)) or normalize(t)
+    )
+    blocks = list(iter_text_blocks(pages))
+
+    assert max(carried) < len(pages[0]) + 200 + len(line) + 2
+    assert len(blocks) >= 50
+    assert _joined(blocks).split() == " ".join(pages).split()
+
+
+def test_text_without_any_line_break_is_flushed(monkeypatch):
+    monkeypatch.setattr(reader, "MAX_CARRY_CHARS", 100)
+    pages = ["word " * 100 for _ in range(5)]
+    blocks = list(iter_text_blocks(pages))
+    assert len(blocks) == 5
+    assert all(len(b.text) <= 500 for b in blocks)
@@ -0,0 +1,14 @@
+from benchmarks.synth import generate_policy_pdfs
+
+
+def test_rebuild_bumps_the_index_version_once(backends, tmp_path):
+    from indexer import rebuild
+    from indexer.db import create_table
+    from indexer.versions import current_version, document_versions
+
+    create_table("policy_procedure")
+    pdfs = generate_policy_pdfs(str(tmp_path), count=3)
+    rebuild.run(str(tmp_path), tables=["policy_procedure"])
+
+    assert current_version(max_age=0) == 1
+    assert document_versions() == {p.name: 1 for p in pdfs}
@@ -0,0 +1,58 @@
+from indexer.reader import iter_sections, iter_text_blocks, normalize_text
+from indexer.sections import split_sections
+
+DOCUMENT = """I. PURPOSE
+This policy describes how grievances are handled.
+
+II. POLICY
+A. The plan shall:
+   i. Policy statements are reviewed yearly
+   ii. Procedure for appeals is published to members
+
+III. PROCEDURES
+A. Members file a grievance by phone or mail.
+
+IV. ATTACHMENTS
+A. Grievance form
+"""
+
+
+def _text(name: str) -> str:
+    start, end = split_sections(DOCUMENT)[name]
+    return DOCUMENT[start:end].strip()
+
+
+def test_sections_run_to_the_next_heading():
+    assert set(split_sections(DOCUMENT)) == {
+        "purpose",
+        "policy",
+        "procedure",
+        "attachment",
+    }
+    assert _text("purpose") == "This policy describes how grievances are handled."
+    assert _text("procedure") == "A. Members file a grievance by phone or mail."
+
+
+def test_lowercase_numbered_sub_items_are_not_headings():
+    policy = _text("policy")
+    assert policy.startswith("A. The plan shall:")
+    assert "ii. Procedure for appeals" in policy
+
+
+def test_heading_titles_ignore_case_and_first_occurrence_wins():
+    text = "I. Purpose\nFirst.\nII. purpose\nSecond.\nIII. Policy\nThird."
+    sections = split_sections(text)
+    # The repeated heading still ends the first section.
+    assert text[slice(*sections["purpose"])].strip() == "First."
+
+
+def test_streamed_sections_match_the_splitter():
+    blocks = iter_text_blocks([DOCUMENT])
+    pieces = {}
+    for name, piece, _ in iter_sections(blocks, wanted=["policy", "procedure"]):
+        pieces.setdefault(name, []).append(piece)
+    text = normalize_text(DOCUMENT)
+    for name in ("policy", "procedure"):
+        start, end = split_sections(text)[name]
+        assert "\n\n".join(pieces[name]) == text[start:end].strip()
+    assert "ii. Procedure for appeals" in pieces["policy"][0]
@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+@pytest.fixture
+def shared_path(tmp_path):
+    return str(tmp_path / "singleflight.sqlite")
+
+
+def _dead_pid() -> int:
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    return child.pid
+
+
+def _seed(flight: SingleFlight, key: str, owner: int, started: float):
+    """Record an unfinished claim, as another worker would."""
+    flight._db().execute(
+        "INSERT OR REPLACE INTO flights VALUES (?, ?, ?, ?, NULL, NULL)",
+        (flight.name, key, owner, started),
+    )
+
+
+def test_concurrent_calls_run_once_and_share_the_value(shared_path):
+    flight = SingleFlight("test", shared_path)
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return {"answer": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+        for _ in range(2)
+    ]
+    threads[0].start()
+    started.wait(5)
+    threads[1].start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True]
+    assert [value for value, _ in results] == [{"answer": 42}] * 2
+
+
+def test_leader_error_reaches_followers_and_is_not_stored(shared_path):
+    flight = SingleFlight("test", shared_path)
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def run():
+        try:
+            flight.do("k", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    threads[0].start()
+    started.wait(5)
+    threads[1].start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    # The failed claim is dropped, so the next call computes again.
+    assert flight.do("k", lambda: 1) == (1, False)
+
+
+def test_finished_results_are_reused_across_workers_within_the_window(
+    shared_path,
+):
+    worker = SingleFlight("test", shared_path, result_seconds=60)
+    other = SingleFlight("test", shared_path, result_seconds=60)
+    assert worker.do("k", lambda: [1, 2]) == ([1, 2], False)
+    assert other.do("k", lambda: pytest.fail("recomputed")) == ([1, 2], True)
+
+
+def test_results_older_than_the_window_are_recomputed(shared_path):
+    worker = SingleFlight("test", shared_path, result_seconds=0)
+    worker.do("k", lambda: "old")
+    assert worker.do("k", lambda: "new") == ("new", False)
+
+
+def test_claim_of_a_live_owner_is_respected_within_the_lease(shared_path):
+    flight = SingleFlight("test", shared_path, lease_seconds=60)
+    _seed(flight, "k", os.getppid(), time.time())
+    assert flight._claim("k") == (False, None)
+
+
+def test_expired_lease_is_taken_over(shared_path):
+    flight = SingleFlight("test", shared_path, lease_seconds=1)
+    _seed(flight, "k", os.getppid(), time.time() - 10)
+    assert flight.do("k", lambda: "mine") == ("mine", False)
+
+
+def test_claim_of_a_dead_owner_is_taken_over(shared_path):
+    flight = SingleFlight("test", shared_path, lease_seconds=60)
+    _seed(flight, "k", _dead_pid(), time.time())
+    assert flight.do("k", lambda: "mine") == ("mine", False)
@@ -0,0 +1,106 @@
+import zipfile
+
+import numpy as np
+import pytest
+
+from indexer.db import get_connection
+
+APPEAL = "Members may appeal any denial within sixty days of the notice date."
+ROWS = [
+    {"file_name": "a.pdf", "section": "Purpose", "paragraph_id": 1, "content": APPEAL},
+    # A near-duplicate: stored without an embedding.
+    {"file_name": "b.pdf", "section": "Purpose", "paragraph_id": 1, "content": APPEAL},
+    {
+        "file_name": "c.pdf",
+        "section": None,
+        "paragraph_id": None,
+        "content": "Tabs\there,\nnew lines\r\nand a back\\slash \\N too.",
+    },
+]
+
+
+def _store(table: str):
+    from indexer.db import create_table
+    from indexer.insert import save_results_to_db
+
+    create_table(table)
+    conn = get_connection()
+    save_results_to_db(conn.cursor(), ROWS, table)
+    conn.commit()
+    conn.close()
+
+
+def _contents(backends, table: str):
+    return sorted(
+        (
+            r["file_name"],
+            r["section"] or "",
+            r["paragraph_id"] or 0,
+            r["content"],
+            r["embedding"] is None,
+        )
+        for r in backends.db.rows(table)
+    )
+
+
+def test_export_import_round_trip(backends, tmp_path):
+    from indexer import snapshot
+
+    _store("policy_purpose")
+    before = _contents(backends, "policy_purpose")
+    assert [r[-1] for r in before] == [False, True, False]
+    embeddings = {
+        r["file_name"]: np.asarray(r["embedding"], np.float32)
+        for r in backends.db.rows("policy_purpose")
+        if r["embedding"] is not None
+    }
+
+    path = str(tmp_path / "snapshot.npz")
+    assert snapshot.export(path, "policy_purpose") == {
+        "policy_purpose": {"rows": 3, "batches": 1, "embedded": True}
+    }
+    assert snapshot.import_(path, replace=True) == {"policy_purpose": 3}
+
+    rows = backends.db.rows("policy_purpose")
+    assert _contents(backends, "policy_purpose") == before
+    nulls = next(r for r in rows if r["file_name"] == "c.pdf")
+    assert nulls["section"] is None and nulls["paragraph_id"] is None
+    for row in rows:
+        if row["embedding"] is not None:
+            assert np.array_equal(
+                np.asarray(row["embedding"], np.float32), embeddings[row["file_name"]]
+            )
+
+
+def test_import_refuses_a_non_empty_table_without_replace(backends, tmp_path):
+    from indexer import snapshot
+
+    _store("policy_purpose")
+    path = str(tmp_path / "snapshot.npz")
+    snapshot.export(path, "policy_purpose")
+    with pytest.raises(ValueError, match="--replace"):
+        snapshot.import_(path)
+
+
+def test_import_rejects_a_corrupted_member(backends, tmp_path):
+    from indexer import snapshot
+
+    _store("policy_purpose")
+    path, corrupted = str(tmp_path / "snapshot.npz"), str(tmp_path / "bad.npz")
+    snapshot.export(path, "policy_purpose")
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(corrupted, "w") as dst:
+        for item in src.infolist():
+            data = src.read(item)
+            if item.filename.endswith("/content.npy"):
+                data = data[:-1] + bytes([data[-1] ^ 1])
+            dst.writestr(item, data)
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        snapshot.import_(corrupted, replace=True)
+
+
+def test_copy_value_escapes_the_text_format():
+    from indexer.snapshot import _copy_value
+
+    assert _copy_value(None) == "\\N"
+    assert _copy_value("a\tb\nc\rd\\N") == "a\\tb\\nc\\rd\\\\N"
+    assert _copy_value(7) == "7"
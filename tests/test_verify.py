@@ -0,0 +1,62 @@
+from extractor.verify import verify_citation
+
+SOURCE = (
+    "Members may file a grievance at any time. "
+    "The plan shall resolve each grievance within thirty (30) days of receipt."
+)
+
+
+def test_exact_and_fuzzy_quotes_are_verified():
+    exact = verify_citation("the plan shall resolve each grievance", SOURCE)
+    assert exact.verified and exact.method == "exact"
+    assert SOURCE[exact.start : exact.end].lower() == (
+        "the plan shall resolve each grievance"
+    )
+    fuzzy = verify_citation(
+        "The plan will resolve each grievance within thirty (30) days of receipt",
+        SOURCE,
+    )
+    assert fuzzy.verified and fuzzy.method == "fuzzy"
+
+
+def test_invented_quotes_are_not_verified():
+    match = verify_citation("Appeals are heard by an external panel", SOURCE)
+    assert not match.verified and match.method == "none"
+    assert match.start is None and match.page is None
+
+
+def test_located_span_points_into_the_stored_section_and_page(
+    backends, tmp_path, monkeypatch
+):
+    from datamodels import PolicyRow
+    from extractor.verify import locate
+    from indexer import docstore
+    from indexer.db import get_connection
+    from indexer.parse import extract_policy_and_procedure
+    from indexer.versions import record_document
+
+    from benchmarks.synth import generate_policy_pdfs
+
+    monkeypatch.setattr(docstore, "ENABLED", True)
+    monkeypatch.setattr(docstore, "DOCSTORE_DIR", str(tmp_path / "store"))
+    docstore._stored_document.cache_clear()
+    (pdf,) = generate_policy_pdfs(str(tmp_path / "pdfs"), count=1, paragraphs=40)
+    sections = extract_policy_and_procedure(str(pdf))
+    conn = get_connection()
+    record_document(conn.cursor(), "policy_procedure", str(pdf))
+    conn.commit()
+    conn.close()
+
+    row = PolicyRow(file_name=pdf.name, section="policy+procedure", content="")
+    for s in sections:
+        row.sections.append((s["section"], len(row.content)))
+        row.content += s["content"]
+    procedure = sections[-1]["content"]
+    quote = procedure.split("\n\n")[-1][:120].strip()
+
+    match = locate(verify_citation(quote, row.content), row)
+    assert match.section == "procedure"
+    assert procedure[match.start : match.end] == quote
+    document = docstore.get_document(pdf)
+    pages = [p for p, o, n in document.blocks if quote in document.text[o : o + n]]
+    assert match.page == pages[0] > 1
@@ -0,0 +1,32 @@
+def test_version_tables_survive_a_read_only_first_call(backends):
+    from indexer import versions
+
+    assert versions.current_version(max_age=0) == 0
+    # The tables created by the first call must have been committed.
+    assert versions.document_versions() == {}
+    assert versions.current_version(max_age=0) == 0
+    assert versions.STATE_TABLE in backends.db.tables
+
+
+def test_bump_is_seen_once_committed(backends):
+    from indexer import versions
+    from indexer.db import get_connection
+
+    conn = get_connection()
+    cur = conn.cursor()
+    assert versions.bump_version(cur) == 1
+    conn.commit()
+    conn.close()
+    assert versions.current_version(max_age=0) == 1
+
+
+def test_current_version_reuses_a_recent_reading(backends):
+    from indexer import versions
+
+    versions.current_version()
+    before = backends.db.connections
+    for _ in range(10):
+        versions.current_version()
+    assert backends.db.connections == before
+    versions.current_version(max_age=0)
+    assert backends.db.connections == before + 1
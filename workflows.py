@@ -1,41 +1,99 @@
-from datamodels import TextRequest, ResponseItem, PolicyRow
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from compliance import USE_MATRIX, MatrixReader
+from datamodels import BatchItemResult, TextRequest, ResponseItem, PolicyRow
 from extractor.extract import extract_compliance_questions, extract_questions
-from extractor.cite import check_requirement
-from indexer.search import search_similar_purpose, get_policyprocedure
+from extractor.cite import check_policy
+from extractor.verify import locate, verify_citation
+from indexer.rerank import rerank
+from indexer.search_cache import normalise_query, search_cache
+from indexer.search import (
+    get_policyprocedure,
+    get_policyprocedures,
+    search_purpose_batch,
+    search_similar_purpose,
+)
+from limiter import RateLimitError
 from logs import logger
+from metrics import span
+import singleflight
 
+VERIFY_CITATIONS = os.environ.get("VERIFY_CITATIONS", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+MAX_BATCH_ITEMS = int(os.environ.get("AUDIT_BATCH_MAX_ITEMS", 200))
+BATCH_CONCURRENCY = int(os.environ.get("AUDIT_BATCH_CONCURRENCY", 8))
 
-def audit_one(req: ResponseItem, top_k: int = 3) -> ResponseItem:
-    # logger.info(f"Checking {i}/{len(responses)} requirements...")
-    policies: list[PolicyRow] = search_similar_purpose(req.requirement, top_k=top_k)
-    policy_content: list[PolicyRow] = []
+audit_flights = singleflight.SingleFlight("audit_one")
+
+
+def _attach_citation(item: ResponseItem, check_result: dict, source: PolicyRow):
+    """Set the citation and, unless disabled, where it was found in the source."""
+    citation = check_result["citation"]
+    if isinstance(citation, list):
+        citation = " ... ".join(str(c) for c in citation)
+    item.citation = citation
+    if VERIFY_CITATIONS:
+        # The cascade has already located the citation when it accepted a lower tier.
+        item.citation_match = check_result.get("citation_match")
+        if item.citation_match is None:
+            with span("verify_citation"):
+                item.citation_match = verify_citation(citation, source.content)
+        with span("locate_citation"):
+            item.citation_match = locate(item.citation_match, source)
+        if item.citation_match is not None and not item.citation_match.verified:
+            logger.warning(
+                f"Citation not found in {item.file_name}: {str(citation)[:80]}..."
+            )
 
+
+def _combine_sections(
+    policies: list[PolicyRow], documents: dict[str, list[PolicyRow]]
+) -> list[PolicyRow]:
+    """One policy+procedure text per retrieved purpose paragraph."""
+    policy_content: list[PolicyRow] = []
     for p in policies:
-        proceduresRows = get_policyprocedure(p.file_name)
         policy_item = PolicyRow(
             file_name=p.file_name,
             section="policy+procedure",
             paragraph_id=p.paragraph_id,
             content="",
         )
-        for section in proceduresRows:
+        for section in documents[p.file_name]:
+            policy_item.sections.append((section.section, len(policy_item.content)))
             policy_item.content += section.content
         policy_content.append(policy_item)
+    return policy_content
+
 
+def _check_candidates(
+    req: ResponseItem, policies: list[PolicyRow], policy_content: list[PolicyRow]
+) -> ResponseItem:
+    """Rerank the candidates and check them in order until one meets the requirement."""
     logger.info(
         f"Retrieved {len(policy_content)} policy+procedure sections from {len(policies)} documents."
     )
+    policy_content, skipped = rerank(
+        req.requirement, policy_content, [p.content for p in policy_content]
+    )
+    if skipped:
+        logger.info(f"Reranker skipped {skipped} candidates (LLM checks saved)")
 
     is_met_flag = False
-    for policy in policy_content:
+    with span("check"):
+        for policy in policy_content:
 
-        check_result = check_requirement(policy.content, req.requirement)
-        if check_result["is_met"]:
-            is_met_flag = True
-            req.is_met = True
-            req.file_name = policy.file_name
-            req.citation = check_result["citation"]
-            break
+            check_result = check_policy(policy.content, req.requirement)
+            if check_result["is_met"]:
+                is_met_flag = True
+                req.is_met = True
+                req.file_name = policy.file_name
+                _attach_citation(req, check_result, policy)
+                break
 
     if not is_met_flag:
         req.is_met = False
@@ -48,45 +106,181 @@ def audit_one(req: ResponseItem, top_k: int = 3) -> ResponseItem:
     return req
 
 
+def audit_one(req: ResponseItem, top_k: int = 3) -> ResponseItem:
+    """
+    Audit one requirement. Identical requirements (after normalisation)
+    audited concurrently against the same index version, in this or another
+    worker, share one computation.
+    """
+    if not singleflight.ENABLED:
+        return _audit_one(req, top_k)
+
+    key = f"{search_cache.version()}|{top_k}|{normalise_query(req.requirement)}"
+    value, shared = audit_flights.do(
+        key, lambda: _audit_one(req, top_k).model_dump(mode="json")
+    )
+    if shared:
+        result = ResponseItem(**{**value, "id": req.id, "requirement": req.requirement})
+        for name in ResponseItem.model_fields:
+            setattr(req, name, getattr(result, name))
+    return req
+
+
+def _audit_one(req: ResponseItem, top_k: int) -> ResponseItem:
+    with span("retrieve"):
+        policies: list[PolicyRow] = search_similar_purpose(req.requirement, top_k=top_k)
+        documents = {p.file_name: get_policyprocedure(p.file_name) for p in policies}
+        policy_content = _combine_sections(policies, documents)
+
+    return _check_candidates(req, policies, policy_content)
+
+
+def _batch_error(item: ResponseItem, error: Exception) -> BatchItemResult:
+    if isinstance(error, RateLimitError):
+        status = 503
+    elif isinstance(error, ValueError):
+        status = 400
+    else:
+        status = 500
+    logger.error(f"Batch item {item.id} failed: {type(error).__name__}: {error}")
+    return BatchItemResult(id=item.id, status=status, error=str(error))
+
+
+def _audit_batch_item(item: ResponseItem, policies, documents) -> BatchItemResult:
+    try:
+        if policies is None:
+            # Shared retrieval failed: retrieve for this item alone.
+            response = audit_one(item, item.top_k or 3)
+        else:
+            policy_content = _combine_sections(policies, documents)
+            response = _check_candidates(item, policies, policy_content)
+        return BatchItemResult(id=item.id, response=response)
+    except Exception as e:
+        return _batch_error(item, e)
+
+
+def audit_batch(items: list[ResponseItem]) -> list[BatchItemResult]:
+    """
+    Audit many requirements in one call. Retrieval is shared: requirements
+    are embedded in batches, searched over one connection and each policy
+    document is fetched once. Checks then run concurrently. Results come
+    back in input order; a failing item is reported in its own result.
+    """
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"At most {MAX_BATCH_ITEMS} items per batch")
+
+    valid = [i for i, item in enumerate(items) if item.requirement.strip()]
+    results: list = [
+        BatchItemResult(id=item.id, status=400, error="Empty requirement")
+        for item in items
+    ]
+    found: dict[int, list[PolicyRow]] = {}
+    documents: dict[str, list[PolicyRow]] = {}
+    if valid:
+        try:
+            with span("retrieve"):
+                searched = search_purpose_batch(
+                    [items[i].requirement for i in valid],
+                    [items[i].top_k or 3 for i in valid],
+                )
+                found = dict(zip(valid, searched))
+                documents = get_policyprocedures(
+                    [p.file_name for policies in searched for p in policies]
+                )
+        except Exception as e:
+            logger.warning(f"Batched retrieval failed, retrieving per item: {e}")
+            found = {}
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(BATCH_CONCURRENCY, len(valid)))
+    ) as pool:
+        # Run in a copy of the caller's context so spans reach its trace.
+        futures = {
+            i: pool.submit(
+                contextvars.copy_context().run,
+                _audit_batch_item,
+                items[i],
+                found.get(i),
+                documents,
+            )
+            for i in valid
+        }
+        for i, future in futures.items():
+            results[i] = future.result()
+
+    failed = sum(1 for r in results if r.error)
+    logger.info(f"Audited batch of {len(items)} requirements, {failed} failed.")
+    return results
+
+
 def audit_main(request: TextRequest) -> list[ResponseItem]:
-    responses: list[ResponseItem] = extract_questions(request.text)
+    with span("extract_questions"):
+        responses: list[ResponseItem] = extract_questions(request.text)
     logger.info(f"Extracted {len(responses)} compliance questions.")
 
-    for i, r in enumerate(responses, 1):
-        logger.info(f"Checking {i}/{len(responses)} requirements...")
-        policies: list[PolicyRow] = search_similar_purpose(r.requirement, top_k=3)
-        policy_content: list[PolicyRow] = []
+    saved = 0
+    matrix = MatrixReader() if USE_MATRIX else None
+    try:
+        for i, r in enumerate(responses, 1):
+            logger.info(f"Checking {i}/{len(responses)} requirements...")
+            if matrix is not None and matrix.answer(r):
+                logger.info(
+                    f"Requirement: {r.requirement[:50]}... Met: {r.is_met} (matrix)"
+                )
+                continue
+            with span("retrieve"):
+                policies: list[PolicyRow] = search_similar_purpose(
+                    r.requirement, top_k=3
+                )
+                policy_content: list[PolicyRow] = []
 
-        for p in policies:
-            proceduresRows = get_policyprocedure(p.file_name)
-            policy_content.extend(proceduresRows)
+                for p in policies:
+                    proceduresRows = get_policyprocedure(p.file_name)
+                    policy_content.extend(proceduresRows)
 
-        logger.info(
-            f"Retrieved {len(policy_content)} policy/procedure sections from {len(policies)} documents."
-        )
+            logger.info(
+                f"Retrieved {len(policy_content)} policy/procedure sections from {len(policies)} documents."
+            )
+            policy_content, skipped = rerank(
+                r.requirement, policy_content, [p.content for p in policy_content]
+            )
+            saved += skipped
 
-        is_met_flag = False
-        for policy in policy_content:
-            check_result = check_requirement(policy.content, r.requirement)
-            if check_result["is_met"]:
-                is_met_flag = True
-                r.is_met = True
-                r.file_name = policy.file_name
-                r.citation = check_result["citation"]
-                break
+            is_met_flag = False
+            with span("check"):
+                for policy in policy_content:
+                    check_result = check_policy(policy.content, r.requirement)
+                    if check_result["is_met"]:
+                        is_met_flag = True
+                        r.is_met = True
+                        r.file_name = policy.file_name
+                        _attach_citation(r, check_result, policy)
+                        break
 
-        if not is_met_flag:
-            r.is_met = False
-            r.citation = None
-            r.explanation = "Documents reviewed: " + "; ".join(
-                [p.file_name for p in policies]
-            )
+            if not is_met_flag:
+                r.is_met = False
+                r.citation = None
+                r.explanation = "Documents reviewed: " + "; ".join(
+                    [p.file_name for p in policies]
+                )
 
-        logger.info(f"Requirement: {r.requirement[:50]}... Met: {r.is_met}")
+            logger.info(f"Requirement: {r.requirement[:50]}... Met: {r.is_met}")
+    finally:
+        if matrix is not None:
+            matrix.close()
 
+    logger.info(f"Reranker saved {saved} LLM checks over {len(responses)} questions.")
     return {"responses": responses}
 
 
+def audit_questions(items: list[ResponseItem], top_k: int = 3) -> list[ResponseItem]:
+    """Audit already-extracted questions, e.g. those parsed from an uploaded PDF."""
+    for i, item in enumerate(items, 1):
+        logger.info(f"Checking {i}/{len(items)} requirements...")
+        audit_one(item, top_k)
+    return items
+
+
 def audit_test(request: TextRequest) -> list[ResponseItem]:
     responses = extract_questions(request.text)
     logger.info(f"Extracted {len(responses)} compliance questions.")